@@ -0,0 +1,251 @@
+#!/usr/bin/python3
+"""
+Бенчмарк получения списка URL из конфигурации nginx (get_URLs_from_config) по этапам:
+    parse - разбор файлов crossplane и сборка include (combine_configs)
+    process_servers - обработка блоков server
+    urls - составление списка URL (servers_to_urls)
+    total - get_URLs_from_config целиком
+    incremental - get_URLs_from_config с parse_cache после изменения одного файла
+
+Время каждого этапа - минимум и медиана из --repeat запусков, пиковая память этапа измеряется
+отдельным запуском под tracemalloc. Результаты добавляются строкой json в --output, с --compare
+выводится сравнение с последним сохраненным результатом с теми же параметрами.
+С --before-after на той же конфигурации обработка блоков server (process_servers: split_block
+и обход location с явным стеком, collect_locations) сравнивается с прежним рекурсивным обходом,
+который сохранен здесь (recursive_process_servers), результаты обоих должны совпадать.
+
+    cd benchmarks && python bench_config.py --servers 5000 --files 500 --compare
+    python bench_config.py --servers 1000 --files 100 --comments 0.5 --nesting 4 --before-after --no-save
+"""
+import argparse
+import json
+import os.path
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import crossplane  # noqa: E402
+
+from gen_config import add_arguments, generate, generator_params  # noqa: E402
+from znwclib.nginx_config import check_ssl_on, combine_configs, get_all_listen_directives, \
+    get_server_names, get_URLs_from_config, prepare_location, process_servers, process_special_comments, \
+    servers_to_urls, skip_on_return  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results.jsonl')
+HOSTNAME = 'bench.example.com'
+
+
+def parse(main_conf):
+    pl = crossplane.parse(main_conf, comments=True, ignore=('types', 'events',))
+    config = combine_configs(pl)
+    return next(d['block'] for d in config if d['directive'] == 'http')
+
+
+def recursive_locations(server_block: list, hostname_var, return_code=399) -> tuple:
+    """
+    Прежний get_locations: рекурсивный обход location, каждый блок просматривается вспомогательными
+    функциями заново
+    """
+    locations = []
+    for d in server_block:
+        if d['directive'].lower() == 'location':
+            db = d.get('block')
+            special_comments = process_special_comments(db, hostname_var)
+            location = prepare_location(d['args'], db, special_comments)
+            if db and skip_on_return(db, return_code):
+                if location == '/':
+                    return [], True
+                continue
+            if location:
+                locations.append(location)
+            nested_locations, _ = recursive_locations(db, hostname_var, return_code)
+            if nested_locations:
+                locations.extend(nested_locations)
+    return locations, False
+
+
+def recursive_process_servers(html_block: list, hostname_var, default_port=80, return_code=399) -> list:
+    """
+    Прежний process_servers (без server_cache и listen_address), с которым сравнивается текущий
+    """
+    servers = []
+    ssl_on = check_ssl_on(html_block)
+    for d in html_block:
+        if d['directive'] != 'server':
+            continue
+        server_block = d['block']
+        if skip_on_return(server_block, return_code):
+            continue
+        ssl_on = ssl_on or check_ssl_on(server_block)
+        server_names = get_server_names(server_block, hostname_var)
+        if not server_names:
+            continue
+        locations, skip_root = recursive_locations(server_block, hostname_var, return_code)
+        if skip_root:
+            continue
+        servers.append({
+            'server_names': server_names,
+            'locations': locations,
+            'listens': get_all_listen_directives(server_block, default_port, ssl_on),
+        })
+    return servers
+
+
+def before_after(main_conf, repeat):
+    """
+    Время обработки блоков server прежним рекурсивным обходом и текущим на одной конфигурации
+    :return: {'before_ms': {'min', 'median'}, 'after_ms': {'min', 'median'}, 'speedup'}
+    """
+    http = parse(main_conf)
+    before = recursive_process_servers(http, HOSTNAME)
+    after = process_servers(http, HOSTNAME)
+    if before != after:
+        raise AssertionError('process_servers result differs from the recursive walk')
+    times = {'before_ms': [], 'after_ms': []}
+    for _ in range(repeat):
+        for name, func in (('before_ms', recursive_process_servers), ('after_ms', process_servers)):
+            start = time.perf_counter()
+            func(http, HOSTNAME)
+            times[name].append(time.perf_counter() - start)
+    result = {name: {'min': round(min(t) * 1000, 3), 'median': round(statistics.median(t) * 1000, 3)}
+              for name, t in times.items()}
+    result['speedup'] = round(result['before_ms']['min'] / result['after_ms']['min'], 2)
+    return result
+
+
+def touch_one_file(main_conf):
+    sites_dir = os.path.join(os.path.dirname(main_conf), 'sites-enabled')
+    path = os.path.join(sites_dir, sorted(os.listdir(sites_dir))[0])
+    with open(path, 'a') as f:
+        f.write('# changed\n')
+
+
+def phases(main_conf):
+    """
+    Этапы бенчмарка: [(<имя>, <функция без аргументов>), ...], функции используют результаты предыдущих.
+    Функция может вернуть время, если измерять нужно только часть ее работы
+    """
+    state = {}
+
+    def incremental():
+        parse_cache = {}
+        get_URLs_from_config(main_conf, HOSTNAME, parse_cache=parse_cache)
+        touch_one_file(main_conf)
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        get_URLs_from_config(main_conf, HOSTNAME, parse_cache=parse_cache)
+        # время только повторного вызова
+        return time.perf_counter() - start
+
+    return [
+        ('parse', lambda: state.update(http=parse(main_conf))),
+        ('process_servers', lambda: state.update(servers=process_servers(state['http'], HOSTNAME))),
+        ('urls', lambda: state.update(urls=servers_to_urls(state['servers']))),
+        ('total', lambda: state.update(total=get_URLs_from_config(main_conf, HOSTNAME))),
+        ('incremental', incremental),
+    ], state
+
+
+def run(main_conf, repeat):
+    times = {}
+    steps, state = phases(main_conf)
+    for _ in range(repeat):
+        for name, func in steps:
+            start = time.perf_counter()
+            elapsed = func()
+            times.setdefault(name, []).append(elapsed if elapsed is not None else time.perf_counter() - start)
+    peak = {}
+    steps, state = phases(main_conf)
+    for name, func in steps:
+        tracemalloc.start()
+        func()
+        peak[name] = round(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+    return {
+        'time_ms': {name: {'min': round(min(t) * 1000, 3), 'median': round(statistics.median(t) * 1000, 3)}
+                    for name, t in times.items()},
+        'peak_kb': peak,
+        'servers': len(state['servers']),
+        'urls': len(state['urls']),
+    }
+
+
+def git_label():
+    try:
+        res = subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return res.stdout.strip() or 'unknown'
+    except OSError:
+        return 'unknown'
+
+
+def load_results(output):
+    try:
+        with open(output) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return []
+
+
+def compare(result, previous):
+    print(f"compared with {previous['label']} ({previous['date']}):")
+    print('time, min:')
+    for name, t in result['time_ms'].items():
+        old = previous['time_ms'].get(name)
+        if old:
+            print(f"  {name:16} {old['min']:10.1f} ms -> {t['min']:10.1f} ms  x{t['min'] / old['min']:.2f}")
+    print('peak memory:')
+    for name, kb in result['peak_kb'].items():
+        old = previous['peak_kb'].get(name)
+        if old:
+            print(f"  {name:16} {old:10} KB -> {kb:10} KB  x{kb / old:.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark URL discovery on a synthetic nginx config')
+    add_arguments(parser)
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='runs of each phase')
+    parser.add_argument('-l', '--label', default=None, help='result label, default: git describe')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help='results file (json lines)')
+    parser.add_argument('--no-save', action='store_true', help='do not store the result')
+    parser.add_argument('--compare', action='store_true',
+                        help='compare with the last stored result with the same parameters')
+    parser.add_argument('--before-after', action='store_true',
+                        help='also time the previous recursive server block walk against process_servers')
+    args = parser.parse_args()
+
+    params = generator_params(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        main_conf = generate(tmp, **params)
+        result = run(main_conf, args.repeat)
+        if args.before_after:
+            result['process_servers_before_after'] = before_after(main_conf, args.repeat)
+    result = {
+        'label': args.label or git_label(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'params': params,
+        'repeat': args.repeat,
+        **result,
+    }
+    print(json.dumps(result, indent=2))
+    if args.before_after:
+        ba = result['process_servers_before_after']
+        print(f"process_servers, min: recursive {ba['before_ms']['min']:.1f} ms -> "
+              f"explicit stack {ba['after_ms']['min']:.1f} ms  x{ba['speedup']:.2f}")
+    if args.compare:
+        same = [r for r in load_results(args.output) if r.get('params') == params]
+        if same:
+            compare(result, same[-1])
+        else:
+            print('no stored results with the same parameters')
+    if not args.no_save:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps(result) + '\n')
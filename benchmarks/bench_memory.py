@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+"""
+Бенчмарк памяти списка серверов и URL на синтетической конфигурации:
+    dicts - прежнее представление: список словарей process_servers и список строк URL (servers_to_urls)
+    compact - ServerStore из iter_process_servers и URLList (строки URL составляются при проходе)
+
+Для каждого представления измеряется память, которая остается занятой после построения (retained),
+отдельно для серверов (servers_kb) и вместе с URL, и пиковая память построения (tracemalloc),
+а также время одного прохода по всем URL.
+С --debug URL составляются вместе с блоками server (режим debug), с --listen-address - с адресами listen.
+Код возврата 1, если compact занимает больше памяти, чем dicts.
+
+    cd benchmarks && python bench_memory.py --servers 20000 --files 500
+"""
+import argparse
+import gc
+import json
+import os.path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from bench_config import HOSTNAME, parse  # noqa: E402
+from gen_config import add_arguments, generate, generator_params  # noqa: E402
+from znwclib.nginx_config import iter_process_servers, process_servers, servers_to_urls  # noqa: E402
+from znwclib.server_store import ServerStore  # noqa: E402
+
+
+def build_dicts(http, debug, listen_address):
+    servers = process_servers(http, HOSTNAME, debug=debug, listen_address=listen_address)
+    return servers, servers_to_urls(servers, debug=debug, listen_address=listen_address)
+
+
+def build_compact(http, debug, listen_address):
+    store = ServerStore(iter_process_servers(http, HOSTNAME, debug=debug, listen_address=listen_address))
+    return store, store.urls(debug=debug, listen_address=listen_address)
+
+
+def traced(func):
+    """
+    :return: (<результат func>, <занятая после вызова память>, <пиковая память>)
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained, peak
+
+
+def measure(build, http, debug, listen_address):
+    servers, servers_retained, _ = traced(lambda: build(http, debug, listen_address)[0])
+    del servers
+    (_, urls), retained, peak = traced(lambda: build(http, debug, listen_address))
+    start = time.perf_counter()
+    count = sum(1 for _ in urls)
+    iterate_ms = (time.perf_counter() - start) * 1000
+    return {'servers_kb': round(servers_retained / 1024), 'retained_kb': round(retained / 1024),
+            'peak_kb': round(peak / 1024), 'urls': count, 'iterate_ms': round(iterate_ms, 3)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare memory of the server and URL representations')
+    add_arguments(parser)
+    parser.add_argument('--debug', action='store_true', help='URLs with server blocks (debug mode)')
+    parser.add_argument('--listen-address', action='store_true', help='URLs with listen addresses')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        http = parse(generate(tmp, **generator_params(args)))
+    result = {
+        'params': generator_params(args),
+        'debug': args.debug,
+        'listen_address': args.listen_address,
+        'dicts': measure(build_dicts, http, args.debug, args.listen_address),
+        'compact': measure(build_compact, http, args.debug, args.listen_address),
+    }
+    print(json.dumps(result, indent=2))
+    dicts, compact = result['dicts'], result['compact']
+    for name in ('servers_kb', 'retained_kb', 'peak_kb'):
+        print(f"{name:12} {dicts[name]:10} KB -> {compact[name]:10} KB  x{compact[name] / max(dicts[name], 1):.2f}")
+    if compact['urls'] != dicts['urls']:
+        print(f"FAIL: {compact['urls']} URLs instead of {dicts['urls']}")
+        sys.exit(1)
+    if compact['retained_kb'] > dicts['retained_kb']:
+        print('FAIL: compact representation takes more memory')
+        sys.exit(1)
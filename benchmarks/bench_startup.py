@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+"""
+Бенчмарк времени запуска znwcagent.py при ответе из кэша (-C), когда конфигурация не менялась.
+Медиана времени запуска сравнивается с бюджетом (цель - меньше 50 мс), при превышении код возврата 1.
+Также проверяется, что при ответе из кэша не импортируются crossplane, dns и validators.
+
+Агент запускается с аргументами шаблона по умолчанию ({$ZNWC_AGENT_ARGS} = -s -r 300).
+Время запуска самого интерпретатора (python -c pass) выводится отдельно. Если .pth файлы окружения
+замедляют его настолько, что он один не укладывается в бюджет, цель не достижима никакими изменениями
+агента: тогда можно запускать интерпретатор с -S (--no-site, при ответе из кэша site-packages не нужны)
+или с --overhead применять бюджет к разнице с ним.
+Модули znwclib компилируются заранее: при PYTHONDONTWRITEBYTECODE или каталоге без права записи
+.pyc не сохраняются, и каждый запуск компилировал бы их заново.
+
+    cd benchmarks && python bench_startup.py --budget 50
+"""
+import argparse
+import compileall
+import os.path
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from gen_config import generate
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+AGENT = os.path.join(SRC_DIR, 'znwcagent.py')
+DEFAULT_BUDGET_MS = 50.0
+# модули, которые не должны импортироваться при ответе из кэша
+HEAVY_MODULES = ('crossplane', 'dns', 'validators')
+
+
+def run_ms(cmd, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def imported_modules(cmd):
+    res = subprocess.run([cmd[0], '-X', 'importtime'] + cmd[1:], stdout=subprocess.DEVNULL,
+                         stderr=subprocess.PIPE, text=True, check=True)
+    return {line.rsplit('|', 1)[1].strip() for line in res.stderr.splitlines() if line.startswith('import time:')}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check znwcagent.py start-up time on a cache hit')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_MS, help='budget, ms')
+    parser.add_argument('--overhead', action='store_true',
+                        help='apply the budget to the time above the bare interpreter start-up')
+    parser.add_argument('--no-site', action='store_true', help='run the interpreter with -S')
+    parser.add_argument('--agent-args', default='-s -r 300', help='znwcagent.py arguments, default: %(default)s')
+    parser.add_argument('-r', '--runs', type=int, default=20, help='runs')
+    parser.add_argument('--servers', type=int, default=1000, help='server blocks in the generated config')
+    parser.add_argument('--files', type=int, default=100, help='included files in the generated config')
+    args = parser.parse_args()
+
+    compileall.compile_dir(os.path.join(SRC_DIR, 'znwclib'), quiet=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        main_conf = generate(tmp, servers=args.servers, files=args.files)
+        python = [sys.executable, '-S'] if args.no_site else [sys.executable]
+        cmd = python + [AGENT, '-C', os.path.join(tmp, 'urls.cache')] + args.agent_args.split() + [main_conf]
+        # первый запуск заполняет кэш, ему нужны site-packages
+        subprocess.run([sys.executable] + cmd[len(python):], stdout=subprocess.DEVNULL, check=True)
+        heavy = sorted(name for name in imported_modules(cmd) if name.split('.')[0] in HEAVY_MODULES)
+        interpreter_ms = run_ms(python + ['-c', 'pass'], args.runs)
+        agent_ms = run_ms(cmd, args.runs)
+
+    measured = agent_ms - interpreter_ms if args.overhead else agent_ms
+    print(f"interpreter start-up: {interpreter_ms:.1f} ms")
+    print(f"znwcagent.py cache hit: {agent_ms:.1f} ms (+{agent_ms - interpreter_ms:.1f} ms)")
+    print(f"budget: {args.budget:.1f} ms{' above interpreter start-up' if args.overhead else ''}")
+    failed = False
+    if heavy:
+        print(f"FAIL: imported on a cache hit: {', '.join(heavy)}")
+        failed = True
+    if measured > args.budget:
+        print(f"FAIL: {measured:.1f} ms > {args.budget:.1f} ms")
+        if not args.overhead and interpreter_ms > args.budget:
+            print("interpreter start-up alone exceeds the budget, try --no-site")
+        failed = True
+    if not failed:
+        print('OK')
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+"""
+Генератор синтетической конфигурации nginx для бенчмарков
+
+    gen_config.py [параметры] <каталог>
+
+В каталоге создается nginx.conf, который подключает через include files файлов sites-enabled/*.conf,
+блоки server равномерно распределяются по этим файлам.
+"""
+import argparse
+import os
+import os.path
+
+DEFAULTS = {
+    'servers': 1000,
+    'files': 100,
+    'listens': 2,
+    'server_names': 3,
+    'locations': 4,
+    'nesting': 2,
+    'comments': 0.2,
+}
+
+
+def server_block(n: int, listens: int, server_names: int, locations: int, nesting: int, comments: bool) -> str:
+    """
+    Текст одного блока server с номером n
+    """
+    lines = ['server {']
+    for i in range(listens):
+        port = 80 + i * 363 if i < 2 else 8000 + i
+        lines.append(f"    listen {port}{' ssl' if port == 443 else ''};")
+    names = [f"site{n}-{i}.example.com" for i in range(server_names)]
+    if comments:
+        # имена, которые обрабатываются специальными комментариями
+        names[-1] = f"*.site{n}.example.com"
+        names.append(f"$env.site{n}.example.com")
+    lines.append(f"    server_name {' '.join(names)};")
+    if comments:
+        lines.append(f"    # replace: *.site{n}.example.com = www.site{n}.example.com api.site{n}.example.com")
+        lines.append("    # var: $env = prod")
+    lines.append(f"    root /var/www/site{n};")
+
+    def location(path: str, depth: int, indent: str):
+        lines.append(f"{indent}location {path} {{")
+        lines.append(f"{indent}    try_files $uri $uri/ =404;")
+        if depth < nesting:
+            location(f"{path}/sub{depth}", depth + 1, indent + '    ')
+        lines.append(f"{indent}}}")
+
+    for i in range(locations):
+        location(f"/loc{i}", 1, '    ')
+    # location, которые пропускаются
+    lines.append("    location ~ \\.php$ {")
+    lines.append("        return 403;")
+    lines.append("    }")
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def generate(out_dir: str, servers: int = DEFAULTS['servers'], files: int = DEFAULTS['files'],
+             listens: int = DEFAULTS['listens'], server_names: int = DEFAULTS['server_names'],
+             locations: int = DEFAULTS['locations'], nesting: int = DEFAULTS['nesting'],
+             comments: float = DEFAULTS['comments']) -> str:
+    """
+    Создает конфигурацию в каталоге out_dir
+    :param servers: количество блоков server
+    :param files: количество подключаемых файлов, по которым распределяются блоки server
+    :param listens: количество директив listen в каждом блоке server
+    :param server_names: количество имен в директиве server_name
+    :param locations: количество location верхнего уровня в каждом блоке server
+    :param nesting: глубина вложенности location
+    :param comments: доля блоков server со специальными комментариями
+    :return: путь к nginx.conf
+    """
+    sites_dir = os.path.join(out_dir, 'sites-enabled')
+    os.makedirs(sites_dir, exist_ok=True)
+    files = max(1, min(files, servers))
+    commented = int(servers * comments)
+    every = servers // commented if commented else 0
+    for f in range(files):
+        with open(os.path.join(sites_dir, f"site{f:05}.conf"), 'w') as conf:
+            for n in range(f, servers, files):
+                conf.write(server_block(n, listens, server_names, locations, nesting,
+                                        bool(every) and n % every == 0))
+    main_conf = os.path.join(out_dir, 'nginx.conf')
+    with open(main_conf, 'w') as conf:
+        conf.write('user www-data;\n'
+                   'worker_processes auto;\n'
+                   'events {\n    worker_connections 768;\n}\n'
+                   'http {\n'
+                   '    sendfile on;\n'
+                   '    include sites-enabled/*.conf;\n'
+                   '}\n')
+    return main_conf
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--servers', type=int, default=DEFAULTS['servers'], help='server blocks')
+    parser.add_argument('--files', type=int, default=DEFAULTS['files'], help='included files (include fan-out)')
+    parser.add_argument('--listens', type=int, default=DEFAULTS['listens'], help='listen directives per server')
+    parser.add_argument('--server-names', type=int, default=DEFAULTS['server_names'],
+                        help='names per server_name directive')
+    parser.add_argument('--locations', type=int, default=DEFAULTS['locations'],
+                        help='top level locations per server')
+    parser.add_argument('--nesting', type=int, default=DEFAULTS['nesting'], help='depth of nested locations')
+    parser.add_argument('--comments', type=float, default=DEFAULTS['comments'],
+                        help='share of servers with special comments')
+
+
+def generator_params(args) -> dict:
+    return {name: getattr(args, name) for name in DEFAULTS}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic nginx config')
+    parser.add_argument('out_dir', metavar='<directory>')
+    add_arguments(parser)
+    args = parser.parse_args()
+    print(generate(args.out_dir, **generator_params(args)))
@@ -0,0 +1,145 @@
+#!/usr/bin/python3
+import argparse
+import asyncio
+import json
+import signal
+import sys
+from functools import partial
+
+from znwclib.daemon import DEFAULT_RELOAD_INTERVAL, DEFAULT_SEND_INTERVAL, ProbeDaemon, serve_results
+from znwclib.probe import DEFAULT_BURST, DEFAULT_CONCURRENCY, DEFAULT_PER_HOST
+from znwclib.dns_cache import DEFAULT_TTL, Resolver
+from znwclib.scheduler import DEFAULT_INTERVAL, DEFAULT_JITTER
+from znwclib.web_check import DEFAULT_CONNECT_TIMEOUT, DEFAULT_MAX_REDIRECTS, DEFAULT_READ_TIMEOUT
+from znwclib.zabbix_sender import DEFAULT_BATCH_SIZE, DEFAULT_PORT, result_items, send_values
+
+__version__ = '0.1'
+
+
+def parse_cmd_args():
+    parser = argparse.ArgumentParser(
+        description="Check URLs periodically and keep the results in memory"
+    )
+    parser.add_argument('--version', action='version', version='Version is ' + __version__)
+    parser.add_argument("urls_file",
+                        metavar="<urls file>",
+                        type=str,
+                        help="File with URLs: znwcagent.py LLD JSON, JSON list of URLs or one URL per line. "
+                             "Reread on change or SIGHUP",
+                        )
+    parser.add_argument('-a', '--address', action='store_true',
+                        help='Connect to the {#ADDRESS} of each URL (znwcagent.py -A) instead of resolving '
+                             'the host name, the Host header and TLS SNI are taken from the URL')
+    parser.add_argument('-i', '--interval', type=float, default=DEFAULT_INTERVAL, metavar='<seconds>',
+                        help='Check interval of every URL. Default = ' + str(DEFAULT_INTERVAL))
+    parser.add_argument('-j', '--jitter', type=float, default=DEFAULT_JITTER, metavar='<fraction>',
+                        help='Random deviation of the interval, fraction of the interval. Default = ' +
+                             str(DEFAULT_JITTER))
+    parser.add_argument('-l', '--listen', type=str, default='127.0.0.1:10080', metavar='<address:port>',
+                        help='Serve results over HTTP on this address, an IPv6 address in brackets, e.g. [::1]:10080. '
+                             'Default = 127.0.0.1:10080')
+    parser.add_argument('--head', action='store_true',
+                        help='Check with a HEAD request, fall back to GET if the server rejects HEAD (405, 501)')
+    parser.add_argument('--max-body', type=int, metavar='<bytes>',
+                        help='Read at most this many bytes of the response body, the rest is not downloaded '
+                             'and the connection is closed. Default - read the whole body')
+    parser.add_argument('--max-redirects', type=int, default=DEFAULT_MAX_REDIRECTS, metavar='<count>',
+                        help='Maximum number of redirects, more redirects or a redirect loop give the error 6. '
+                             'Default = ' + str(DEFAULT_MAX_REDIRECTS))
+    parser.add_argument('--dns-cache', action='store_true',
+                        help='Resolve every host name once and share the addresses between checks '
+                             'until the record TTL expires (--dns-ttl for the system resolver)')
+    parser.add_argument('--resolver', type=str, metavar='<address>[,<address>]',
+                        help='Resolve host names with these DNS servers instead of the system resolver, '
+                             'implies --dns-cache. Requires dnspython')
+    parser.add_argument('--dns-ttl', type=float, default=DEFAULT_TTL, metavar='<seconds>',
+                        help='How long to keep addresses from the system resolver, which does not report '
+                             'TTL. Default = ' + str(DEFAULT_TTL))
+    parser.add_argument('--connect-timeout', type=float, default=DEFAULT_CONNECT_TIMEOUT, metavar='<seconds>',
+                        help='Connect timeout. Default = ' + str(DEFAULT_CONNECT_TIMEOUT))
+    parser.add_argument('--read-timeout', type=float, default=DEFAULT_READ_TIMEOUT, metavar='<seconds>',
+                        help='Read timeout. Default = ' + str(DEFAULT_READ_TIMEOUT))
+    parser.add_argument('-c', '--concurrency', type=int, default=DEFAULT_CONCURRENCY, metavar='<count>',
+                        help='Maximum number of simultaneous checks. Default = ' + str(DEFAULT_CONCURRENCY))
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST, metavar='<count>',
+                        help='Maximum number of simultaneous checks of one host. Default = ' +
+                             str(DEFAULT_PER_HOST))
+    parser.add_argument('--pool-maxsize', type=int, metavar='<count>',
+                        help='Maximum number of keep-alive connections per scheme://host:port. '
+                             'Default is --per-host value')
+    parser.add_argument('--rate', type=float, metavar='<per second>',
+                        help='Maximum requests per second to one scheme://host:port. Default - no limit')
+    parser.add_argument('--burst', type=int, default=DEFAULT_BURST, metavar='<count>',
+                        help='Requests to one scheme://host:port in a row without waiting for --rate. '
+                             'Default = ' + str(DEFAULT_BURST))
+    parser.add_argument('--ip-rate', type=float, metavar='<per second>',
+                        help='Maximum requests per second to one IP address. Default - no limit')
+    parser.add_argument('--ip-burst', type=int, default=DEFAULT_BURST, metavar='<count>',
+                        help='Requests to one IP address in a row without waiting for --ip-rate. '
+                             'Default = ' + str(DEFAULT_BURST))
+    parser.add_argument('--reload-interval', type=float, default=DEFAULT_RELOAD_INTERVAL, metavar='<seconds>',
+                        help='How often to check the urls file for changes. Default = ' +
+                             str(DEFAULT_RELOAD_INTERVAL))
+    parser.add_argument('-z', '--zabbix-server', type=str, metavar='<server>',
+                        help='Also send new results to zabbix server (or proxy) trapper')
+    parser.add_argument('--zabbix-port', type=int, default=DEFAULT_PORT, metavar='<port>',
+                        help='Zabbix trapper port. Default = ' + str(DEFAULT_PORT))
+    parser.add_argument('-s', '--host', type=str, metavar='<host>',
+                        help='Host name in zabbix, required with --zabbix-server')
+    parser.add_argument('--send-interval', type=float, default=DEFAULT_SEND_INTERVAL, metavar='<seconds>',
+                        help='How often to send new results. Default = ' + str(DEFAULT_SEND_INTERVAL))
+    args = parser.parse_args()
+    if args.zabbix_server and not args.host:
+        parser.error('--host is required with --zabbix-server')
+    for name in ('concurrency', 'per_host', 'pool_maxsize'):
+        # 0 слотов - проверки ждут бесконечно
+        if getattr(args, name) is not None and getattr(args, name) < 1:
+            parser.error(f"--{name.replace('_', '-')} must be at least 1")
+    return args
+
+
+def send_results(results: dict, server: str, port: int, host: str):
+    summary = send_values(result_items(host, results), server, port, batch_size=DEFAULT_BATCH_SIZE)
+    if summary['not_sent'] or summary['failed']:
+        print(json.dumps(summary))
+
+
+async def main(args):
+    resolver = None
+    if args.dns_cache or args.resolver:
+        nameservers = [address.strip() for address in args.resolver.split(',')] if args.resolver else None
+        try:
+            resolver = Resolver(nameservers, ttl=args.dns_ttl)
+        except ImportError as e:
+            print(f"Error: --resolver: {e}", file=sys.stderr)
+            sys.exit(-1)
+    sender = None
+    if args.zabbix_server:
+        sender = partial(send_results, server=args.zabbix_server, port=args.zabbix_port, host=args.host)
+    daemon = ProbeDaemon(
+        args.urls_file, args.interval, args.jitter,
+        concurrency=args.concurrency, per_host=args.per_host, pool_maxsize=args.pool_maxsize,
+        timeout=(args.connect_timeout, args.read_timeout),
+        reload_interval=args.reload_interval,
+        sender=sender, send_interval=args.send_interval,
+        use_address=args.address,
+        rate=args.rate, burst=args.burst, ip_rate=args.ip_rate, ip_burst=args.ip_burst,
+        head=args.head, max_body=args.max_body, max_redirects=args.max_redirects,
+        resolver=resolver,
+    )
+    listen_host, _, listen_port = args.listen.rpartition(':')
+    server = serve_results(daemon, listen_host.strip('[]'), int(listen_port))
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    loop.add_signal_handler(signal.SIGINT, stop.set)
+    loop.add_signal_handler(signal.SIGHUP, partial(daemon.load_urls, force=True))
+    try:
+        await daemon.run(stop)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_cmd_args()))
@@ -0,0 +1,285 @@
+import argparse
+import json
+import os
+import sys
+import time
+from itertools import islice
+from json.encoder import encode_basestring_ascii
+
+from znwclib import config_cache
+
+__version__ = '0.1'
+
+_DEBUG = False
+STATE_SUFFIX = '.parsed'
+DNS_SUFFIX = '.dns'
+
+
+def get_hostname():
+    # то же, что socket.gethostname(), без импорта socket
+    if hasattr(os, 'uname'):
+        return os.uname().nodename
+    import socket
+    return socket.gethostname()
+
+
+def parse_cmd_args(hostname=get_hostname(), port=80, return_code=399, cache_max_age=3600, dns_workers=20,
+                   workers=os.cpu_count()):
+    parser = argparse.ArgumentParser(
+        description="Get URLs from nginx config file"
+    )
+    parser.add_argument('--version', action='version', version='Version is ' + __version__)
+    parser.add_argument("config_file",
+                        metavar="<config file name>",
+                        type=str, nargs='?',
+                        help="Path to the nginx config file. "
+                             "default: /etc/nginx/nginx.conf",
+                        default='/etc/nginx/nginx.conf',
+                        )
+    parser.add_argument('-T', '--dump', action='store_true',
+                        help="<config file name> is the output of 'nginx -T' ('-' - read it from stdin), "
+                             'the included files are taken from it instead of the disk')
+    parser.add_argument('-A', '--address', action='store_true',
+                        help='Add the {#ADDRESS} macro: the address of the listen directive, znwcserver.py can '
+                             'connect to it directly. Empty if the server listens on all addresses, '
+                             'see --wildcard-address')
+    parser.add_argument('--wildcard-address', type=str, metavar='<address>', default=None,
+                        help='With -A the {#ADDRESS} of servers listening on all addresses (listen 80, *, '
+                             '0.0.0.0, [::]), e.g. the IP address of this host. Implies -A')
+    parser.add_argument('-u', '--human', default=False, action="store_true",
+                        help='Human friendly output format')
+    parser.add_argument('-s', '--skip_location', action="store_true",
+                        help="Add this key if you don't want to handle locations")
+    parser.add_argument('-r', '--ret-code', type=int, default=return_code, metavar='<ret code>',
+                        help='Return code. All server and location directives, if they contain return <code>,'
+                             ' will not be processed if <code> is greater than <ret code>. Default = ' +
+                             str(return_code))
+    parser.add_argument('-p', '--port', type=int, default=port, metavar='<port>',
+                        help='Specify the default port for server directives for which there is no listen directive.'
+                             " Default value = " + str(port))
+    parser.add_argument('-H', '--hostname', type=str, metavar='<hostname>', default=hostname,
+                        help='Specify the hostname. Default is ' + hostname)
+    parser.add_argument('-n', '--check-dns', action='store_true',
+                        help='Do Check dns records for names in server_name directive')
+    parser.add_argument('--dns-workers', type=int, default=dns_workers, metavar='<count>',
+                        help='Maximum number of concurrent DNS queries for --check-dns. '
+                             'Default = ' + str(dns_workers))
+    parser.add_argument('-C', '--cache', type=str, metavar='<cache file>', default=None,
+                        help='Cache the URL list in this file. The config is parsed again only when one of '
+                             'the config files, the include directories or the arguments have changed')
+    parser.add_argument('--cache-max-age', type=float, default=cache_max_age, metavar='<seconds>',
+                        help='Parse the config again if the cache is older than this, 0 - no limit. '
+                             'Default = ' + str(cache_max_age))
+    parser.add_argument('-D', '--diff', type=str, metavar='<state file>', default=None,
+                        help='Print only the changes since the previous run with the same state file: '
+                             '{"hash": <sha256 of the URL list>, "added": [LLD], "removed": [LLD]}')
+    parser.add_argument('-M', '--manifest', type=str, metavar='<manifest file>', default=None,
+                        help="Process many hosts: the file lists '<hostname> <config file>' per line, "
+                             '<config file name> and --hostname are ignored. With -T the config files are '
+                             "'nginx -T' dumps. A json line with the URL count or the error and the time "
+                             'is printed for each host')
+    parser.add_argument('-o', '--output-dir', type=str, metavar='<dir>', default=None,
+                        help='With -M write the LLD JSON of each host to <dir>/<hostname>.json, '
+                             'otherwise it is printed in the json line of the host')
+    parser.add_argument('-j', '--workers', type=int, default=workers, metavar='<count>',
+                        help='With -M the number of processes parsing the configs. Default = ' + str(workers))
+    args = parser.parse_args()
+    # --wildcard-address включает -A, args.address - значение listen_address для get_URLs_from_config
+    if args.wildcard_address:
+        args.address = args.wildcard_address
+    return args
+
+
+def get_urls(args):
+    """
+    URL из кэша, если он актуален, иначе из конфигурационного файла, или строка 'Error: ...'.
+    При чтении из кэша crossplane не импортируется.
+    Без кэша возвращается генератор, URL составляются по мере вывода.
+    """
+    key = None
+    from_stdin = args.dump and args.config_file == '-'
+    if args.cache and not _DEBUG and not from_stdin:
+        key = {
+            'config_file': os.path.abspath(args.config_file),
+            'dump': args.dump,
+            'hostname': args.hostname,
+            'port': args.port,
+            'ret_code': args.ret_code,
+            'skip_location': args.skip_location,
+            'check_dns': args.check_dns,
+            'address': args.address,
+        }
+        urls = config_cache.load(args.cache, key, max_age=args.cache_max_age or None)
+        if urls is not None:
+            return urls
+    from znwclib.nginx_config import iter_URLs_from_config
+    depends_on = []
+    # результаты разбора отдельных файлов, чтобы при изменении одного файла не разбирать остальные
+    parse_cache = config_cache.load_state(args.cache + STATE_SUFFIX) if key is not None else None
+    # результаты проверки DNS хранятся до истечения TTL записей
+    dns_cache = None
+    if args.check_dns:
+        # dns импортируется только с -n
+        from znwclib.dns_cache import DNSCache
+        dns_cache = DNSCache(args.cache + DNS_SUFFIX if key is not None else None, workers=args.dns_workers)
+    parsed_at = time.time()
+    config_dump = None
+    if args.dump:
+        if from_stdin:
+            config_dump = sys.stdin.read()
+        else:
+            try:
+                with open(args.config_file, encoding='utf-8', errors='replace') as f:
+                    config_dump = f.read()
+            except OSError as e:
+                return f"Error: {e}"
+            # результат зависит только от файла дампа
+            depends_on.append(args.config_file)
+    urls = iter_URLs_from_config(
+        config_file_name=args.config_file,
+        hostname_var=args.hostname,
+        default_port=args.port,
+        return_code=args.ret_code,
+        skip_locations=args.skip_location,
+        dns_check=args.check_dns,
+        debug=_DEBUG,
+        depends_on=depends_on,
+        parse_cache=parse_cache,
+        dns_cache=dns_cache,
+        config_dump=config_dump,
+        listen_address=args.address
+    )
+    if key is not None:
+        if not isinstance(urls, str):
+            # для сохранения в кэш нужен весь список
+            urls = list(urls)
+            config_cache.save(args.cache, key, depends_on, urls, parsed_at=parsed_at,
+                              expires=dns_cache.expires if dns_cache is not None else None)
+        config_cache.save_state(args.cache + STATE_SUFFIX, parse_cache)
+        if dns_cache is not None:
+            dns_cache.save()
+    return urls
+
+
+def lld_row(item) -> dict:
+    """
+    Строка LLD для URL или для (<URL>, <адрес listen>) с макросом {#ADDRESS}
+    """
+    if isinstance(item, str):
+        return {'{#URL}': item}
+    return {'{#URL}': item[0], '{#ADDRESS}': item[1] or ''}
+
+
+def _item_key(item):
+    # из кэша (json) пары URL и адреса читаются списками
+    return item if isinstance(item, str) else tuple(item)
+
+
+def _json_item(row, indent, pad):
+    text = json.dumps(row, indent=indent)
+    return text.replace('\n', pad) if indent is not None else text
+
+
+def write_lld(urls, out, indent=None, chunk_size=1000, address=False):
+    """
+    Выводит LLD JSON [{"{#URL}": <url>}, ...] частями по мере получения URL, не составляя весь список в памяти.
+    Вывод совпадает с print(json.dumps(<список>, indent=indent))
+    :param address: urls - пары (<URL>, <адрес listen>), см. lld_row
+    """
+    pad = '\n' + ' ' * indent if indent is not None else ''
+    sep = (',' if indent is not None else ', ') + pad
+    # {"{#URL}": <url>} собирается из шаблона, json.dumps для каждого URL в разы медленнее
+    prefix, suffix = json.dumps({'{#URL}': None}, indent=indent).replace('\n', pad).split('null')
+    urls = iter(urls)
+    first = True
+    while True:
+        chunk = list(islice(urls, chunk_size))
+        if not chunk:
+            break
+        if _DEBUG:
+            text = sep.join(_json_item({'{#URL}': url[0], '{#DEBUG}': url[1]}, indent, pad) for url in chunk)
+        elif address:
+            text = sep.join(_json_item(lld_row(item), indent, pad) for item in chunk)
+        else:
+            text = prefix + (suffix + sep + prefix).join(map(encode_basestring_ascii, chunk)) + suffix
+        out.write(('[' + pad if first else sep) + text)
+        first = False
+    out.write('[]\n' if first else ('\n' if indent is not None else '') + ']\n')
+
+
+def urls_hash(urls: list) -> str:
+    """
+    sha256 списка URL (или пар URL и адреса), не зависит от порядка
+    """
+    import hashlib
+    lines = (url if isinstance(url, str) else ' '.join(item or '' for item in url) for url in urls)
+    return hashlib.sha256('\n'.join(sorted(lines)).encode('utf-8')).hexdigest()
+
+
+def diff_urls(urls: list, state_file: str) -> dict:
+    """
+    Изменения списка URL с прошлого вызова с тем же файлом состояния, текущий список сохраняется в него.
+    При первом вызове все URL считаются добавленными
+    :return: {'hash': <urls_hash>, 'added': [LLD], 'removed': [LLD]}
+    """
+    previous = [_item_key(item) for item in config_cache.load_state(state_file).get('urls', [])]
+    urls = list(dict.fromkeys(map(_item_key, urls)))
+    current = set(urls)
+    known = set(previous)
+    diff = {
+        'hash': urls_hash(urls),
+        'added': [lld_row(item) for item in urls if item not in known],
+        'removed': [lld_row(item) for item in previous if item not in current],
+    }
+    config_cache.save_state(state_file, {'urls': urls})
+    return diff
+
+
+def run_manifest(args, out) -> int:
+    """
+    Обрабатывает хосты из списка args.manifest в пуле процессов (см. multi_host.discover_hosts).
+    Для каждого хоста в out выводится строка json {"hostname", "config_file", "time", "urls": <количество URL>}
+    или с "error" вместо "urls". LLD JSON хоста записывается в <output dir>/<hostname>.json,
+    без output dir - выводится в той же строке в "data".
+    :return: код возврата, 1 - если хотя бы для одного хоста ошибка
+    """
+    from znwclib.multi_host import discover_hosts, read_manifest
+    try:
+        targets = read_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return -1
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    ret_code = 0
+    results = discover_hosts(targets, workers=args.workers, dump=args.dump, default_port=args.port,
+                             return_code=args.ret_code, skip_locations=args.skip_location,
+                             dns_check=args.check_dns, listen_address=args.address)
+    for result in results:
+        urls = result.pop('urls', None)
+        if urls is None:
+            ret_code = 1
+        elif args.output_dir:
+            with open(os.path.join(args.output_dir, result['hostname'] + '.json'), 'w') as f:
+                write_lld(urls, f, indent=(2 if args.human else None), address=args.address)
+            result['urls'] = len(urls)
+        else:
+            result['urls'] = len(urls)
+            result['data'] = [lld_row(url) for url in urls]
+        out.write(json.dumps(result) + '\n')
+        out.flush()
+    return ret_code
+
+
+def main():
+    args = parse_cmd_args()
+    if args.manifest:
+        sys.exit(run_manifest(args, sys.stdout))
+    urls = get_urls(args)
+    if isinstance(urls, str):
+        print(urls, file=sys.stderr)
+        sys.exit(-1)
+    if args.diff and not _DEBUG:
+        print(json.dumps(diff_urls(list(urls), args.diff), indent=(2 if args.human else None)))
+        return
+    write_lld(urls, sys.stdout, indent=(2 if args.human else None), address=args.address)
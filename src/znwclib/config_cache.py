@@ -0,0 +1,121 @@
+import json
+import os
+import time
+from typing import Iterable, Optional
+
+CACHE_VERSION = 1
+
+
+def path_signature(path: str) -> Optional[list]:
+    """
+    [<размер>, <mtime в наносекундах>] файла или каталога, None если он не существует
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def read_json(file_name: str) -> Optional[dict]:
+    """
+    Читает json файл кэша, None если файла нет, он поврежден или другой версии
+    """
+    try:
+        with open(file_name) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+        return None
+    return data
+
+
+def write_json(file_name: str, data: dict) -> bool:
+    """
+    Атомарно заменяет json файл кэша, версия добавляется в data
+    :return: True, если файл сохранен
+    """
+    # tempfile импортируется только при записи, при чтении кэша он не нужен
+    import tempfile
+    data = dict(data, version=CACHE_VERSION)
+    try:
+        fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_name)), prefix='.znwc')
+    except OSError:
+        return False
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_name, file_name)
+    except OSError:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def load(cache_file: str, key: dict, max_age: Optional[float] = None) -> Optional[list]:
+    """
+    Возвращает сохраненный список URL, если он еще актуален:
+    совпадает ключ (параметры вызова) и не изменился ни один файл и каталог, от которых он зависит
+    :param cache_file: файл кэша
+    :param key: параметры, с которыми был получен список
+    :param max_age: максимальный возраст кэша в секундах, None - без ограничения
+    :return: список URL или None, если кэша нет или он устарел
+    """
+    cache = read_json(cache_file)
+    if cache is None or cache.get('key') != key:
+        return None
+    now = time.time()
+    if max_age is not None and now - cache.get('created', 0) > max_age:
+        return None
+    if cache.get('expires') is not None and now >= cache['expires']:
+        return None
+    for path, signature in cache.get('files', {}).items():
+        if path_signature(path) != signature:
+            return None
+    return cache.get('urls')
+
+
+def save(cache_file: str, key: dict, depends_on: Iterable[str], urls: list,
+         parsed_at: Optional[float] = None, expires: Optional[float] = None) -> bool:
+    """
+    Сохраняет список URL вместе с размерами и временем изменения файлов и каталогов, от которых он зависит.
+    Файл кэша заменяется атомарно.
+    :param parsed_at: время начала разбора конфигурации (time.time()). Файлы, измененные после него,
+        могли быть прочитаны до изменения, для них сохраняется None, и следующий load не использует кэш
+    :param expires: время (time.time()), после которого кэш устаревает, например, истекает TTL проверенных DNS имен
+    :return: True, если кэш сохранен
+    """
+    files = {}
+    for path in depends_on:
+        signature = path_signature(path)
+        if signature and parsed_at is not None and signature[1] >= int(parsed_at * 1e9):
+            signature = None
+        files[path] = signature
+    cache = {
+        'key': key,
+        'created': time.time(),
+        'expires': expires,
+        'files': files,
+        'urls': urls,
+    }
+    return write_json(cache_file, cache)
+
+
+def load_state(state_file: str) -> dict:
+    """
+    Читает сохраненные результаты разбора отдельных файлов конфигурации (parse_cache для get_URLs_from_config)
+    :return: словарь, пустой, если файла нет или он поврежден
+    """
+    state = read_json(state_file)
+    return state.get('state', {}) if state else {}
+
+
+def save_state(state_file: str, state: dict) -> bool:
+    """
+    Сохраняет результаты разбора отдельных файлов конфигурации, см. load_state
+    """
+    return write_json(state_file, {'state': state})
@@ -0,0 +1,275 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from znwclib.probe import DEFAULT_BURST, DEFAULT_CONCURRENCY, DEFAULT_PER_HOST, ProbeRunner, RateLimiter, \
+    pinned_check, pooled_check, url_origin
+from znwclib.dns_cache import Resolver
+from znwclib.scheduler import Scheduler
+from znwclib.web_check import DEFAULT_MAX_REDIRECTS, DEFAULT_TIMEOUT, parse_url_addresses
+
+DEFAULT_RELOAD_INTERVAL = 60.0
+DEFAULT_SEND_INTERVAL = 60.0
+# максимальное время ожидания в главном цикле, чтобы вовремя перечитывать список URL
+_MAX_SLEEP = 1.0
+
+
+class ProbeDaemon:
+    """
+    Резидентный режим проверок: список URL читается из файла (см. parse_url_list),
+    каждый URL проверяется по своему расписанию (Scheduler), результаты хранятся в памяти.
+    Файл со списком перечитывается при изменении.
+    """
+
+    def __init__(self, urls_file: str, interval: float, jitter: float,
+                 concurrency: int = DEFAULT_CONCURRENCY, per_host: int = DEFAULT_PER_HOST,
+                 pool_maxsize: Optional[int] = None, timeout: tuple = DEFAULT_TIMEOUT,
+                 check: Optional[Callable[[str], dict]] = None,
+                 reload_interval: float = DEFAULT_RELOAD_INTERVAL,
+                 sender: Optional[Callable[[dict], None]] = None, send_interval: float = DEFAULT_SEND_INTERVAL,
+                 use_address=False, rate: Optional[float] = None, burst: int = DEFAULT_BURST,
+                 ip_rate: Optional[float] = None, ip_burst: int = DEFAULT_BURST, head=False,
+                 max_body: Optional[int] = None, max_redirects: int = DEFAULT_MAX_REDIRECTS,
+                 resolver: Optional[Resolver] = None):
+        """
+        :param urls_file: файл со списком URL
+        :param interval: интервал проверки URL в секундах
+        :param jitter: максимальное отклонение интервала, доля от interval
+        :param concurrency: максимальное количество одновременных проверок
+        :param per_host: максимальное количество одновременных проверок одного хоста
+        :param pool_maxsize: максимальное количество соединений в пуле, по умолчанию per_host
+        :param timeout: (<connect timeout>, <read timeout>) для check_url
+        :param check: функция проверки одного URL, по умолчанию check_url с общей сессией
+        :param reload_interval: как часто проверять изменение файла со списком URL, в секундах
+        :param sender: функция отправки новых результатов {<url>: <результат>}, вызывается в отдельном потоке
+        :param send_interval: как часто вызывать sender, в секундах
+        :param use_address: подключаться к {#ADDRESS} из списка URL (znwcagent.py -A) вместо разрешения имен,
+            см. pinned_check
+        :param rate: запросов в секунду к одному scheme://host:port, None - без ограничения (см. RateLimiter)
+        :param burst: запросов к одному scheme://host:port подряд без ожидания
+        :param ip_rate: запросов в секунду к одному IP адресу, None - без ограничения
+        :param ip_burst: запросов к одному IP адресу подряд без ожидания
+        :param head: проверять запросом HEAD, GET - только если сервер отклоняет HEAD (см. check_url)
+        :param max_body: читать не больше max_body байт тела ответа, None - без ограничения
+        :param max_redirects: максимальное количество редиректов одной проверки
+        :param resolver: общий кэш разрешения имен для всех проверок, адреса хранятся до истечения TTL
+        """
+        self.urls_file = urls_file
+        self.scheduler = Scheduler(interval, jitter)
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.check = check
+        self.reload_interval = reload_interval
+        self.sender = sender
+        self.send_interval = send_interval
+        self.use_address = use_address
+        self.limiter = RateLimiter(rate, burst, ip_rate, ip_burst) if rate or ip_rate else None
+        self.head = head
+        self.max_body = max_body
+        self.max_redirects = max_redirects
+        self.resolver = resolver
+        # {<url>: <адрес>} из файла со списком URL
+        self.addresses = {}
+        self.results = {}
+        self._pending = {}
+        self._running = set()
+        self._tasks = set()
+        self._mtime = None
+
+    def load_urls(self, force=False) -> bool:
+        """
+        Перечитывает список URL, если файл изменился
+        :return: True, если список URL был перечитан
+        """
+        try:
+            mtime = os.stat(self.urls_file).st_mtime_ns
+            if not force and mtime == self._mtime:
+                return False
+            with open(self.urls_file) as f:
+                addresses = parse_url_addresses(f.read())
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return False
+        self._mtime = mtime
+        # словарь изменяется на месте, его читает функция проверки pinned_check
+        self.addresses.clear()
+        self.addresses.update(addresses)
+        _, removed = self.scheduler.set_urls(list(addresses))
+        for url in removed:
+            self.results.pop(url, None)
+            self._pending.pop(url, None)
+        return True
+
+    async def _probe(self, runner: ProbeRunner, url: str):
+        try:
+            result = await runner.probe(url)
+            result['clock'] = int(time.time())
+            if url in self.scheduler:
+                self.results[url] = result
+                self._pending[url] = result
+        finally:
+            self._running.discard(url)
+
+    def _start_due(self, runner: ProbeRunner):
+        for url in self.scheduler.pop_due():
+            if url in self._running:
+                # предыдущая проверка еще не завершилась
+                continue
+            self._running.add(url)
+            task = asyncio.ensure_future(self._probe(runner, url))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        """
+        Передает sender результаты, полученные после предыдущего вызова
+        """
+        if self.sender is None or not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.sender, pending)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+
+    def _origin_count(self) -> int:
+        return max(len({url_origin(url) for url in self.scheduler.urls}), 1)
+
+    def _pooled_check(self, pool_connections: int) -> tuple:
+        """
+        pooled_check с параметрами демона
+        :return: (<функция проверки>, <сессия>)
+        """
+        check, session = pooled_check(pool_connections, self.pool_maxsize or self.per_host, self.timeout,
+                                      self.head, self.max_body, self.max_redirects, self.resolver)
+        if self.use_address:
+            check = pinned_check(check, self.addresses)
+        return check, session
+
+    @staticmethod
+    async def _close_session(session, tasks: set, retired: list):
+        """
+        Закрывает сессию после завершения проверок, которые могли ее использовать
+        :param retired: список незакрытых сессий, из него сессия удаляется
+        """
+        await asyncio.gather(*tasks, return_exceptions=True)
+        session.close()
+        retired.remove(session)
+
+    async def run(self, stop: asyncio.Event):
+        """
+        Главный цикл, работает до установки stop
+        """
+        self.load_urls(force=True)
+        session = None
+        # сессии, замененные после перечитывания списка URL
+        retired = []
+        check = self.check
+        if check is None:
+            origins = self._origin_count()
+            check, session = self._pooled_check(origins)
+        elif self.use_address:
+            check = pinned_check(check, self.addresses)
+        runner = ProbeRunner(check, self.concurrency, self.per_host, self.limiter,
+                             self.addresses if self.use_address else None, self.resolver)
+        loop = asyncio.get_running_loop()
+        next_reload = loop.time() + self.reload_interval
+        next_send = loop.time() + self.send_interval
+        try:
+            while not stop.is_set():
+                now = loop.time()
+                if now >= next_reload:
+                    self.load_urls()
+                    # список мог быть перечитан и по SIGHUP
+                    if session is not None and self._origin_count() != origins:
+                        # пул сессии рассчитан на прежнее количество scheme://host:port, проверки,
+                        # начатые после замены, используют новую сессию (ProbeRunner.check читается при вызове)
+                        origins = self._origin_count()
+                        runner.check, new_session = self._pooled_check(origins)
+                        retired.append(session)
+                        asyncio.ensure_future(self._close_session(session, set(self._tasks), retired))
+                        session = new_session
+                    next_reload = now + self.reload_interval
+                if now >= next_send:
+                    asyncio.ensure_future(self.flush())
+                    next_send = now + self.send_interval
+                self._start_due(runner)
+                next_due = self.scheduler.next_due()
+                sleep = _MAX_SLEEP
+                if next_due is not None:
+                    sleep = min(max(next_due - self.scheduler.clock(), 0), _MAX_SLEEP)
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=sleep)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+            runner.close()
+            for old_session in list(retired):
+                old_session.close()
+            if session is not None:
+                session.close()
+        await self.flush()
+
+
+class _ResultsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        daemon = self.server.probe_daemon
+        parts = urlsplit(self.path)
+        if parts.path in ('/', '/results'):
+            self._reply(200, daemon.results.copy())
+        elif parts.path == '/result':
+            url = parse_qs(parts.query).get('url', [''])[0]
+            result = daemon.results.get(url)
+            if result is None:
+                self._reply(404, {})
+            else:
+                self._reply(200, result)
+        else:
+            self._reply(404, {})
+
+    def _reply(self, code: int, data: dict):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _ResultsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address: tuple, handler):
+        # IPv4 или IPv6 по адресу, '' - все адреса IPv4, как у ThreadingHTTPServer
+        host, port = server_address
+        self.address_family = socket.getaddrinfo(host or None, port, type=socket.SOCK_STREAM,
+                                                 flags=socket.AI_PASSIVE)[0][0]
+        super().__init__(server_address, handler)
+
+
+def serve_results(daemon: ProbeDaemon, host: str, port: int) -> ThreadingHTTPServer:
+    """
+    Запускает в отдельном потоке HTTP сервер, отдающий результаты проверок:
+        GET /results - все результаты {<url>: <результат>, ...}
+        GET /result?url=<url> - результат проверки одного URL, 404 если URL еще не проверялся
+    :param host: адрес IPv4 или IPv6 (без квадратных скобок) или имя
+    :return: сервер, для остановки вызвать shutdown()
+    """
+    server = _ResultsServer((host, port), _ResultsHandler)
+    server.probe_daemon = daemon
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,329 @@
+import abc
+import copy
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, Optional
+
+from znwclib.config_cache import read_json, write_json
+
+# dns (dnspython) и urllib3 импортируются при первом использовании: агенту без -n они не нужны,
+# а проверкам dnspython нужен только с указанными DNS серверами
+
+DEFAULT_WORKERS = 20
+# время хранения адресов, если TTL неизвестен (системный резолвер его не сообщает)
+DEFAULT_TTL = 60
+# время хранения отрицательного ответа (имени нет), если в ответе сервера нет SOA
+DEFAULT_NEGATIVE_TTL = 300
+# время хранения результата, если сервер не ответил (таймаут и т.п.)
+DEFAULT_FAILURE_TTL = 0
+DEFAULT_RESOLVE_TIMEOUT = 5.0
+
+
+def _soa_ttl(response) -> Optional[int]:
+    import dns.rdatatype
+
+    if response is None:
+        return None
+    for rrset in response.authority:
+        if rrset.rdtype == dns.rdatatype.SOA:
+            return min(rrset.ttl, rrset[0].minimum)
+    return None
+
+
+def _negative_ttl(e) -> Optional[int]:
+    """
+    TTL отрицательного ответа (NXDOMAIN, NoAnswer) из SOA записи ответа, None - если SOA нет
+    """
+    responses = list(e.kwargs.get('responses', {}).values()) or [e.kwargs.get('response')]
+    ttls = [ttl for ttl in map(_soa_ttl, responses) if ttl is not None]
+    return min(ttls) if ttls else None
+
+
+def lookup(host_name: str, lifetime: Optional[float] = None,
+           negative_ttl: float = DEFAULT_NEGATIVE_TTL, failure_ttl: float = DEFAULT_FAILURE_TTL) -> tuple:
+    """
+    Проверяет наличие A записи, как check_exist_host_name_dns
+    :param lifetime: максимальное время запроса, по умолчанию как у dns.resolver
+    :param negative_ttl: время хранения отрицательного ответа, если в ответе нет SOA записи
+    :param failure_ttl: время хранения результата, если сервер не ответил
+    :return: (<есть ли запись>, <время, до которого результат можно хранить, time.time()>)
+    """
+    import dns.exception
+    import dns.resolver
+
+    try:
+        answer = dns.resolver.resolve(host_name, lifetime=lifetime)
+        return True, answer.expiration
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+        ttl = _negative_ttl(e)
+        return False, time.time() + (ttl if ttl is not None else negative_ttl)
+    except dns.exception.DNSException:
+        return False, time.time() + failure_ttl
+
+
+class NameNotFound(socket.gaierror):
+    """
+    Имени нет в DNS (NXDOMAIN или нет записей), ttl - время хранения отрицательного ответа из SOA или None
+    """
+
+    def __init__(self, *args, ttl: Optional[float] = None):
+        super().__init__(*args)
+        self.ttl = ttl
+
+
+def system_lookup(host: str) -> tuple:
+    """
+    Адреса хоста через системный резолвер (getaddrinfo, учитывается /etc/hosts)
+    :return: ([<адрес>, ...], None - TTL неизвестен)
+    :raise socket.gaierror: имя не разрешается
+    """
+    from urllib3.util.connection import allowed_gai_family
+
+    addresses = socket.getaddrinfo(host, None, allowed_gai_family(), socket.SOCK_STREAM)
+    return list(dict.fromkeys(sa[0] for *_, sa in addresses)), None
+
+
+def nameserver_lookup(host: str, nameservers: list, timeout: float = DEFAULT_RESOLVE_TIMEOUT) -> tuple:
+    """
+    Адреса хоста (A, затем AAAA, если доступен IPv6) от указанных DNS серверов, требуется dnspython
+    :return: ([<адрес>, ...], <минимальный TTL записей>)
+    :raise NameNotFound: имени нет, с TTL отрицательного ответа
+    :raise socket.gaierror: серверы не ответили
+    """
+    import dns.exception
+    import dns.resolver
+    from urllib3.util.connection import allowed_gai_family
+
+    try:
+        return [str(ipaddress.ip_address(host))], None
+    except ValueError:
+        pass
+    resolver = dns.resolver.Resolver(configure=False)
+    resolver.nameservers = nameservers
+    rdtypes = ['A', 'AAAA'] if allowed_gai_family() != socket.AF_INET else ['A']
+    addresses, ttls, negative_ttls = [], [], []
+    error = None
+    for rdtype in rdtypes:
+        try:
+            answer = resolver.resolve(host, rdtype, lifetime=timeout)
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+            negative_ttls.append(_negative_ttl(e))
+            continue
+        except dns.exception.DNSException as e:
+            error = e
+            continue
+        addresses.extend(rdata.address for rdata in answer)
+        ttls.append(answer.rrset.ttl)
+    if not addresses:
+        if error is not None:
+            raise socket.gaierror(socket.EAI_AGAIN, f"{host}: {error}")
+        negative_ttls = [ttl for ttl in negative_ttls if ttl is not None]
+        raise NameNotFound(socket.EAI_NONAME, f"{host}: name not found",
+                           ttl=min(negative_ttls) if negative_ttls else None)
+    return list(dict.fromkeys(addresses)), min(ttls)
+
+
+class TTLCache(abc.ABC):
+    """
+    Основа кэшей DNS: записи {<имя>: (<значение>, <время истечения, clock>, ...)} хранятся до истечения,
+    каждое имя запрашивается одним потоком, одновременные запросы того же имени ждут его результата,
+    имена без актуальной записи можно запросить параллельно (fetch_many)
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, clock: Callable[[], float] = time.time):
+        """
+        :param workers: максимальное количество одновременных запросов fetch_many
+        :param clock: часы времени истечения записей
+        """
+        self.workers = workers
+        self.clock = clock
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._name_locks = {}
+
+    @abc.abstractmethod
+    def _fetch(self, name: str):
+        """
+        Запрашивает имя
+        :return: запись кэша, второй элемент - время истечения
+        """
+
+    def _fresh(self, name: str):
+        entry = self.entries.get(name)
+        if entry is not None and entry[1] > self.clock():
+            return entry
+        return None
+
+    def entry(self, name: str):
+        """
+        Актуальная запись имени, при отсутствии или истечении - запрашивает его
+        """
+        with self._lock:
+            entry = self._fresh(name)
+            if entry is not None:
+                return entry
+            name_lock = self._name_locks.setdefault(name, threading.Lock())
+        with name_lock:
+            with self._lock:
+                entry = self._fresh(name)
+            if entry is not None:
+                return entry
+            entry = self._fetch(name)
+            with self._lock:
+                self.entries[name] = entry
+                self._name_locks.pop(name, None)
+            return entry
+
+    def fetch_many(self, names: Iterable[str]) -> dict:
+        """
+        Актуальные записи имен, имена без актуальной записи запрашиваются параллельно
+        :return: {<имя>: <запись>}
+        """
+        names = list(dict.fromkeys(names))
+        missing = [name for name in names if self._fresh(name) is None]
+        if len(missing) > 1 and self.workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(missing))) as executor:
+                fetched = dict(zip(missing, executor.map(self.entry, missing)))
+        else:
+            fetched = {name: self.entry(name) for name in missing}
+        return {name: fetched[name] if name in fetched else self.entry(name) for name in names}
+
+
+class DNSCache(TTLCache):
+    """
+    Проверка DNS имен с кэшем: имена проверяются параллельно, каждое один раз,
+    результаты (в том числе отрицательные) хранятся до истечения TTL записи и могут сохраняться в файл
+    """
+
+    def __init__(self, cache_file: Optional[str] = None, workers: int = DEFAULT_WORKERS,
+                 lookup: Callable[[str], tuple] = lookup):
+        """
+        :param cache_file: файл для хранения результатов между запусками
+        :param workers: максимальное количество одновременных запросов
+        :param lookup: функция проверки одного имени, см. lookup
+        """
+        super().__init__(workers)
+        self.cache_file = cache_file
+        self.lookup = lookup
+        # имя -> [<есть ли запись>, <время истечения>]
+        self.entries = {}
+        # минимальное время истечения результатов, выданных check_names
+        self.expires = None
+        if cache_file:
+            self.load()
+
+    def load(self):
+        data = read_json(self.cache_file)
+        if data:
+            now = time.time()
+            self.entries = {name: entry for name, entry in data.get('entries', {}).items() if entry[1] > now}
+
+    def save(self) -> bool:
+        """
+        Сохраняет неистекшие результаты в cache_file
+        :return: True, если файл сохранен
+        """
+        if not self.cache_file:
+            return False
+        now = time.time()
+        return write_json(self.cache_file, {
+            'entries': {name: entry for name, entry in self.entries.items() if entry[1] > now},
+        })
+
+    def _fetch(self, name: str) -> list:
+        exists, expires = self.lookup(name)
+        return [exists, expires]
+
+    def check_names(self, names: Iterable[str]) -> dict:
+        """
+        Проверяет имена, имена без актуального результата в кэше проверяются параллельно
+        :return: {<имя>: <есть ли запись>}
+        """
+        result = {}
+        for name, (exists, expires) in self.fetch_many(names).items():
+            result[name] = exists
+            if self.expires is None or expires < self.expires:
+                self.expires = expires
+        return result
+
+
+class Resolver(TTLCache):
+    """
+    Общий кэш разрешения имен для проверок (new_session(resolver=...)): каждое имя разрешается один раз
+    и хранится до истечения TTL, отсутствующие имена - negative_ttl, прочие ошибки - failure_ttl.
+    Одновременные запросы одного имени ждут первый из них. Имена можно разрешить заранее и параллельно (prefetch)
+    """
+
+    def __init__(self, nameservers: Optional[list] = None, ttl: float = DEFAULT_TTL,
+                 negative_ttl: float = DEFAULT_NEGATIVE_TTL, failure_ttl: float = DEFAULT_FAILURE_TTL,
+                 timeout: float = DEFAULT_RESOLVE_TIMEOUT, workers: int = DEFAULT_WORKERS,
+                 lookup: Optional[Callable[[str], tuple]] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        :param nameservers: IP адреса DNS серверов, по умолчанию системный резолвер.
+            Для указанных серверов используется dnspython, TTL берется из ответа
+        :param ttl: время хранения адресов, если TTL неизвестен
+        :param negative_ttl: время хранения отсутствия имени, если TTL отрицательного ответа неизвестен
+        :param failure_ttl: время хранения остальных ошибок разрешения имени (сервер не ответил и т.п.)
+        :param timeout: максимальное время запроса к DNS серверам
+        :param workers: максимальное количество одновременных запросов prefetch
+        :param lookup: функция разрешения одного имени, см. system_lookup
+        """
+        super().__init__(workers, clock)
+        if lookup is None:
+            if nameservers:
+                # ImportError сразу, а не при первой проверке
+                import dns.resolver  # noqa: F401
+                lookup = partial(nameserver_lookup, nameservers=list(nameservers), timeout=timeout)
+            else:
+                lookup = system_lookup
+        self.lookup = lookup
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.failure_ttl = failure_ttl
+        # имя -> (<адреса или исключение>, <время истечения, clock>, <время разрешения, мс>)
+        self.entries = {}
+
+    def _error_ttl(self, e: BaseException) -> float:
+        if isinstance(e, socket.gaierror) and e.args and e.args[0] == socket.EAI_NONAME:
+            ttl = getattr(e, 'ttl', None)
+            return self.negative_ttl if ttl is None else ttl
+        return self.failure_ttl
+
+    def _fetch(self, host: str) -> tuple:
+        started = time.perf_counter()
+        try:
+            addresses, ttl = self.lookup(host)
+            value, ttl = addresses, self.ttl if ttl is None else ttl
+        except (OSError, UnicodeError) as e:
+            value, ttl = e, self._error_ttl(e)
+        return value, self.clock() + ttl, round((time.perf_counter() - started) * 1000, 3)
+
+    def resolve(self, host: str) -> list:
+        """
+        Адреса хоста из кэша, при отсутствии или истечении - разрешает имя
+        :raise socket.gaierror: имя не разрешается (или другое исключение lookup, например, UnicodeError)
+        """
+        value = self.entry(host.lower())[0]
+        if isinstance(value, BaseException):
+            # одно исключение из кэша не выбрасывается в нескольких потоках: копия того же типа
+            raise copy.copy(value)
+        return value
+
+    def lookup_ms(self, host: str) -> Optional[float]:
+        """
+        Время разрешения имени, которым получен текущий результат в кэше, мс
+        """
+        entry = self.entries.get(host.lower())
+        return entry[2] if entry is not None else None
+
+    def prefetch(self, hosts: Iterable[str]) -> dict:
+        """
+        Разрешает имена без актуального результата в кэше параллельно
+        :return: {<имя>: <адреса или None, если имя не разрешается>}
+        """
+        entries = self.fetch_many(host.lower() for host in hosts if host)
+        return {host: None if isinstance(entry[0], BaseException) else entry[0] for host, entry in entries.items()}
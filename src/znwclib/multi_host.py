@@ -0,0 +1,118 @@
+import os.path
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, Optional
+
+
+def read_manifest(manifest_file: str) -> list:
+    """
+    Читает список хостов: строки '<hostname> <файл конфигурации или дамп nginx -T>',
+    пустые строки и строки, начинающиеся с #, пропускаются.
+    Относительные пути считаются от каталога файла списка
+    :return: [(<hostname>, <файл>), ...]
+    :raise ValueError: если строка не из двух полей или hostname нельзя использовать как имя файла
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_file))
+    targets = []
+    with open(manifest_file) as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split(None, 1)
+            if len(fields) != 2:
+                raise ValueError(f"{manifest_file}:{line_no}: expected '<hostname> <config file>'")
+            hostname, config_file = fields
+            if '/' in hostname or hostname in ('.', '..'):
+                raise ValueError(f"{manifest_file}:{line_no}: bad hostname {hostname!r}")
+            targets.append((hostname, os.path.join(base_dir, config_file)))
+    return targets
+
+
+def discover_host(hostname: str, config_file: str, dump=False, default_port: int = 80, return_code: int = 399,
+                  skip_locations=False, dns_check=False, listen_address=False) -> dict:
+    """
+    Список URL одного хоста. Исключения не выбрасываются, любая ошибка возвращается в 'error'
+    :param dump: config_file - вывод nginx -T
+    :param listen_address: URL вместе с адресами директив listen, см. get_URLs_from_config
+    :return: {'hostname': ..., 'config_file': ..., 'time': <время обработки, с>,
+              'urls': <список URL> или 'error': 'Error: ...'}
+    """
+    start = time.perf_counter()
+    result = {'hostname': hostname, 'config_file': config_file}
+    try:
+        from znwclib.nginx_config import get_URLs_from_config
+        config_dump = None
+        if dump:
+            with open(config_file, encoding='utf-8', errors='replace') as f:
+                config_dump = f.read()
+        urls = get_URLs_from_config(config_file, hostname, default_port, return_code, skip_locations, dns_check,
+                                    config_dump=config_dump, listen_address=listen_address)
+    except Exception as e:
+        urls = f"Error: {e.__class__.__name__}: {e}"
+    if isinstance(urls, str):
+        result['error'] = urls
+    else:
+        result['urls'] = urls
+    result['time'] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def _error_result(hostname: str, config_file: str, e: BaseException) -> dict:
+    return {'hostname': hostname, 'config_file': config_file, 'time': None,
+            'error': f"Error: {e.__class__.__name__}: {e}"}
+
+
+def discover_host_isolated(hostname: str, config_file: str, **options) -> dict:
+    """
+    discover_host в отдельном процессе: падение процесса возвращается как ошибка этого хоста
+    """
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        try:
+            return executor.submit(discover_host, hostname, config_file, **options).result()
+        except Exception as e:
+            return _error_result(hostname, config_file, e)
+
+
+def discover_hosts(targets: Iterable[tuple], workers: Optional[int] = None, **options) -> Iterator[dict]:
+    """
+    Обрабатывает конфигурации нескольких хостов параллельно в пуле процессов (разбор crossplane
+    нагружает процессор, поэтому потоки не помогают). Ошибка одного хоста, в том числе падение
+    процесса, не влияет на остальные: после падения процесса пул перестает работать (BrokenProcessPool),
+    полученные результаты сохраняются, а необработанные хосты обрабатываются каждый в своем процессе.
+    :param targets: [(<hostname>, <файл>), ...], см. read_manifest
+    :param workers: количество процессов, по умолчанию os.cpu_count(), 1 - без пула, в текущем процессе
+    :param options: параметры discover_host
+    :return: генератор результатов discover_host в порядке targets
+    """
+    targets = list(targets)
+    if workers == 1 or len(targets) <= 1:
+        for hostname, config_file in targets:
+            yield discover_host(hostname, config_file, **options)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(discover_host, hostname, config_file, **options)
+                   for hostname, config_file in targets]
+        for index, ((hostname, config_file), future) in enumerate(zip(targets, futures)):
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                break
+            except Exception as e:
+                yield _error_result(hostname, config_file, e)
+        else:
+            return
+    # пул сломан: какой хост уронил процесс, неизвестно, поэтому каждый необработанный - в своем процессе
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as threads:
+        retries = [threads.submit(discover_host_isolated, hostname, config_file, **options)
+                   if isinstance(future.exception(), BrokenProcessPool) else None
+                   for (hostname, config_file), future in zip(targets[index:], futures[index:])]
+        for (hostname, config_file), future, retry in zip(targets[index:], futures[index:], retries):
+            if retry is not None:
+                yield retry.result()
+                continue
+            try:
+                yield future.result()
+            except Exception as e:
+                yield _error_result(hostname, config_file, e)
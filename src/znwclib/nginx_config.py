@@ -1,16 +1,37 @@
+import collections
+import errno
+import fnmatch
+import functools
+import glob
+import hashlib
+import json
+import os.path
 import re
-from typing import Optional, Union, Tuple
+from typing import TYPE_CHECKING, Callable, Optional, Union, Tuple
 
 import crossplane
-import dns.exception
-import dns.resolver
-import validators
+
+from znwclib.config_cache import path_signature
+from znwclib.server_store import ServerStore, URLList
+
+if TYPE_CHECKING:
+    from znwclib.dns_cache import DNSCache
+
+# dns и validators импортируются при первом использовании: dns нужен только для --check-dns,
+# а validators - только если в конфигурации есть имена, которые нужно проверить
 
 _re_patt_port = re.compile(r"^\s*([^:]+):\s+(.+)$")
 _re_patt_assignment = re.compile(r"^\s*(.+)\s+=\s+(.+)$")
 _re_patt_split = re.compile(r"[\s,]+")
 _re_patt_listen_port = re.compile(r"(^|:)(?P<port>\d+)$")
 
+# адреса listen, означающие все адреса хоста
+WILDCARD_ADDRESSES = ('*', '0.0.0.0', '::')
+
+# размеры кэшей is_domain и _var_substitution
+DOMAIN_CACHE_SIZE = 8192
+VAR_CACHE_SIZE = 256
+
 
 def process_special_comments(directives_list: list, hostname_var: str) -> dict:
     """
@@ -56,17 +77,38 @@ def process_special_comments(directives_list: list, hostname_var: str) -> dict:
     return res
 
 
+@functools.lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def is_domain(name: str) -> bool:
+    """
+    Проверяет, что name - корректное доменное имя (validators.domain).
+    Результаты кэшируются, в больших конфигурациях одни и те же имена повторяются
+    """
+    import validators
+    return bool(validators.domain(name))
+
+
+@functools.lru_cache(maxsize=VAR_CACHE_SIZE)
+def _var_substitution(variables: tuple) -> Callable[[str], str]:
+    """
+    Функция подстановки переменных ((<имя>, <значение>), ...) за один проход по строке
+    """
+    values = dict(variables)
+    # длинные имена первыми, чтобы $hostname не заменялся как $host + name
+    pattern = re.compile('|'.join(map(re.escape, sorted(values, key=len, reverse=True))))
+    return functools.partial(pattern.sub, lambda m: values[m.group(0)])
+
+
 def prep_name_var(name: str, special_comments: dict) -> str:
     """
-    Заменяет в имени name переменные на имеющиеся в special_comments
+    Заменяет в имени name переменные на имеющиеся в special_comments.
+    Все переменные заменяются за один проход одним регулярным выражением, которое составляется
+    один раз для каждого набора переменных
     :param name:
     :param special_comments:
     :return:
     """
     if special_comments and special_comments.get('var'):
-        variables = special_comments['var']
-        for var in variables:
-            name = name.replace(var, variables[var])
+        name = _var_substitution(tuple(special_comments['var'].items()))(name)
     return name
 
 
@@ -80,7 +122,7 @@ def prep_server_name(name: str, special_comments: dict, single=False) -> Union[s
     :return:
     """
     res = special_comments['replace'].get(name, [])
-    res = [n for n in res if validators.domain(n)]
+    res = [n for n in res if is_domain(n)]
     if res:
         return res
 
@@ -93,7 +135,7 @@ def prep_server_name(name: str, special_comments: dict, single=False) -> Union[s
     elif name.startswith('.'):
         name = name[1:]
 
-    return name if validators.domain(name) else None
+    return name if is_domain(name) else None
 
 
 def get_server_names(server_block: list, hostname_var: str, special_comments: dict = None) -> Optional[list]:
@@ -220,6 +262,32 @@ def get_all_listen_directives(server_block, default_port=80, server_ssl_on=False
     return listens
 
 
+def get_listen_address(listen_args, wildcard_address: Optional[str] = None) -> Optional[str]:
+    """
+    Адрес из аргументов директивы listen, к которому можно подключиться для проверки:
+    listen 1.1.1.1:80 - 1.1.1.1, listen [::1]:8080 - ::1, listen localhost:80 - localhost.
+    Без адреса или *, 0.0.0.0, [::] сервер слушает все адреса хоста, какой из них доступен проверяющему,
+    из конфигурации не узнать: возвращается wildcard_address (например, адрес хоста, на котором работает nginx),
+    по умолчанию None - проверка разрешает имя из URL
+
+    :param listen_args: список аргументов директивы listen
+    :param wildcard_address: адрес для сервера, слушающего все адреса
+    :return: адрес или None для unix сокета и, без wildcard_address, для всех адресов
+    """
+    if not listen_args:
+        return wildcard_address
+    arg = listen_args[0]
+    if arg.startswith('unix:'):
+        return None
+    if arg.startswith('['):
+        address = arg[1:arg.find(']')]
+    elif arg.isdigit():
+        return wildcard_address
+    else:
+        address = arg.rsplit(':', 1)[0] if _re_patt_listen_port.search(arg) else arg
+    return wildcard_address if address in WILDCARD_ADDRESSES else address
+
+
 def prepare_location(location_args: list, location_block: list, special_comments: dict) -> Optional[str]:
     """
     Подготовка location's
@@ -303,25 +371,68 @@ def get_locations(server_block: list, hostname_var, return_code=399) -> Tuple[li
     :param return_code:
     :return:
     """
-    locations: list = []
-    for d in server_block:
-        dd = d['directive'].lower()
-        if dd == 'location':
-            da = d['args']
+    return collect_locations(split_block(server_block)['location'], hostname_var, return_code)
+
+
+# директивы, которые собирает split_block; return и location сравниваются без учета регистра
+_SPLIT_DIRECTIVES = ('#', 'server_name', 'listen', 'ssl', 'stub_status')
+_SPLIT_DIRECTIVES_LOWER = ('return', 'location')
+
+
+def split_block(block: list) -> dict:
+    """
+    Раскладывает директивы блока по типам за один проход: комментарии, server_name, listen, ssl,
+    stub_status, return, location. Функции process_special_comments, get_server_names, check_ssl_on,
+    get_all_listen_directives, skip_on_return, prepare_location дают для этих списков тот же результат,
+    что и для всего блока
+    :return: {<директива>: [<директивы блока>, ...], ...}
+    """
+    parts = {name: [] for name in _SPLIT_DIRECTIVES + _SPLIT_DIRECTIVES_LOWER}
+    for d in block:
+        name = d['directive']
+        if name in _SPLIT_DIRECTIVES:
+            parts[name].append(d)
+        else:
+            name = name.lower()
+            if name in _SPLIT_DIRECTIVES_LOWER:
+                parts[name].append(d)
+    return parts
+
+
+def collect_locations(location_directives: list, hostname_var, return_code=399) -> Tuple[list, bool]:
+    """
+    То же, что get_locations, для списка директив location. Вложенные location обходятся
+    без рекурсии, с явным стеком, каждый блок location просматривается один раз (split_block)
+    :return: (<список location>, <True, если сервер пропускается из-за return в location />)
+    """
+    # уровни вложенности: (<итератор по директивам location уровня>, <найденные на уровне location>)
+    stack = [(iter(location_directives), [])]
+    while True:
+        directives, found = stack[-1]
+        nested = None
+        for d in directives:
             db = d.get('block')
-            special_comments = process_special_comments(db, hostname_var)
-            location = prepare_location(da, db, special_comments)
-            if db and skip_on_return(db, return_code):
+            parts = split_block(db)
+            special_comments = process_special_comments(parts['#'], hostname_var)
+            location = prepare_location(d['args'], parts['stub_status'], special_comments)
+            if db and skip_on_return(parts['return'], return_code):
                 if location == '/':
-                    return [], True
+                    # отменяет все location своего уровня
+                    found = None
+                    break
                 continue
             if location:
-                locations.append(location)
-            nested_locations, _ = get_locations(db, hostname_var, return_code)
-            if nested_locations:
-                locations.extend(nested_locations)
-
-    return locations, False
+                found.append(location)
+            nested = parts['location']
+            break
+        if nested is not None:
+            stack.append((iter(nested), []))
+            continue
+        stack.pop()
+        if not stack:
+            return (found, False) if found is not None else ([], True)
+        if found:
+            stack[-1][1].extend(found)
 
 
 def delFileLine(block: list):
@@ -338,7 +449,7 @@ def delFileLine(block: list):
 
 
 def process_servers(html_block: list, hostname_var, default_port=80, return_code=399, skip_locations=False,
-                    debug=False):
+                    debug=False, server_cache: Optional[dict] = None, listen_address=False):
     """
     Обрабатывает html block crossplane.parse. возвращает список словарей в котором лежат server_name's & location's
 
@@ -365,7 +476,12 @@ def process_servers(html_block: list, hostname_var, default_port=80, return_code
     Любое имя, в том числе некорректное, может быть заменено с помощью специальных комментариев на другое.
 
     :param debug: for debug purposes
+    :param server_cache: результаты обработки блоков server с прошлого вызова {<хэш блока>: <сервер>},
+        блоки, не изменившиеся с тех пор, повторно не обрабатываются. Все блоки этого вызова записываются
+        в него, чтобы убрать остальные, можно передать collections.ChainMap(<новый словарь>, <старый>).
+        В режиме debug не используется
     :param skip_locations: не обрабатывать блоки locations
+    :param listen_address: добавлять адреса директив listen, см. process_server
     :param html_block: html block from crossplane.parse
     :param default_port: default listen port
     :param hostname_var: variable $hostname
@@ -376,31 +492,89 @@ def process_servers(html_block: list, hostname_var, default_port=80, return_code
                 'listen': tuple[str],
                 }]
     """
-    ret_val = []
+    return list(iter_process_servers(html_block, hostname_var, default_port, return_code, skip_locations, debug,
+                                     server_cache, listen_address))
+
+
+def _block_without_positions(block: list) -> list:
+    """
+    Блок crossplane без номеров строк и имен файлов директив: от них результат обработки не зависит
+    """
+    return [{key: _block_without_positions(value) if key == 'block' else value
+             for key, value in directive.items() if key not in ('line', 'file')} for directive in block]
+
+
+def iter_process_servers(html_block: list, hostname_var, default_port=80, return_code=399, skip_locations=False,
+                         debug=False, server_cache: Optional[dict] = None, listen_address=False):
+    """
+    Генератор серверов process_servers: блоки server обрабатываются по мере выдачи,
+    поэтому список словарей всех серверов не нужен (см. ServerStore)
+    """
     ssl_on = check_ssl_on(html_block)
     for d in html_block:
         if d['directive'] == 'server':
             server_block = d['block']
-            if skip_on_return(server_block, return_code):
+            parts = split_block(server_block)
+            if skip_on_return(parts['return'], return_code):
                 continue
-            ssl_on = ssl_on or check_ssl_on(server_block)
-            server_names = get_server_names(server_block, hostname_var)
-            if server_names:
-                locations, skip_root = get_locations(server_block, hostname_var, return_code)
-                if skip_root:
-                    continue
-                server = {
-                    'server_names': server_names,
-                    'locations': locations if not skip_locations else [],
-                    'listens': get_all_listen_directives(server_block, default_port, ssl_on)
-                }
+            ssl_on = ssl_on or check_ssl_on(parts['ssl'])
+            if server_cache is None or debug:
+                server = process_server(server_block, hostname_var, default_port, return_code, skip_locations,
+                                        ssl_on, parts, listen_address)
+            else:
+                # сдвиг блока в файле (строка выше) не меняет ключ
+                key = hashlib.sha1(json.dumps([ssl_on, _block_without_positions(server_block)])
+                                   .encode('utf-8')).hexdigest()
+                if key in server_cache:
+                    server = server_cache[key]
+                    server_cache[key] = server
+                    if server:
+                        # после json списки вместо кортежей
+                        server = dict(server, listens=[tuple(listen) for listen in server['listens']])
+                else:
+                    server = server_cache[key] = process_server(server_block, hostname_var, default_port,
+                                                                return_code, skip_locations, ssl_on, parts,
+                                                                listen_address)
+            if server:
                 if debug:
                     server['debug'] = server_block
-                ret_val.append(server)
-    return ret_val
+                yield server
+
+
+def process_server(server_block: list, hostname_var, default_port=80, return_code=399, skip_locations=False,
+                   ssl_on=False, parts: Optional[dict] = None, listen_address=False) -> Optional[dict]:
+    """
+    Обрабатывает один блок server, см. process_servers.
+    Директивы блока просматриваются один раз (split_block), вложенные location - без рекурсии
+    :param ssl_on: включена устаревшая директива ssl on
+    :param parts: результат split_block(server_block), если уже есть
+    :param listen_address: добавить 'addresses' - адреса директив listen (get_listen_address)
+        в том же порядке, что и 'listens'. Строка - адрес для серверов, слушающих все адреса (wildcard_address)
+    :return: {'server_names': ..., 'locations': ..., 'listens': ...} или None, если сервер пропускается
+    """
+    if parts is None:
+        parts = split_block(server_block)
+    special_comments = process_special_comments(parts['#'], hostname_var)
+    server_names = get_server_names(parts['server_name'], hostname_var, special_comments)
+    if not server_names:
+        return None
+    locations, skip_root = collect_locations(parts['location'], hostname_var, return_code)
+    if skip_root:
+        return None
+    server = {
+        'server_names': server_names,
+        'locations': locations if not skip_locations else [],
+        'listens': get_all_listen_directives(parts['listen'], default_port, ssl_on)
+    }
+    if listen_address:
+        wildcard_address = listen_address if isinstance(listen_address, str) else None
+        server['addresses'] = [get_listen_address(d['args'], wildcard_address) for d in parts['listen']]
+    return server
 
 
 def check_exist_host_name_dns(host_name):
+    import dns.exception
+    import dns.resolver
     try:
         dns.resolver.resolve(host_name)
         return True
@@ -408,54 +582,327 @@ def check_exist_host_name_dns(host_name):
         return False
 
 
-def get_URLs_from_config(config_file_name: str, hostname_var: str, default_port: int = 80,
-                         return_code: int = 399, skip_locations=False, dns_check=False, debug=False):
-    pl = crossplane.parse(config_file_name, comments=True, combine=True, ignore=('types', 'events',))
+def include_dirs(pattern: str) -> list:
+    """
+    Каталоги, в которых ищутся файлы директивы include: каталог до первого шаблона и все каталоги,
+    через которые проходит шаблон, например, для /etc/nginx/sites/*/conf.d/*.conf - /etc/nginx/sites,
+    /etc/nginx/sites/<каталог> и /etc/nginx/sites/<каталог>/conf.d
+    """
+    path = os.path.dirname(pattern)
+    parts = []
+    while glob.has_magic(path):
+        path, part = os.path.split(path)
+        parts.append(part)
+    dirs = [path]
+    for part in reversed(parts):
+        path = os.path.join(path, part)
+        dirs.extend(name for name in sorted(glob.glob(path)) if os.path.isdir(name))
+    return dirs
+
+
+def combine_configs(payload: dict, depends_on: Optional[list] = None) -> list:
+    """
+    Собирает конфигурацию из файлов, разобранных crossplane.parse(combine=False),
+    подставляя вместо директив include директивы включаемых файлов (как crossplane.parse(combine=True))
+    :param payload: результат crossplane.parse
+    :param depends_on: если передан список, в него добавляются все прочитанные файлы и каталоги,
+        в которых ищутся файлы директив include. Результат разбора не изменится, пока не изменятся они.
+    :return: список директив главного файла конфигурации
+    """
+    configs = payload['config']
+
+    def perform_includes(block, file_name):
+        for stmt in block:
+            stmt.setdefault('file', file_name)
+            if 'block' in stmt:
+                stmt['block'] = list(perform_includes(stmt['block'], file_name))
+            if 'includes' in stmt:
+                if depends_on is not None and stmt['args']:
+                    pattern = stmt['args'][0]
+                    if not os.path.isabs(pattern):
+                        pattern = os.path.join(os.path.dirname(configs[0]['file']), pattern)
+                    depends_on.extend(include_dirs(pattern))
+                for index in stmt['includes']:
+                    yield from perform_includes(configs[index]['parsed'], configs[index]['file'])
+            else:
+                # сама директива include не добавляется
+                yield stmt
+
+    if depends_on is not None:
+        depends_on.extend(config['file'] for config in configs)
+    parsed = list(perform_includes(configs[0]['parsed'], configs[0]['file']))
+    if depends_on is not None:
+        depends_on[:] = list(dict.fromkeys(depends_on))
+    return parsed
+
+
+def _copy_block(block: list) -> list:
+    return [dict(stmt, block=_copy_block(stmt['block'])) if 'block' in stmt else dict(stmt) for stmt in block]
+
+
+def _find_files(pattern: str) -> list:
+    """
+    Файлы директивы include на диске, как их ищет crossplane
+    :raise OSError: если файл без шаблона не удается открыть
+    """
+    if glob.has_magic(pattern):
+        return sorted(glob.glob(pattern))
+    open(pattern).close()
+    return [pattern]
+
+
+def _parse_files(config_file_name: str, parse_file: Callable[[int, str], dict],
+                 find_files: Callable[[str], list]) -> dict:
+    """
+    Разбирает главный файл и все включаемые им файлы, результат в формате crossplane.parse(combine=False)
+    :param parse_file: (<индекс файла>, <файл>) -> {'file', 'status', 'errors', 'parsed'}
+    :param find_files: <шаблон include> -> список файлов, OSError, если файл не найден
+    """
+    config_dir = os.path.dirname(config_file_name)
+    payload = {'status': 'ok', 'errors': [], 'config': []}
+    file_names = [config_file_name]
+    included = {config_file_name: 0}
+
+    def add_error(config, error, line):
+        config['status'] = payload['status'] = 'failed'
+        config['errors'].append({'error': error, 'line': line})
+        payload['errors'].append({'file': config['file'], 'error': error, 'line': line})
+
+    def resolve_includes(config, block):
+        for stmt in block:
+            if stmt['directive'] == 'include' and stmt['args']:
+                pattern = stmt['args'][0]
+                if not os.path.isabs(pattern):
+                    pattern = os.path.join(config_dir, pattern)
+                try:
+                    fnames = find_files(pattern)
+                except OSError as e:
+                    fnames = []
+                    add_error(config, str(e), stmt['line'])
+                stmt['includes'] = []
+                for fname in fnames:
+                    if fname not in included:
+                        included[fname] = len(file_names)
+                        file_names.append(fname)
+                    stmt['includes'].append(included[fname])
+            if 'block' in stmt:
+                resolve_includes(config, stmt['block'])
+
+    # file_names дополняется в resolve_includes
+    for index, file_name in enumerate(file_names):
+        config = parse_file(index, file_name)
+        if config['status'] == 'failed':
+            payload['status'] = 'failed'
+            payload['errors'].extend(dict(err, file=file_name) for err in config['errors'])
+        resolve_includes(config, config['parsed'])
+        payload['config'].append(config)
+    return payload
+
+
+def parse_config_files(config_file_name: str, files_cache: Optional[dict] = None) -> dict:
+    """
+    Разбирает конфигурацию как crossplane.parse(combine=False), но каждый файл отдельно (single=True),
+    поэтому разбор файла, не изменившегося с прошлого вызова, берется из files_cache.
+    Включаемые файлы разбираются без проверки контекста директив, т.к. он зависит от места директивы include.
+    :param files_cache: {<файл>: {'signature': <размер и время изменения>, 'parsed': <директивы>}},
+        дополняется разобранными файлами, файлы, которые больше не используются, удаляются
+    :return: результат в формате crossplane.parse
+    """
+    if files_cache is None:
+        files_cache = {}
+
+    def parse_file(index, file_name):
+        signature = path_signature(file_name)
+        entry = files_cache.get(file_name)
+        if entry is None or entry['signature'] != signature:
+            pl = crossplane.parse(file_name, comments=True, single=True, check_ctx=index == 0,
+                                  ignore=('types', 'events',))
+            files_cache.pop(file_name, None)
+            if pl['status'] != 'ok' or signature is None:
+                return pl['config'][0]
+            entry = files_cache[file_name] = {'signature': signature, 'parsed': pl['config'][0]['parsed']}
+        # _parse_files и combine_configs изменяют директивы
+        return {'file': file_name, 'status': 'ok', 'errors': [], 'parsed': _copy_block(entry['parsed'])}
+
+    payload = _parse_files(config_file_name, parse_file, _find_files)
+    used = {config['file'] for config in payload['config']}
+    for file_name in list(files_cache):
+        if file_name not in used:
+            del files_cache[file_name]
+    return payload
+
+
+_re_dump_file = re.compile(r'^# configuration file (.+):$', re.MULTILINE)
+
+
+def split_config_dump(dump: str) -> dict:
+    """
+    Разбивает вывод nginx -T на файлы. Строки до первого файла (сообщения nginx -t) пропускаются
+    :param dump: вывод nginx -T
+    :return: {<файл>: <содержимое>}, первым идет главный файл конфигурации
+    """
+    files = {}
+    found = list(_re_dump_file.finditer(dump))
+    for m, next_m in zip(found, found[1:] + [None]):
+        content = dump[m.end() + 1:next_m.start() if next_m else len(dump)]
+        # nginx добавляет перевод строки после каждого файла
+        files.setdefault(m.group(1), content[:-1] if content.endswith('\n') else content)
+    return files
+
+
+def _match_path(pattern: str, file_name: str) -> bool:
+    """
+    Соответствие файла шаблону как в glob: * и ? не совпадают с / и с точкой в начале имени
+    """
+    pattern_parts = pattern.split('/')
+    name_parts = file_name.split('/')
+    return len(pattern_parts) == len(name_parts) and all(
+        fnmatch.fnmatchcase(name, part) and (not name.startswith('.') or part.startswith('.'))
+        for part, name in zip(pattern_parts, name_parts))
+
+
+def parse_config_dump(dump: str) -> dict:
+    """
+    Разбирает вывод nginx -T как crossplane.parse(combine=False). Включаемые файлы берутся из дампа,
+    файлы конфигурации на диске не читаются, поэтому дампы можно собрать с разных серверов и разбирать
+    в одном месте.
+    :param dump: вывод nginx -T
+    :return: результат в формате crossplane.parse
+    """
+    import tempfile
+
+    files = split_config_dump(dump)
+    if not files:
+        return {'status': 'failed', 'errors': [{'file': None, 'error': 'no configuration files in nginx -T dump',
+                                                'line': None}], 'config': []}
+
+    def find_files(pattern):
+        if glob.has_magic(pattern):
+            return sorted(file_name for file_name in files if _match_path(pattern, file_name))
+        if pattern not in files:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), pattern)
+        return [pattern]
+
+    # crossplane разбирает только файлы, поэтому каждый файл дампа записывается во временный каталог
+    with tempfile.TemporaryDirectory() as tmp:
+        def parse_file(index, file_name):
+            tmp_name = os.path.join(tmp, f"{index}.conf")
+            with open(tmp_name, 'w', encoding='utf-8') as f:
+                f.write(files[file_name])
+            config = crossplane.parse(tmp_name, comments=True, single=True, check_ctx=index == 0,
+                                      ignore=('types', 'events',))['config'][0]
+            config['file'] = file_name
+            for err in config['errors']:
+                err['error'] = err['error'].replace(tmp_name, file_name)
+            return config
+
+        return _parse_files(next(iter(files)), parse_file, find_files)
+
+
+def iter_servers_urls(servers: Union[list, ServerStore], skip_locations=False, debug=False,
+                      name_exists: Optional[dict] = None, listen_address=False):
+    """
+    Генератор URL из результата process_servers
+    :param servers: результат process_servers или ServerStore
+    :param name_exists: {<имя сервера>: <есть ли запись в DNS>}, если передан, имена без записи пропускаются
+    :param listen_address: вместе с URL выдавать адрес директивы listen, process_servers должен быть
+        вызван с listen_address=True
+    :return: URL, при debug - (<URL>, <блок server>), при listen_address - (<URL>, <адрес или None>)
+    """
+    if not isinstance(servers, ServerStore):
+        servers = ServerStore(servers)
+    return servers.iter_urls(skip_locations, debug, name_exists, listen_address)
+
+
+def servers_to_urls(servers: Union[list, ServerStore], skip_locations=False, debug=False,
+                    name_exists: Optional[dict] = None, listen_address=False) -> list:
+    """
+    Составляет список URL из результата process_servers, см. iter_servers_urls
+    """
+    return list(iter_servers_urls(servers, skip_locations, debug, name_exists, listen_address))
+
+
+def iter_URLs_from_config(config_file_name: str, hostname_var: str, default_port: int = 80,
+                          return_code: int = 399, skip_locations=False, dns_check=False, debug=False,
+                          depends_on: Optional[list] = None, parse_cache: Optional[dict] = None,
+                          dns_cache: Optional['DNSCache'] = None, config_dump: Optional[str] = None,
+                          listen_address=False) -> Union[URLList, str]:
+    """
+    Как get_URLs_from_config, но вместо списка URL возвращает URLList: серверы хранятся в компактном виде
+    (ServerStore), а строки URL составляются при каждом проходе.
+    Конфигурация разбирается и обрабатывается до возврата, ошибки возвращаются строкой 'Error: ...'
+    Параметры см. get_URLs_from_config
+    """
+    server_cache = None
+    if config_dump is not None:
+        pl = parse_config_dump(config_dump)
+        # файлы дампа не читаются с диска, результат зависит только от самого дампа
+        depends_on = None
+    elif parse_cache is None:
+        pl = crossplane.parse(config_file_name, comments=True, ignore=('types', 'events',))
+    else:
+        pl = parse_config_files(config_file_name, parse_cache.setdefault('files', {}))
+    if parse_cache is not None:
+        servers_key = [hostname_var, default_port, return_code, skip_locations, listen_address]
+        if parse_cache.get('servers_key') != servers_key or 'servers' not in parse_cache:
+            parse_cache.update(servers_key=servers_key, servers={})
+        if not debug:
+            # в кэше остаются только блоки server этого вызова
+            server_cache = collections.ChainMap({}, parse_cache['servers'])
     if pl['status'] == 'failed':
         return 'Error: ' + ', '.join([err['error'] for err in pl['errors']])
-    config = pl['config'][0]['parsed']
-    # looking for a directive http
-    # http_block = None
-    for d in config:
-        if d['directive'] == 'http':
-            http_block = d['block']
-            break
-    else:
+    config = combine_configs(pl, depends_on)
+    # looking for directives http, обрабатываются все
+    http_blocks = [d['block'] for d in config if d['directive'] == 'http']
+    if not http_blocks:
         # something wrong
         return "Error: something wrong"
 
     #    if debug:
     #       delFileLine(http_block)
-    res = process_servers(http_block, hostname_var, default_port, return_code, skip_locations, debug=debug)
+    store = ServerStore()
+    for http_block in http_blocks:
+        for server in iter_process_servers(http_block, hostname_var, default_port, return_code, skip_locations,
+                                           debug=debug, server_cache=server_cache, listen_address=listen_address):
+            store.add(server)
+    if server_cache is not None:
+        parse_cache['servers'] = server_cache.maps[0]
     # servers0_answer = [{
     #         'locations': ['/hbz', '/equal', '/if_equal_not_check_regexpr', '/namedLocation/to/hbz_value'],
     #         'server_names': ('hbz.ru',),
     #         'listens': [(80, 'http')],
     #     }]
-    urls = []
-    for server in res:
-        for listen in server['listens']:
-            for server_name in server['server_names']:
-                if dns_check and not check_exist_host_name_dns(server_name):
-                    continue
-                server_name_url = f"{listen[1]}://{server_name}"
-                if listen not in ((80, 'http'), (443, 'https')):
-                    server_name_url = f"{server_name_url}:{listen[0]}"
-                if not debug:
-                    urls.append(server_name_url)
-                else:
-                    urls.append((server_name_url, server['debug']))
-
-                if not skip_locations:
-                    for location in server['locations']:
-                        if location == '/':
-                            # already added server_name url
-                            continue
-                        if location and not location.startswith('/'):
-                            location = f"/{location}"
-                        if not debug:
-                            urls.append(server_name_url + location)
-                        else:
-                            urls.append((server_name_url + location, server['debug']))
+    name_exists = None
+    if dns_check:
+        if dns_cache is None:
+            from znwclib.dns_cache import DNSCache
+            dns_cache = DNSCache()
+        name_exists = dns_cache.check_names(store.server_names())
+    return store.urls(skip_locations, debug, name_exists, listen_address)
+
 
-    return urls
+def get_URLs_from_config(config_file_name: str, hostname_var: str, default_port: int = 80,
+                         return_code: int = 399, skip_locations=False, dns_check=False, debug=False,
+                         depends_on: Optional[list] = None, parse_cache: Optional[dict] = None,
+                         dns_cache: Optional['DNSCache'] = None, config_dump: Optional[str] = None,
+                         listen_address=False):
+    """
+    Возвращает список URL из конфигурационного файла nginx или строку 'Error: ...' в случае ошибки.
+    Обрабатываются блоки server всех директив http
+    :param depends_on: если передан список, в него добавляются файлы и каталоги, от которых зависит результат,
+        см. combine_configs
+    :param parse_cache: словарь, сохраняемый между вызовами (должен сериализоваться в json). Если передан,
+        повторно разбираются только изменившиеся файлы (см. parse_config_files)
+        и обрабатываются только изменившиеся блоки server (см. process_servers)
+    :param dns_cache: кэш для проверки имен при dns_check, по умолчанию новый DNSCache без файла.
+        Каждое имя проверяется один раз, имена проверяются параллельно
+    :param config_dump: вывод nginx -T (см. parse_config_dump), если передан, конфигурация берется из него,
+        а не из файлов, config_file_name не используется, depends_on не заполняется
+    :param listen_address: вместо URL возвращать (<URL>, <адрес директивы listen>), по адресу сервер можно
+        проверить напрямую, без DNS и балансировщиков (см. get_listen_address). Строка вместо True - адрес
+        для серверов, слушающих все адреса, по умолчанию для них адреса нет (None)
+    """
+    urls = iter_URLs_from_config(config_file_name, hostname_var, default_port, return_code, skip_locations,
+                                 dns_check, debug, depends_on, parse_cache, dns_cache, config_dump,
+                                 listen_address)
+    return urls if isinstance(urls, str) else list(urls)
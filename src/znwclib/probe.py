@@ -0,0 +1,290 @@
+import asyncio
+import socket
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, Optional
+from urllib.parse import urlsplit
+
+from znwclib.dns_cache import Resolver
+from znwclib.web_check import DEADLINE_ERROR, DEFAULT_MAX_REDIRECTS, DEFAULT_TIMEOUT, check_url, new_session
+
+DEFAULT_CONCURRENCY = 50
+DEFAULT_PER_HOST = 4
+DEFAULT_BURST = 1
+
+
+def url_host(url: str) -> str:
+    """
+    Имя хоста из URL, для некорректных URL - пустая строка
+    """
+    try:
+        return (urlsplit(url).hostname or '').lower()
+    except ValueError:
+        return ''
+
+
+def url_origin(url: str) -> tuple:
+    """
+    (scheme, host, port) из URL, по нему группируются соединения
+    """
+    try:
+        parts = urlsplit(url)
+        port = parts.port or {'http': 80, 'https': 443}.get(parts.scheme)
+        return parts.scheme, (parts.hostname or '').lower(), port
+    except ValueError:
+        return '', '', None
+
+
+def pooled_check(pool_connections: int, pool_maxsize: int, timeout: tuple = DEFAULT_TIMEOUT, head=False,
+                 max_body: Optional[int] = None, max_redirects: int = DEFAULT_MAX_REDIRECTS,
+                 resolver: Optional[Resolver] = None, expires: Optional[float] = None) -> tuple:
+    """
+    check_url с общей сессией new_session: URL с одинаковыми scheme://host:port
+    используют один пул keep-alive соединений, и TLS handshake выполняется один раз на соединение.
+    :param head: проверять запросом HEAD, см. check_url
+    :param max_body: читать не больше max_body байт тела ответа, см. check_url
+    :param max_redirects: максимальное количество редиректов, см. check_url
+    :param resolver: общий кэш разрешения имен, см. new_session
+    :param expires: момент (time.perf_counter), к которому должны завершиться все проверки: каждая проверка
+        получает оставшееся время (check_url(budget=...))
+    :return: (<функция проверки>, <сессия>), сессию нужно закрыть после проверок
+    """
+    session = new_session(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=True,
+                          resolver=resolver)
+    check = partial(check_url, session=session, timeout=timeout, head=head, max_body=max_body,
+                    max_redirects=max_redirects)
+    if expires is None:
+        return check, session
+
+    def check_budget(url: str, **kwargs) -> dict:
+        return check(url, budget=expires - time.perf_counter(), **kwargs)
+
+    return check_budget, session
+
+
+def pinned_check(check: Callable[..., dict], addresses: dict) -> Callable[[str], dict]:
+    """
+    Функция проверки, подключающаяся к адресу URL из addresses вместо разрешения имени хоста
+    (см. check_url(address=...)). URL без адреса проверяются как обычно.
+    :param check: функция проверки, принимающая address, например, из pooled_check
+    :param addresses: {<url>: <адрес или None>}, может изменяться между проверками
+    """
+    def check_pinned(url: str) -> dict:
+        address = addresses.get(url)
+        return check(url, address=address) if address else check(url)
+
+    return check_pinned
+
+
+class TokenBucket:
+    """
+    Token bucket: подряд не больше burst запросов, дальше не чаще rate в секунду.
+    Реализован как GCRA: каждый запрос резервирует время отправки, поэтому ожидающие
+    запросы не обгоняют друг друга и не отправляются пачкой, когда накопятся токены
+    """
+
+    def __init__(self, rate: float, burst: int = DEFAULT_BURST, clock: Callable[[], float] = time.monotonic):
+        self.interval = 1.0 / rate
+        self.tolerance = (max(burst, 1) - 1) * self.interval
+        self.clock = clock
+        self._tat = clock()
+
+    def reserve(self, at: Optional[float] = None) -> float:
+        """
+        Резервирует время отправки одного запроса
+        :param at: не раньше этого времени (clock), по умолчанию сейчас
+        :return: через сколько секунд от текущего момента можно отправить запрос
+        """
+        now = self.clock()
+        start = max(now if at is None else at, self._tat - self.tolerance)
+        self._tat = max(self._tat, start) + self.interval
+        return start - now
+
+
+class RateLimiter:
+    """
+    Ограничение частоты запросов: token bucket на каждый origin (scheme, host, port)
+    и на каждый IP адрес (разные имена одного сервера)
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: int = DEFAULT_BURST, ip_rate: Optional[float] = None,
+                 ip_burst: int = DEFAULT_BURST, clock: Callable[[], float] = time.monotonic):
+        """
+        :param rate: запросов в секунду к одному origin, None - без ограничения
+        :param burst: запросов к одному origin подряд без ожидания
+        :param ip_rate: запросов в секунду к одному IP адресу, None - без ограничения
+        :param ip_burst: запросов к одному IP адресу подряд без ожидания
+        """
+        self.clock = clock
+        self.origins = defaultdict(lambda: TokenBucket(rate, burst, clock)) if rate else None
+        self.ips = defaultdict(lambda: TokenBucket(ip_rate, ip_burst, clock)) if ip_rate else None
+
+    def reserve(self, origin: tuple, ip: Optional[str] = None) -> float:
+        """
+        Резервирует время отправки запроса, учитывая оба ограничения
+        :return: через сколько секунд можно отправить запрос
+        """
+        delay = self.origins[origin].reserve() if self.origins is not None else 0.0
+        if self.ips is not None and ip:
+            delay = self.ips[ip].reserve(at=self.clock() + delay)
+        return delay
+
+
+class ProbeRunner:
+    """
+    Выполняет блокирующие проверки в пуле потоков,
+    ограничивая количество одновременных проверок: всего и к одному хосту,
+    и, если задан limiter, частоту запросов к одному origin и IP адресу
+    """
+
+    def __init__(self, check: Callable[[str], dict], concurrency: int = DEFAULT_CONCURRENCY,
+                 per_host: int = DEFAULT_PER_HOST, limiter: Optional[RateLimiter] = None,
+                 addresses: Optional[dict] = None, resolver: Optional[Resolver] = None):
+        """
+        :param limiter: ограничение частоты запросов, время ожидания до отправки (вместе с ожиданием слотов)
+            добавляется в результат (rate_delay_ms)
+        :param addresses: {<url>: <адрес>} для URL, проверяемых по адресу (pinned_check),
+            остальные имена для ограничения по IP разрешаются один раз за время работы
+        :param resolver: общий кэш разрешения имен, если задан, имена для ограничения по IP берутся из него
+        :raise ValueError: concurrency или per_host меньше 1
+        """
+        if concurrency < 1 or per_host < 1:
+            raise ValueError('concurrency and per_host must be at least 1')
+        self.check = check
+        self.global_limit = asyncio.Semaphore(concurrency)
+        self.host_limits = defaultdict(lambda: asyncio.Semaphore(per_host))
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.limiter = limiter
+        self.addresses = addresses if addresses is not None else {}
+        self.resolver = resolver
+        self._host_ips = {}
+
+    async def _ip(self, url: str) -> Optional[str]:
+        address = self.addresses.get(url)
+        if address:
+            return address
+        _, host, port = url_origin(url)
+        if not host:
+            return None
+        if self.resolver is not None:
+            try:
+                addresses = await asyncio.get_running_loop().run_in_executor(None, self.resolver.resolve, host)
+                return addresses[0]
+            except (OSError, UnicodeError):
+                return None
+        if host not in self._host_ips:
+            try:
+                infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+                self._host_ips[host] = infos[0][4][0]
+            except (OSError, UnicodeError):
+                # ошибку разрешения имени покажет сама проверка
+                self._host_ips[host] = None
+        return self._host_ips[host]
+
+    async def probe(self, url: str) -> dict:
+        started = time.perf_counter()
+        ip = await self._ip(url) if self.limiter is not None and self.limiter.ips is not None else None
+        # сначала ждем хост, чтобы не занимать общий слот впустую
+        async with self.host_limits[url_host(url)]:
+            async with self.global_limit:
+                if self.limiter is not None:
+                    # время отправки резервируется, когда слоты уже заняты: иначе проверки, время которых
+                    # наступило в ожидании слота, уходили бы к одному origin подряд при его освобождении
+                    delay = self.limiter.reserve(url_origin(url), ip)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                waited = time.perf_counter() - started
+                result = await asyncio.get_running_loop().run_in_executor(self.executor, self.check, url)
+        if self.limiter is not None:
+            result['rate_delay_ms'] = round(waited * 1000, 3)
+        return result
+
+    def close(self):
+        """
+        Отменяет не начатые проверки и ждет завершения запущенных: после этого можно закрывать их сессию
+        """
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def probe_urls(urls: list, check: Optional[Callable[[str], dict]] = None,
+                     concurrency: int = DEFAULT_CONCURRENCY, per_host: int = DEFAULT_PER_HOST,
+                     pool_connections: Optional[int] = None, pool_maxsize: Optional[int] = None,
+                     timeout: tuple = DEFAULT_TIMEOUT, deadline: Optional[float] = None,
+                     addresses: Optional[dict] = None, rate: Optional[float] = None, burst: int = DEFAULT_BURST,
+                     ip_rate: Optional[float] = None, ip_burst: int = DEFAULT_BURST, head=False,
+                     max_body: Optional[int] = None, max_redirects: int = DEFAULT_MAX_REDIRECTS,
+                     resolver: Optional[Resolver] = None) -> dict:
+    """
+    Конкурентная проверка списка URL.
+    Сами проверки блокирующие (requests), поэтому выполняются в пуле потоков,
+    а asyncio ограничивает количество одновременных проверок:
+    всего не больше concurrency и не больше per_host к одному хосту.
+    По умолчанию URL проверяются через pooled_check.
+    :param urls: список URL
+    :param check: функция проверки одного URL, по умолчанию check_url с общей сессией
+    :param concurrency: максимальное количество одновременных проверок
+    :param per_host: максимальное количество одновременных проверок одного хоста
+    :param pool_connections: количество хранимых пулов соединений (разных scheme://host:port),
+        по умолчанию количество разных scheme://host:port в urls, чтобы пулы не вытесняли друг друга
+    :param pool_maxsize: максимальное количество соединений в пуле, по умолчанию per_host
+    :param timeout: (<connect timeout>, <read timeout>) для check_url
+    :param deadline: общее время проверки в секундах. URL, проверка которых не завершилась за это время,
+        получают ошибку DEADLINE_ERROR (11). Проверки pooled_check ограничены оставшимся временем
+        (check_url(budget=...)) и прерываются к deadline, функция check должна ограничивать время сама
+    :param addresses: {<url>: <адрес>}, URL проверяются подключением к адресу, без DNS (см. pinned_check),
+        check в этом случае должна принимать address
+    :param rate: запросов в секунду к одному scheme://host:port, None - без ограничения (см. RateLimiter)
+    :param burst: запросов к одному scheme://host:port подряд без ожидания
+    :param ip_rate: запросов в секунду к одному IP адресу, None - без ограничения
+    :param ip_burst: запросов к одному IP адресу подряд без ожидания
+        С ограничением частоты в результат добавляется rate_delay_ms - время ожидания перед проверкой
+    :param head: проверять запросом HEAD, GET - только если сервер отклоняет HEAD (см. check_url)
+    :param max_body: читать не больше max_body байт тела ответа, None - без ограничения
+    :param max_redirects: максимальное количество редиректов одной проверки
+    :param resolver: общий кэш разрешения имен (см. Resolver). Все имена хостов URL (кроме URL с адресом
+        из addresses) разрешаются параллельно до начала проверок, время этого входит в deadline.
+        В результат добавляется resolve_ms - время разрешения имени хоста URL, см. check_url
+    :return: {<url>: <результат check>, ...} в порядке urls
+    """
+    expires = time.perf_counter() + deadline if deadline is not None else None
+    session = None
+    if check is None:
+        if not pool_connections:
+            pool_connections = max(len({url_origin(url) for url in urls}), 1)
+        check, session = pooled_check(pool_connections, pool_maxsize or per_host, timeout, head, max_body,
+                                      max_redirects, resolver, expires)
+    if addresses:
+        check = pinned_check(check, addresses)
+    limiter = RateLimiter(rate, burst, ip_rate, ip_burst) if rate or ip_rate else None
+    runner = ProbeRunner(check, concurrency, per_host, limiter, addresses, resolver)
+    tasks = []
+    try:
+        if resolver is not None:
+            hosts = [url_host(url) for url in urls if not (addresses and addresses.get(url))]
+            await asyncio.get_running_loop().run_in_executor(None, resolver.prefetch, hosts)
+        tasks = [asyncio.ensure_future(runner.probe(url)) for url in urls]
+        if tasks:
+            await asyncio.wait(tasks, timeout=max(expires - time.perf_counter(), 0) if expires else None)
+    finally:
+        # незавершенные к deadline проверки отменяются, запущенные в потоках завершаются к deadline сами,
+        # сессию закрываем только после них
+        for task in tasks:
+            task.cancel()
+        runner.close()
+        if session is not None:
+            session.close()
+
+    err, err_str = DEADLINE_ERROR
+    return {
+        url: task.result() if task.done() and not task.cancelled() else {'err': err, 'err_str': err_str}
+        for url, task in zip(urls, tasks)
+    }
+
+
+def sweep(urls: Iterable[str], **kwargs) -> dict:
+    """
+    Синхронная обертка над probe_urls, параметры те же
+    """
+    return asyncio.run(probe_urls(list(urls), **kwargs))
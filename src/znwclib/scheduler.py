@@ -0,0 +1,101 @@
+import heapq
+import random
+import time
+from typing import Callable, Iterable, Optional
+
+DEFAULT_INTERVAL = 300.0
+DEFAULT_JITTER = 0.1
+
+
+class Scheduler:
+    """
+    Расписание проверок URL на куче (heapq).
+    Каждый URL проверяется раз в interval секунд со случайным отклонением +-jitter * interval.
+    Первые проверки новых URL равномерно распределяются на один interval,
+    поэтому URL, обнаруженные одновременно, не проверяются одновременно.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, jitter: float = DEFAULT_JITTER,
+                 clock: Callable[[], float] = time.monotonic, rand: Callable[[], float] = random.random):
+        """
+        :param interval: интервал проверки URL в секундах
+        :param jitter: максимальное отклонение интервала, доля от interval
+        :param clock: источник времени
+        :param rand: источник случайных чисел в [0, 1)
+        """
+        self.interval = interval
+        self.jitter = jitter
+        self.clock = clock
+        self.rand = rand
+        self._heap = []
+        # url -> номер актуальной записи в куче, записи с другим номером устарели
+        self._entries = {}
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, url):
+        return url in self._entries
+
+    @property
+    def urls(self) -> list:
+        return list(self._entries)
+
+    def _push(self, due: float, url: str):
+        self._seq += 1
+        self._entries[url] = self._seq
+        heapq.heappush(self._heap, (due, self._seq, url))
+
+    def _next_interval(self) -> float:
+        return self.interval * (1 + self.jitter * (2 * self.rand() - 1))
+
+    def set_urls(self, urls: Iterable[str]) -> tuple:
+        """
+        Устанавливает список URL. Расписание оставшихся URL не меняется,
+        новые URL равномерно распределяются на ближайший interval, удаленные убираются из расписания.
+        :return: (<список новых URL>, <список удаленных URL>)
+        """
+        urls = list(dict.fromkeys(urls))
+        added = [url for url in urls if url not in self._entries]
+        keep = set(urls)
+        removed = [url for url in self._entries if url not in keep]
+        for url in removed:
+            del self._entries[url]
+        now = self.clock()
+        step = self.interval / len(added) if added else 0
+        offset = self.rand() * step
+        for i, url in enumerate(added):
+            self._push(now + offset + i * step, url)
+        return added, removed
+
+    def _drop_stale(self):
+        heap = self._heap
+        while heap and self._entries.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)
+
+    def next_due(self) -> Optional[float]:
+        """
+        Время ближайшей проверки, None если расписание пустое
+        """
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: Optional[float] = None) -> list:
+        """
+        Выдает URL, время проверки которых наступило, и назначает им следующую проверку.
+        Следующая проверка отсчитывается от запланированного времени, а не от текущего,
+        чтобы расписание не сдвигалось, если проверки запускаются с опозданием.
+        """
+        if now is None:
+            now = self.clock()
+        due_urls = []
+        while True:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            due, _, url = heapq.heappop(self._heap)
+            due_urls.append(url)
+            next_due = due + self._next_interval()
+            self._push(next_due if next_due > now else now + self._next_interval(), url)
+        return due_urls
@@ -0,0 +1,136 @@
+import sys
+from typing import Iterable, Iterator, Optional
+
+
+class CompactServer:
+    """
+    Блок server в компактном виде, см. ServerStore
+    """
+    __slots__ = ('server_names', 'locations', 'listens', 'addresses', 'debug')
+
+    def __init__(self, server_names: tuple, locations: tuple, listens: tuple, addresses: Optional[tuple] = None,
+                 debug: Optional[list] = None):
+        """
+        :param locations: пути для добавления к URL сервера: без '/', с / в начале
+        """
+        self.server_names = server_names
+        self.locations = locations
+        self.listens = listens
+        self.addresses = addresses
+        self.debug = debug
+
+
+class ServerStore:
+    """
+    Результат process_servers в компактном виде: вместо словарей со списками - объекты со __slots__,
+    строки интернированы, одинаковые кортежи (listen, наборы location, адреса) общие для всех серверов.
+    URL не хранятся, а составляются при каждом проходе (iter_urls, urls)
+    """
+    __slots__ = ('servers', '_tuples')
+
+    def __init__(self, servers: Iterable[dict] = ()):
+        """
+        :param servers: результат process_servers
+        """
+        self.servers = []
+        self._tuples = {}
+        for server in servers:
+            self.add(server)
+
+    def _tuple(self, items) -> tuple:
+        items = tuple(items)
+        return self._tuples.setdefault(items, items)
+
+    def add(self, server: dict):
+        """
+        Добавляет сервер из результата process_servers (или process_server)
+        """
+        locations = (location if not location or location.startswith('/') else f"/{location}"
+                     for location in server['locations'] if location != '/')
+        addresses = server.get('addresses')
+        self.servers.append(CompactServer(
+            self._tuple(sys.intern(name) for name in server['server_names']),
+            self._tuple(sys.intern(location) for location in locations),
+            # после json listen - списки
+            self._tuple(self._tuple(listen) for listen in server['listens']),
+            self._tuple(addresses) if addresses is not None else None,
+            server.get('debug'),
+        ))
+
+    def __len__(self) -> int:
+        return len(self.servers)
+
+    def __iter__(self) -> Iterator[CompactServer]:
+        return iter(self.servers)
+
+    def server_names(self) -> Iterator[str]:
+        for server in self.servers:
+            yield from server.server_names
+
+    def iter_urls(self, skip_locations=False, debug=False, name_exists: Optional[dict] = None,
+                  listen_address=False) -> Iterator:
+        """
+        Генератор URL, параметры и порядок URL см. iter_servers_urls
+        """
+        for server in self.servers:
+            addresses = server.addresses or (None,) * len(server.listens)
+            locations = server.locations if not skip_locations else ()
+            for listen, address in zip(server.listens, addresses):
+                port, scheme = listen
+                default_port = listen in ((80, 'http'), (443, 'https'))
+                extra = server.debug if debug else address
+                for server_name in server.server_names:
+                    if name_exists is not None and not name_exists[server_name]:
+                        continue
+                    url = f"{scheme}://{server_name}" if default_port else f"{scheme}://{server_name}:{port}"
+                    if debug or listen_address:
+                        yield url, extra
+                        for location in locations:
+                            yield url + location, extra
+                    else:
+                        yield url
+                        for location in locations:
+                            yield url + location
+
+    def count_urls(self, skip_locations=False, name_exists: Optional[dict] = None) -> int:
+        """
+        Количество URL iter_urls без составления строк
+        """
+        count = 0
+        for server in self.servers:
+            names = len(server.server_names) if name_exists is None else \
+                sum(1 for name in server.server_names if name_exists[name])
+            count += len(server.listens) * names * (1 + (0 if skip_locations else len(server.locations)))
+        return count
+
+    def urls(self, skip_locations=False, debug=False, name_exists: Optional[dict] = None,
+             listen_address=False) -> 'URLList':
+        """
+        Список URL, составляемый при каждом проходе, см. URLList
+        """
+        return URLList(self, skip_locations, debug, name_exists, listen_address)
+
+
+class URLList:
+    """
+    Список URL ServerStore: строки составляются при каждом проходе и не хранятся.
+    Поддерживает len() и повторные проходы, для остального нужен list(...)
+    """
+    __slots__ = ('store', 'skip_locations', 'debug', 'name_exists', 'listen_address', '_len')
+
+    def __init__(self, store: ServerStore, skip_locations=False, debug=False, name_exists: Optional[dict] = None,
+                 listen_address=False):
+        self.store = store
+        self.skip_locations = skip_locations
+        self.debug = debug
+        self.name_exists = name_exists
+        self.listen_address = listen_address
+        self._len = None
+
+    def __iter__(self) -> Iterator:
+        return self.store.iter_urls(self.skip_locations, self.debug, self.name_exists, self.listen_address)
+
+    def __len__(self) -> int:
+        if self._len is None:
+            self._len = self.store.count_urls(self.skip_locations, self.name_exists)
+        return self._len
@@ -0,0 +1,598 @@
+import hashlib
+import json
+import socket
+import ssl
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from time import perf_counter
+from typing import TYPE_CHECKING, Iterable, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import DEFAULT_POOLBLOCK, DEFAULT_POOLSIZE, HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, LocationParseError, NameResolutionError, ReadTimeoutError
+from urllib3.util.connection import allowed_gai_family
+
+if TYPE_CHECKING:
+    from znwclib.dns_cache import Resolver
+
+
+class RedirectLoop(requests.exceptions.TooManyRedirects):
+    """
+    Редирект на URL, который уже был в цепочке редиректов
+    """
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """
+    Проверка не завершилась за отведенное ей время (check_url(budget=...))
+    """
+
+
+# URL не был проверен до истечения общего времени пакетной проверки
+DEADLINE_ERROR = (11, 'Not Checked (Deadline)')
+# порядок важен: SSLError и ConnectTimeout - наследники ConnectionError, RedirectLoop - TooManyRedirects
+ERRORS = (
+    (requests.exceptions.HTTPError, 1, 'HTTP Error'),
+    (requests.exceptions.SSLError, 2, 'SSL Error'),
+    (requests.exceptions.ConnectTimeout, 3, 'Connect Timeout'),
+    (requests.exceptions.ReadTimeout, 4, 'Read Timeout'),
+    (DeadlineExceeded, *DEADLINE_ERROR),
+    (requests.exceptions.ConnectionError, 5, 'Connection Error'),
+    (RedirectLoop, 6, 'Redirect Loop'),
+    (requests.exceptions.TooManyRedirects, 6, 'Too Many Redirects'),
+    (requests.exceptions.MissingSchema, 7, 'Missing Schema'),
+    (requests.exceptions.InvalidSchema, 8, 'Invalid Schema'),
+    (requests.exceptions.InvalidURL, 9, 'Invalid URL'),
+    (requests.exceptions.InvalidHeader, 10, 'Invalid Header'),
+)
+UNKNOWN_ERROR = (1000, 'Unknown Error')
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 10.0
+DEFAULT_TIMEOUT = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)
+# как у requests, чтобы не менять результат проверок URL с длинными цепочками редиректов
+DEFAULT_MAX_REDIRECTS = requests.models.DEFAULT_REDIRECT_LIMIT
+# ответы на HEAD, после которых URL проверяется через GET: метод не поддерживается сервером
+HEAD_REJECTED = (405, 501)
+_BODY_CHUNK_SIZE = 64 * 1024
+
+
+def error_result(exc: BaseException) -> dict:
+    """
+    Сопоставляет исключение requests с кодом ошибки
+    :param exc: исключение, возникшее при проверке
+    :return: {'err': <код ошибки>, 'err_str': <описание>}
+    """
+    for exc_type, err, err_str in ERRORS:
+        if isinstance(exc, exc_type):
+            return {'err': err, 'err_str': err_str}
+    err, err_str = UNKNOWN_ERROR
+    return {'err': err, 'err_str': err_str}
+
+
+_local = threading.local()
+
+
+def _trace() -> dict:
+    """
+    Трассировка текущей проверки, заполняется соединениями в том же потоке
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        trace = _local.trace = {}
+    return trace
+
+
+def _add_time(trace: dict, name: str, seconds: float):
+    trace[name] = trace.get(name, 0.0) + seconds * 1000
+
+
+def _resolve(host: str, port: int) -> list:
+    """
+    Список IP адресов хоста, в порядке getaddrinfo, или из общего кэша сессии (new_session(resolver=...))
+    """
+    try:
+        host.encode('idna')
+    except UnicodeError:
+        raise LocationParseError(f"'{host}', label empty or too long") from None
+    resolver = getattr(_local, 'resolver', None)
+    if resolver is not None:
+        return resolver.resolve(host)
+    addresses = socket.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM)
+    return list(dict.fromkeys(sa[0] for *_, sa in addresses))
+
+
+def _pinned_address(host: str, port: int) -> Optional[str]:
+    """
+    Адрес, к которому текущая проверка подключается вместо разрешения имени host (check_url(address=...)).
+    Относится только к scheme://host:port проверяемого URL, редиректы на другие хосты разрешаются как обычно
+    """
+    pin = getattr(_local, 'pin', None)
+    if pin is not None and pin[0] == host.lower() and pin[1] == port:
+        return pin[2]
+    return None
+
+
+class _TracingConnectionMixin:
+    """
+    Разделяет установку соединения на разрешение имени и TCP connect,
+    время каждой фазы добавляется в трассировку проверки (dns_ms, connect_ms)
+    """
+
+    def _new_conn(self):
+        trace = _trace()
+        started = perf_counter()
+        pinned = _pinned_address(self._dns_host.strip('[]'), self.port)
+        if pinned is not None:
+            addresses = [pinned]
+        else:
+            try:
+                addresses = _resolve(self._dns_host.strip('[]'), self.port)
+            except socket.gaierror as e:
+                raise NameResolutionError(self.host, self, e) from e
+        resolved = perf_counter()
+        if pinned is None:
+            _add_time(trace, 'dns_ms', resolved - started)
+
+        dns_host = self._dns_host
+        error = None
+        for address in addresses:
+            # подключаемся к уже разрешенному адресу, имя хоста (Host, SNI) при этом не меняется
+            self._dns_host = address
+            try:
+                sock = super()._new_conn()
+                break
+            except ConnectTimeoutError as e:
+                error = e
+            finally:
+                self._dns_host = dns_host
+        else:
+            raise error
+
+        self._socket_ready = perf_counter()
+        _add_time(trace, 'connect_ms', self._socket_ready - resolved)
+        trace['new_connections'] = trace.get('new_connections', 0) + 1
+        return sock
+
+
+_NAME_FIELDS = {'commonName': 'CN', 'organizationName': 'O', 'organizationalUnitName': 'OU', 'countryName': 'C'}
+
+
+def _cert_name(rdns) -> str:
+    """
+    Имя из getpeercert() (issuer, subject) в виде 'CN=..., O=...'
+    """
+    return ', '.join(f"{_NAME_FIELDS.get(name, name)}={value}" for rdn in rdns for name, value in rdn)
+
+
+def tls_info(sock: ssl.SSLSocket, verified: bool) -> dict:
+    """
+    Сведения о TLS соединении и сертификате сервера
+    :param sock: сокет после TLS handshake
+    :param verified: цепочка сертификатов проверена
+    :return: {'tls_protocol', 'tls_cipher', 'tls_chain_valid', 'tls_fingerprint',
+              и, если сертификат проверен, 'tls_expires' (unix time), 'tls_subject', 'tls_issuer'}
+    """
+    der = sock.getpeercert(binary_form=True)
+    info = {
+        'tls_protocol': sock.version(),
+        'tls_cipher': (sock.cipher() or (None,))[0],
+        'tls_chain_valid': 1 if verified else 0,
+        'tls_fingerprint': hashlib.sha256(der).hexdigest() if der else None,
+    }
+    # без проверки цепочки ssl не разбирает сертификат
+    cert = sock.getpeercert() if verified else None
+    if cert:
+        info['tls_expires'] = int(ssl.cert_time_to_seconds(cert['notAfter']))
+        info['tls_subject'] = _cert_name(cert.get('subject', ()))
+        info['tls_issuer'] = _cert_name(cert.get('issuer', ()))
+    return info
+
+
+def _verify_error(exc: BaseException) -> Optional[str]:
+    """
+    Причина ошибки проверки сертификата из цепочки исключений requests/urllib3
+    """
+    stack, seen = [exc], set()
+    while stack:
+        e = stack.pop()
+        if e is None or id(e) in seen:
+            continue
+        seen.add(id(e))
+        if isinstance(e, ssl.SSLCertVerificationError):
+            return e.verify_message or str(e)
+        stack.extend([e.__cause__, e.__context__, getattr(e, 'reason', None)])
+        stack.extend(arg for arg in e.args if isinstance(arg, BaseException))
+    return None
+
+
+class _TracingHTTPConnection(_TracingConnectionMixin, HTTPConnection):
+    tls_info = None
+
+
+class _TracingHTTPSConnection(_TracingConnectionMixin, HTTPSConnection):
+    tls_info = None
+
+    def connect(self):
+        super().connect()
+        _add_time(_trace(), 'tls_ms', perf_counter() - self._socket_ready)
+        # сертификат - свойство адреса, порта и SNI, сведения разбираются один раз на сессию,
+        # пока сервер отдает тот же сертификат
+        verified = bool(self.is_verified)
+        cache = getattr(_local, 'tls_cache', None)
+        if cache is None:
+            self.tls_info = tls_info(self.sock, verified)
+            return
+        endpoint = (self.sock.getpeername()[0], self.port, self.server_hostname or self.host)
+        info = cache.get(endpoint)
+        der = self.sock.getpeercert(binary_form=True)
+        if (info is None or info['tls_chain_valid'] != verified or
+                info['tls_fingerprint'] != (hashlib.sha256(der).hexdigest() if der else None)):
+            info = cache[endpoint] = tls_info(self.sock, verified)
+        self.tls_info = info
+
+
+class _TracingPoolMixin:
+    """
+    Отмечает в трассировке сведения о TLS соединения, по которому отправлен запрос (в том числе
+    переиспользованного), для редиректов остаются сведения последнего запроса
+    """
+
+    def _make_request(self, conn, *args, **kwargs):
+        # новое соединение устанавливается внутри _make_request
+        response = super()._make_request(conn, *args, **kwargs)
+        _trace()['tls'] = conn.tls_info
+        return response
+
+
+class _TracingHTTPConnectionPool(_TracingPoolMixin, HTTPConnectionPool):
+    ConnectionCls = _TracingHTTPConnection
+
+
+class _TracingHTTPSConnectionPool(_TracingPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _TracingHTTPSConnection
+
+
+class TracingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter, соединения которого отмечают в трассировке проверки установку нового соединения
+    и время фаз установки соединения
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TracingHTTPConnectionPool,
+            'https': _TracingHTTPSConnectionPool,
+        }
+
+
+def new_session(pool_connections: int = DEFAULT_POOLSIZE, pool_maxsize: int = DEFAULT_POOLSIZE,
+                pool_block: bool = DEFAULT_POOLBLOCK, resolver: Optional['Resolver'] = None) -> requests.Session:
+    """
+    Сессия для проверок. Соединения с одним и тем же scheme://host:port переиспользуются (keep-alive).
+    Cookies между проверками не сохраняются, внутри цепочки редиректов работают как обычно.
+    :param pool_connections: количество пулов соединений (разных scheme://host:port), которые хранятся
+    :param pool_maxsize: максимальное количество соединений в одном пуле
+    :param pool_block: ждать освобождения соединения, если пул заполнен
+    :param resolver: общий кэш разрешения имен (znwclib.dns_cache.Resolver), по умолчанию каждое новое
+        соединение разрешает имя через системный резолвер
+    """
+    session = requests.Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    # сведения о TLS по (<IP>, <порт>, <SNI>), общие для всех URL сессии, см. tls_info
+    session.tls_cache = {}
+    session.resolver = resolver
+    adapter = TracingAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _url_pin(url: str, address: str) -> Optional[tuple]:
+    try:
+        parts = urlsplit(url)
+        port = parts.port or {'http': 80, 'https': 443}.get(parts.scheme)
+        return (parts.hostname or '').lower(), port, address
+    except ValueError:
+        return None
+
+
+def _remaining(expires: Optional[float]) -> Optional[float]:
+    """
+    Оставшееся время проверки, с
+    :param expires: момент (perf_counter), к которому проверка должна завершиться, None - без ограничения
+    :raise DeadlineExceeded: время истекло
+    """
+    if expires is None:
+        return None
+    remaining = expires - perf_counter()
+    if remaining <= 0:
+        raise DeadlineExceeded('Check time budget exceeded')
+    return remaining
+
+
+def _budget_timeout(timeout: tuple, expires: Optional[float]) -> tuple:
+    """
+    timeout запроса, сокращенный до оставшегося времени проверки
+    """
+    remaining = _remaining(expires)
+    if remaining is None:
+        return timeout
+    connect, read = timeout
+    return (min(connect, remaining) if connect is not None else remaining,
+            min(read, remaining) if read is not None else remaining)
+
+
+def read_body(res: requests.Response, max_body: Optional[int] = None, expires: Optional[float] = None) -> tuple:
+    """
+    Читает тело ответа stream=True без декодирования Content-Encoding, не больше max_body байт.
+    Прочитанное не сохраняется. Если чтение остановлено на max_body, соединение закрывается при закрытии ответа,
+    иначе возвращается в пул
+    :param max_body: максимальное количество байт, None - без ограничения
+    :param expires: момент (perf_counter), к которому чтение должно завершиться. read timeout ограничивает
+        ожидание одной порции данных, и медленно отдаваемое тело его не превышает, поэтому при expires
+        данные читаются по мере поступления, а таймаут сокета сокращается до оставшегося времени
+    :return: (<прочитано байт>, <тело прочитано не полностью>)
+    :raise DeadlineExceeded: тело не прочитано до expires
+    :raise requests.exceptions.ReadTimeout: истек read timeout
+    """
+    connection = getattr(res.raw, 'connection', None)
+    sock = getattr(connection, 'sock', None) if expires is not None else None
+    sock_timeout = sock.gettimeout() if sock is not None else None
+    # read1 возвращает то, что пришло, не дожидаясь заполнения всей порции
+    read = getattr(res.raw, 'read1', res.raw.read) if expires is not None else res.raw.read
+    bytes_read = 0
+    try:
+        while max_body is None or bytes_read < max_body:
+            remaining = _remaining(expires)
+            if sock is not None:
+                sock.settimeout(remaining if sock_timeout is None else min(sock_timeout, remaining))
+            size = _BODY_CHUNK_SIZE if max_body is None else min(_BODY_CHUNK_SIZE, max_body - bytes_read)
+            try:
+                chunk = read(size, decode_content=False)
+            except ReadTimeoutError as e:
+                _remaining(expires)
+                raise requests.exceptions.ReadTimeout(e, response=res) from e
+            if not chunk:
+                break
+            bytes_read += len(chunk)
+    except BaseException:
+        # соединение с непрочитанным телом не возвращается в пул
+        res.close()
+        raise
+    finally:
+        if sock is not None and sock.fileno() != -1:
+            sock.settimeout(sock_timeout)
+    # при достижении max_body тело закончилось, только если известна его длина и она прочитана
+    capped = max_body is not None and bytes_read >= max_body and not res.raw.closed
+    if not capped:
+        res.raw.release_conn()
+    return bytes_read, capped
+
+
+def _follow(session: requests.Session, method: str, url: str, timeout: tuple, max_redirects: int,
+            hops: list, expires: Optional[float] = None, max_body: Optional[int] = None) -> requests.Response:
+    """
+    Запрос (stream=True) с переходом по редиректам. В отличие от requests, цепочка прерывается
+    после max_redirects редиректов и при повторе URL, до отправки запроса
+    :param hops: в список добавляются редиректы цепочки: {'url', 'status_code', 'location', 'time_ms'},
+        time_ms - время запроса вместе с чтением тела ответа
+    :param max_body: из тела ответа-редиректа читается не больше max_body байт, см. read_body
+    :raise TooManyRedirects: редиректов больше max_redirects
+    :raise RedirectLoop: редирект на URL, который уже был в цепочке
+    :raise DeadlineExceeded: время проверки истекло (expires, см. read_body)
+    """
+    def drain_redirect(res, **kwargs):
+        # с allow_redirects=False requests после хуков читает тело ответа-редиректа целиком (res.content)
+        # и готовит следующий запрос (res.next), поэтому тело заранее читается с ограничением max_body
+        if res.is_redirect:
+            _, capped = read_body(res, max_body, expires)
+            if capped:
+                res.close()
+            res._content, res._content_consumed = b'', True
+        return res
+
+    visited = set()
+    started = perf_counter()
+    # хук переходит в следующие запросы цепочки вместе с подготовленным запросом
+    res = session.request(method, url, allow_redirects=False, stream=True,
+                          timeout=_budget_timeout(timeout, expires), hooks={'response': drain_redirect})
+    while res.next is not None:
+        next_request = res.next
+        visited.add(res.url)
+        hops.append({
+            'url': res.url,
+            'status_code': res.status_code,
+            'location': res.headers.get('Location'),
+            'time_ms': round((perf_counter() - started) * 1000, 3),
+        })
+        res.close()
+        if len(hops) > max_redirects:
+            raise requests.exceptions.TooManyRedirects(f"Exceeded {max_redirects} redirects.", response=res)
+        if next_request.url in visited:
+            raise RedirectLoop(f"Redirect loop to {next_request.url}", response=res)
+        visited.add(next_request.url)
+        # как в session.request: verify, proxies и т.д. с учетом переменных окружения
+        settings = session.merge_environment_settings(next_request.url, {}, True, None, None)
+        started = perf_counter()
+        res = session.send(next_request, allow_redirects=False, timeout=_budget_timeout(timeout, expires),
+                           **settings)
+    return res
+
+
+def _request(session: requests.Session, url: str, timeout: tuple, head: bool, max_redirects: int,
+             hops: list, expires: Optional[float] = None, max_body: Optional[int] = None) -> requests.Response:
+    """
+    Запрос HEAD или GET, если head и сервер отклонил HEAD (HEAD_REJECTED), см. _follow
+    """
+    if head:
+        res = _follow(session, 'HEAD', url, timeout, max_redirects, hops, expires, max_body)
+        if res.status_code not in HEAD_REJECTED:
+            return res
+        read_body(res, expires=expires)
+        res.close()
+        hops.clear()
+    return _follow(session, 'GET', url, timeout, max_redirects, hops, expires, max_body)
+
+
+def check_url(url: str, session: requests.Session = None, timeout: tuple = DEFAULT_TIMEOUT,
+              address: Optional[str] = None, head=False, max_body: Optional[int] = None,
+              max_redirects: int = DEFAULT_MAX_REDIRECTS, budget: Optional[float] = None) -> dict:
+    """
+    Проверяет один URL
+    :param url: проверяемый URL
+    :param session: сессия new_session, если не указана, создается новая на одну проверку
+    :param timeout: (<connect timeout>, <read timeout>) в секундах. read timeout - максимальное время
+        ожидания очередной порции данных, а не всего ответа
+    :param address: подключаться к этому адресу (например, адресу директивы listen) вместо разрешения
+        имени хоста URL, заголовок Host и SNI остаются из URL. Уже открытые соединения сессии с тем же
+        scheme://host:port переиспользуются, поэтому адрес для них должен быть одним
+    :param head: запрос HEAD, без тела ответа. Если сервер отклоняет HEAD (HEAD_REJECTED), выполняется GET
+    :param max_body: читать не больше max_body байт тела ответа GET, остальное не загружается, а соединение
+        закрывается. None - тело читается полностью
+    :param max_redirects: максимальное количество редиректов, при превышении - ошибка 6 (Too Many Redirects),
+        при повторе URL в цепочке ошибка 6 (Redirect Loop) возвращается сразу
+    :param budget: общее время проверки в секундах, включая редиректы и чтение тела: таймауты запросов
+        сокращаются до оставшегося времени, чтение тела прерывается по его истечении.
+        Если проверка не успела завершиться - ошибка DEADLINE_ERROR (11). Разрешение имен не прерывается
+    :return: словарь с ключами err, status_code, url, elapsed, reused, method, bytes_read, body_capped,
+        redirects, dns_ms, connect_ms, tls_ms, ttfb_ms, download_ms, total_ms
+        либо err, err_str в случае ошибки соединения
+        reused - 1, если все запросы прошли по уже открытым соединениям
+        method - метод последнего запроса, HEAD или GET
+        bytes_read - прочитано байт тела последнего ответа (без декодирования Content-Encoding)
+        body_capped - 1, если чтение тела остановлено на max_body
+        redirects - редиректы до итогового URL: [{'url', 'status_code', 'location', 'time_ms'}, ...],
+            добавляются и к ошибке, если она возникла после редиректов
+        dns_ms, connect_ms, tls_ms - время разрешения имен, TCP connect и TLS handshake
+            (сумма по всем новым соединениям, включая редиректы)
+        ttfb_ms - время до получения заголовков последнего ответа за вычетом установки соединений
+        download_ms - время получения тела последнего ответа
+        total_ms - общее время проверки
+        resolve_ms - для сессии с resolver: время разрешения имени хоста URL в общем кэше, когда бы оно
+            ни выполнялось (например, в Resolver.prefetch до проверки). dns_ms в этом случае - только время
+            получения адресов самой проверкой, при попадании в кэш около 0
+        address - адрес подключения, если указан
+        для https - сведения о TLS соединении последнего запроса (см. tls_info): tls_protocol, tls_cipher,
+            tls_chain_valid, tls_expires, tls_days_left (дней до истечения сертификата), tls_subject,
+            tls_issuer. Они получаются при TLS handshake самой проверки и разбираются один раз
+            на (<IP>, <порт>, <SNI>) за сессию, отдельных соединений для проверки сертификата нет.
+            При ошибке проверки сертификата - tls_chain_valid = 0 и tls_verify_error
+    """
+    own_session = session is None
+    if own_session:
+        session = new_session()
+    trace = _local.trace = {}
+    _local.pin = _url_pin(url, address) if address else None
+    _local.tls_cache = getattr(session, 'tls_cache', None)
+    _local.resolver = resolver = getattr(session, 'resolver', None)
+    hops = []
+    started = perf_counter()
+    expires = started + budget if budget is not None else None
+    try:
+        with _request(session, url, timeout, head, max_redirects, hops, expires, max_body) as res:
+            headers_received = perf_counter()
+            bytes_read, capped = read_body(res, max_body, expires)
+        finished = perf_counter()
+        connection_ms = trace.get('dns_ms', 0.0) + trace.get('connect_ms', 0.0) + trace.get('tls_ms', 0.0)
+        result = {
+            'err': 0,
+            'status_code': res.status_code,
+            # Final URL location of Response.
+            'url': res.url,
+            'elapsed': res.elapsed.total_seconds() * 1000,
+            'reused': 0 if trace.get('new_connections') else 1,
+            'method': res.request.method,
+            'bytes_read': bytes_read,
+            'body_capped': 1 if capped else 0,
+            'redirects': hops,
+            'dns_ms': round(trace.get('dns_ms', 0.0), 3),
+            'connect_ms': round(trace.get('connect_ms', 0.0), 3),
+            'tls_ms': round(trace.get('tls_ms', 0.0), 3),
+            'ttfb_ms': round(max((headers_received - started) * 1000 - connection_ms, 0.0), 3),
+            'download_ms': round((finished - headers_received) * 1000, 3),
+            'total_ms': round((finished - started) * 1000, 3),
+        }
+        if address:
+            result['address'] = address
+        elif resolver is not None:
+            result['resolve_ms'] = resolver.lookup_ms(urlsplit(url).hostname or '')
+        info = trace.get('tls')
+        if info:
+            result.update((name, value) for name, value in info.items() if name != 'tls_fingerprint')
+            if 'tls_expires' in info:
+                result['tls_days_left'] = round((info['tls_expires'] - time.time()) / 86400, 2)
+        return result
+    except BaseException as e:
+        if isinstance(e, requests.exceptions.Timeout) and expires is not None and perf_counter() >= expires:
+            # таймаут сокращен до оставшегося времени проверки
+            e = DeadlineExceeded(str(e))
+        result = error_result(e)
+        if hops:
+            result['redirects'] = hops
+        verify_error = _verify_error(e)
+        if verify_error is not None:
+            result.update(tls_chain_valid=0, tls_verify_error=verify_error)
+        return result
+    finally:
+        _local.trace = None
+        _local.pin = None
+        _local.tls_cache = None
+        _local.resolver = None
+        if own_session:
+            session.close()
+
+
+def check_urls(urls: Iterable[str], **kwargs) -> dict:
+    """
+    Пакетная проверка списка URL в одном процессе: конкурентно и через общий пул соединений
+    (znwclib.probe.sweep, параметры см. probe_urls)
+    :param urls: список URL
+    :return: {<url>: <результат check_url>, ...}
+    """
+    from znwclib.probe import sweep
+    return sweep(urls, **kwargs)
+
+
+def parse_url_addresses(text: str) -> dict:
+    """
+    Разбирает список URL для пакетной проверки вместе с адресами подключения.
+    Поддерживаются форматы:
+        - вывод znwcagent.py (LLD JSON): [{"{#URL}": "http://..."}, ...],
+          с ключом -A - [{"{#URL}": "http://...", "{#ADDRESS}": "1.1.1.1"}, ...]
+        - LLD JSON в виде {"data": [{"{#URL}": "http://..."}, ...]}
+        - JSON список строк: ["http://...", ...]
+        - по одному URL в строке, пустые строки и строки начинающиеся с # пропускаются
+    Повторяющиеся URL удаляются (остается первый адрес), порядок сохраняется
+    :param text: содержимое файла или stdin
+    :return: {<url>: <адрес или None>, ...}
+    """
+    text = text.strip()
+    if text.startswith('[') or text.startswith('{'):
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get('data', [])
+        items = [(item['{#URL}'], item.get('{#ADDRESS}') or None) if isinstance(item, dict) else (item, None)
+                 for item in data]
+    else:
+        urls = [line.strip() for line in text.splitlines()]
+        items = [(url, None) for url in urls if url and not url.startswith('#')]
+    addresses = {}
+    for url, address in items:
+        addresses.setdefault(url, address)
+    return addresses
+
+
+def parse_url_list(text: str) -> list:
+    """
+    Разбирает список URL для пакетной проверки, форматы см. parse_url_addresses
+    :param text: содержимое файла или stdin
+    :return: список URL
+    """
+    return list(parse_url_addresses(text))
+
@@ -0,0 +1,138 @@
+import json
+import re
+import socket
+import struct
+import time
+from typing import Iterable, Optional
+
+ZBX_HEADER = b'ZBXD\x01'
+DEFAULT_PORT = 10051
+# zabbix_sender отправляет не более 250 значений за одно соединение
+DEFAULT_BATCH_SIZE = 250
+DEFAULT_RETRIES = 2
+DEFAULT_RETRY_DELAY = 1.0
+DEFAULT_TIMEOUT = 10.0
+
+_re_patt_info = re.compile(r"(processed|failed|total):\s*(\d+)")
+
+
+def quote_key_param(param: str) -> str:
+    """
+    Параметр ключа элемента данных, как его подставляет zabbix вместо LLD макроса:
+    в кавычках, если он начинается с '"', ' ' или '[' или содержит ',' или ']', '"' внутри кавычек - '\\"'
+    """
+    if not param.startswith(('"', ' ', '[')) and ',' not in param and ']' not in param:
+        return param
+    return '"' + param.replace('"', '\\"') + '"'
+
+
+def item_key(url: str) -> str:
+    """
+    Ключ мастер элемента данных для URL, совпадает с ключом прототипа znwcserver.py[{#URL}] в шаблоне
+    """
+    return f"znwcserver.py[{quote_key_param(url)}]"
+
+
+def result_items(host: str, results: dict, clock: Optional[int] = None) -> list:
+    """
+    Значения для отправки результатов пакетной проверки
+    :param host: имя узла сети в zabbix
+    :param results: {<url>: <результат проверки>, ...}
+    :param clock: время проверки (unix time), по умолчанию текущее
+    :return: [{'host': ..., 'key': ..., 'value': ..., 'clock': ...}, ...]
+    """
+    if clock is None:
+        clock = int(time.time())
+    return [
+        {'host': host, 'key': item_key(url), 'value': json.dumps(result), 'clock': clock}
+        for url, result in results.items()
+    ]
+
+
+def pack(payload: dict) -> bytes:
+    """
+    Упаковывает запрос в формат протокола zabbix: заголовок, длина данных (8 байт little endian), JSON
+    """
+    data = json.dumps(payload).encode('utf-8')
+    return ZBX_HEADER + struct.pack('<Q', len(data)) + data
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = b''
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError('Connection closed by server')
+        buf += chunk
+    return buf
+
+
+def read_response(sock: socket.socket) -> dict:
+    header = _recv_exact(sock, len(ZBX_HEADER) + 8)
+    if not header.startswith(ZBX_HEADER):
+        raise ValueError('Invalid response header')
+    size, = struct.unpack('<Q', header[len(ZBX_HEADER):])
+    return json.loads(_recv_exact(sock, size).decode('utf-8'))
+
+
+def parse_info(info: str) -> dict:
+    """
+    Разбирает строку ответа трапера "processed: 2; failed: 0; total: 2; seconds spent: 0.000055"
+    :return: {'processed': 2, 'failed': 0, 'total': 2}
+    """
+    return {name: int(value) for name, value in _re_patt_info.findall(info)}
+
+
+def send_batch(items: list, server: str, port: int = DEFAULT_PORT, timeout: float = DEFAULT_TIMEOUT) -> dict:
+    """
+    Отправляет одну пачку значений за одно соединение (запрос "sender data")
+    :return: разобранный ответ трапера, см. parse_info
+    :raises OSError: ошибка соединения
+    :raises ValueError: некорректный ответ или ответ отличный от success
+    """
+    payload = {'request': 'sender data', 'data': items, 'clock': int(time.time())}
+    with socket.create_connection((server, port), timeout=timeout) as sock:
+        sock.sendall(pack(payload))
+        response = read_response(sock)
+    if response.get('response') != 'success':
+        raise ValueError(f"Server response: {response.get('response')} {response.get('info', '')}".strip())
+    return parse_info(response.get('info', ''))
+
+
+def send_values(items: Iterable[dict], server: str, port: int = DEFAULT_PORT,
+                batch_size: int = DEFAULT_BATCH_SIZE, retries: int = DEFAULT_RETRIES,
+                retry_delay: float = DEFAULT_RETRY_DELAY, timeout: float = DEFAULT_TIMEOUT) -> dict:
+    """
+    Отправляет значения траперу пачками по batch_size.
+    Пачка, которую не удалось отправить (ошибка соединения, ответ не success), повторяется
+    до retries раз, остальные пачки при этом не отправляются повторно.
+    Значения, отклоненные трапером (failed в ответе, например, нет такого элемента данных),
+    не повторяются - повторная отправка даст тот же результат.
+    :param items: значения, см. result_items
+    :param server: адрес zabbix сервера или прокси
+    :param port: порт трапера
+    :param batch_size: количество значений в одной пачке
+    :param retries: количество повторов отправки пачки
+    :param retry_delay: пауза перед повтором в секундах
+    :param timeout: таймаут соединения в секундах
+    :return: {'processed': .., 'failed': .., 'total': .., 'not_sent': .., 'errors': [..]}
+    """
+    items = list(items)
+    summary = {'processed': 0, 'failed': 0, 'total': 0, 'not_sent': 0, 'errors': []}
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(retry_delay)
+            try:
+                info = send_batch(batch, server, port, timeout)
+                break
+            except (OSError, ValueError) as e:
+                error = str(e)
+        else:
+            summary['not_sent'] += len(batch)
+            summary['errors'].append(error)
+            continue
+        for name in ('processed', 'failed', 'total'):
+            summary[name] += info.get(name, 0)
+    return summary
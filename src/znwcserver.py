@@ -1,43 +1,156 @@
 #!/usr/bin/python3
+import argparse
 import json
 import sys
+from typing import Optional
+
+from znwclib.probe import DEFAULT_BURST, DEFAULT_CONCURRENCY, DEFAULT_PER_HOST, sweep
+from znwclib.dns_cache import DEFAULT_TTL, Resolver
+from znwclib.web_check import DEFAULT_CONNECT_TIMEOUT, DEFAULT_MAX_REDIRECTS, DEFAULT_READ_TIMEOUT, check_url, \
+    new_session, parse_url_addresses
+from znwclib.zabbix_sender import DEFAULT_BATCH_SIZE, DEFAULT_PORT, DEFAULT_RETRIES, result_items, send_values
+
+__version__ = '0.2'
+
+
+def parse_cmd_args():
+    parser = argparse.ArgumentParser(
+        description="Check URL or list of URLs"
+    )
+    parser.add_argument('--version', action='version', version='Version is ' + __version__)
+    parser.add_argument("url",
+                        metavar="<url>",
+                        type=str, nargs='?',
+                        help="URL to check",
+                        )
+    parser.add_argument('-b', '--batch', type=str, nargs='?', const='-', metavar='<file>',
+                        help='Batch mode. Read URLs from file (or stdin if the file is omitted or "-"). '
+                             'Accepts znwcagent.py LLD JSON, JSON list of URLs or one URL per line. '
+                             'Prints JSON object {<url>: <result>, ...}')
+    parser.add_argument('-a', '--address', type=str, nargs='?', const='', metavar='<address>',
+                        help='Connect to this address instead of resolving the URL host name, the Host header '
+                             'and TLS SNI are taken from the URL. In batch mode without a value: connect to '
+                             'the {#ADDRESS} of each URL (znwcagent.py -A)')
+    parser.add_argument('--head', action='store_true',
+                        help='Check with a HEAD request, fall back to GET if the server rejects HEAD (405, 501)')
+    parser.add_argument('--max-body', type=int, metavar='<bytes>',
+                        help='Read at most this many bytes of the response body, the rest is not downloaded '
+                             'and the connection is closed. Default - read the whole body')
+    parser.add_argument('--max-redirects', type=int, default=DEFAULT_MAX_REDIRECTS, metavar='<count>',
+                        help='Maximum number of redirects, more redirects or a redirect loop give the error 6. '
+                             'Default = ' + str(DEFAULT_MAX_REDIRECTS))
+    parser.add_argument('--dns-cache', action='store_true',
+                        help='Resolve every host name once and share the addresses between checks '
+                             'until the record TTL expires (--dns-ttl for the system resolver)')
+    parser.add_argument('--resolver', type=str, metavar='<address>[,<address>]',
+                        help='Resolve host names with these DNS servers instead of the system resolver, '
+                             'implies --dns-cache. Requires dnspython')
+    parser.add_argument('--dns-ttl', type=float, default=DEFAULT_TTL, metavar='<seconds>',
+                        help='How long to keep addresses from the system resolver, which does not report '
+                             'TTL. Default = ' + str(DEFAULT_TTL))
+    parser.add_argument('--connect-timeout', type=float, default=DEFAULT_CONNECT_TIMEOUT, metavar='<seconds>',
+                        help='Connect timeout. Default = ' + str(DEFAULT_CONNECT_TIMEOUT))
+    parser.add_argument('--read-timeout', type=float, default=DEFAULT_READ_TIMEOUT, metavar='<seconds>',
+                        help='Read timeout (time between bytes, not for the whole response). Default = ' +
+                             str(DEFAULT_READ_TIMEOUT))
+    parser.add_argument('-d', '--deadline', type=float, metavar='<seconds>',
+                        help='Batch mode. Total time for the whole check. URLs that are not checked '
+                             'in time get the error 11 "Not Checked (Deadline)"')
+    parser.add_argument('-c', '--concurrency', type=int, default=DEFAULT_CONCURRENCY, metavar='<count>',
+                        help='Batch mode. Maximum number of simultaneous checks. Default = ' +
+                             str(DEFAULT_CONCURRENCY))
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST, metavar='<count>',
+                        help='Batch mode. Maximum number of simultaneous checks of one host. Default = ' +
+                             str(DEFAULT_PER_HOST))
+    parser.add_argument('--pool-connections', type=int, metavar='<count>',
+                        help='Batch mode. Number of connection pools (distinct scheme://host:port) to keep. '
+                             'Default is the number of distinct scheme://host:port in the list')
+    parser.add_argument('--pool-maxsize', type=int, metavar='<count>',
+                        help='Batch mode. Maximum number of keep-alive connections per scheme://host:port. '
+                             'Default is --per-host value')
+    parser.add_argument('--rate', type=float, metavar='<per second>',
+                        help='Batch mode. Maximum requests per second to one scheme://host:port. Default - no limit')
+    parser.add_argument('--burst', type=int, default=DEFAULT_BURST, metavar='<count>',
+                        help='Batch mode. Requests to one scheme://host:port in a row without waiting for --rate. '
+                             'Default = ' + str(DEFAULT_BURST))
+    parser.add_argument('--ip-rate', type=float, metavar='<per second>',
+                        help='Batch mode. Maximum requests per second to one IP address. Default - no limit')
+    parser.add_argument('--ip-burst', type=int, default=DEFAULT_BURST, metavar='<count>',
+                        help='Batch mode. Requests to one IP address in a row without waiting for --ip-rate. '
+                             'Default = ' + str(DEFAULT_BURST))
+    parser.add_argument('-z', '--zabbix-server', type=str, metavar='<server>',
+                        help='Batch mode. Send results to zabbix server (or proxy) trapper '
+                             'instead of printing them. Prints the sending summary')
+    parser.add_argument('--zabbix-port', type=int, default=DEFAULT_PORT, metavar='<port>',
+                        help='Zabbix trapper port. Default = ' + str(DEFAULT_PORT))
+    parser.add_argument('-s', '--host', type=str, metavar='<host>',
+                        help='Host name in zabbix, required with --zabbix-server')
+    parser.add_argument('--send-batch-size', type=int, default=DEFAULT_BATCH_SIZE, metavar='<count>',
+                        help='Number of values sent in one request. Default = ' + str(DEFAULT_BATCH_SIZE))
+    parser.add_argument('--send-retries', type=int, default=DEFAULT_RETRIES, metavar='<count>',
+                        help='Number of retries of a failed request. Default = ' + str(DEFAULT_RETRIES))
+    parser.add_argument('-u', '--human', default=False, action="store_true",
+                        help='Human friendly output format')
+    args = parser.parse_args()
+    if args.zabbix_server and not args.host:
+        parser.error('--host is required with --zabbix-server')
+    for name in ('concurrency', 'per_host', 'pool_connections', 'pool_maxsize'):
+        # 0 слотов - проверки ждут бесконечно
+        if getattr(args, name) is not None and getattr(args, name) < 1:
+            parser.error(f"--{name.replace('_', '-')} must be at least 1")
+    return args
+
+
+def read_batch(file_name: str) -> str:
+    if file_name == '-':
+        return sys.stdin.read()
+    with open(file_name) as f:
+        return f.read()
+
+
+def new_resolver(args) -> Optional[Resolver]:
+    if not args.dns_cache and not args.resolver:
+        return None
+    nameservers = [address.strip() for address in args.resolver.split(',')] if args.resolver else None
+    return Resolver(nameservers, ttl=args.dns_ttl)
 
-import requests
 
 if __name__ == '__main__':
-    if len(sys.argv) > 1:
-        url = sys.argv[1]
+    args = parse_cmd_args()
+    indent = 2 if args.human else None
+    timeout = (args.connect_timeout, args.read_timeout)
+    try:
+        resolver = new_resolver(args)
+    except ImportError as e:
+        print(f"Error: --resolver: {e}", file=sys.stderr)
+        sys.exit(-1)
+    if args.batch:
+        try:
+            addresses = parse_url_addresses(read_batch(args.batch))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(-1)
+        if args.address:
+            addresses = dict.fromkeys(addresses, args.address)
+        results = sweep(addresses, concurrency=args.concurrency, per_host=args.per_host,
+                        pool_connections=args.pool_connections, pool_maxsize=args.pool_maxsize,
+                        timeout=timeout, deadline=args.deadline,
+                        addresses=addresses if args.address is not None else None,
+                        rate=args.rate, burst=args.burst, ip_rate=args.ip_rate, ip_burst=args.ip_burst,
+                        head=args.head, max_body=args.max_body, max_redirects=args.max_redirects,
+                        resolver=resolver)
+        if args.zabbix_server:
+            summary = send_values(result_items(args.host, results), args.zabbix_server, args.zabbix_port,
+                                  batch_size=args.send_batch_size, retries=args.send_retries)
+            print(json.dumps(summary, indent=indent))
+            if summary['not_sent']:
+                sys.exit(1)
+        else:
+            print(json.dumps(results, indent=indent))
+    elif args.url:
+        session = new_session(resolver=resolver)
         try:
-            res = requests.get(url)
-            m = {
-                'err': 0,
-                'status_code': res.status_code,
-                # Final URL location of Response.
-                'url': res.url,
-                'elapsed': res.elapsed.total_seconds() * 1000,
-            }
-        except requests.exceptions.HTTPError:
-            m = {'err': 1, 'err_str': 'HTTP Error'}
-        except requests.exceptions.SSLError:
-            m = {'err': 2, 'err_str': 'SSL Error'}
-        except requests.exceptions.ConnectTimeout:
-            m = {'err': 3, 'err_str': 'Connect Timeout'}
-        except requests.exceptions.ReadTimeout:
-            m = {'err': 4, 'err_str': 'Read Timeout'}
-        except requests.exceptions.ConnectionError:
-            m = {'err': 5, 'err_str': 'Connection Error'}
-        except requests.exceptions.TooManyRedirects:
-            m = {'err': 6, 'err_str': 'Too Many Redirects'}
-
-        except requests.exceptions.MissingSchema:
-            m = {'err': 7, 'err_str': 'Missing Schema'}
-        except requests.exceptions.InvalidSchema:
-            m = {'err': 8, 'err_str': 'Invalid Schema'}
-        except requests.exceptions.InvalidURL:
-            m = {'err': 9, 'err_str': 'Invalid URL'}
-        except requests.exceptions.InvalidHeader:
-            m = {'err': 10, 'err_str': 'Invalid Header'}
-        except BaseException:
-            m = {'err': 1000, 'err_str': 'Unknown Error'}
-
-        print(json.dumps(m))
+            print(json.dumps(check_url(args.url, session, timeout, address=args.address or None, head=args.head,
+                                       max_body=args.max_body, max_redirects=args.max_redirects), indent=indent))
+        finally:
+            session.close()
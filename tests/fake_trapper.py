@@ -0,0 +1,60 @@
+"""
+Fake zabbix trapper for tests of znwclib.zabbix_sender
+"""
+import json
+import socketserver
+import struct
+import threading
+
+from znwclib.zabbix_sender import ZBX_HEADER, pack
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        trapper = self.server.trapper
+        with trapper.lock:
+            trapper.connections += 1
+            drop = trapper.drop_connections > 0
+            if drop:
+                trapper.drop_connections -= 1
+        if drop:
+            return
+        header = self.request.recv(len(ZBX_HEADER) + 8, socketserver.socket.MSG_WAITALL)
+        size, = struct.unpack('<Q', header[len(ZBX_HEADER):])
+        payload = json.loads(self.request.recv(size, socketserver.socket.MSG_WAITALL))
+        data = payload['data']
+        failed = [item for item in data if item['key'] in trapper.unknown_keys]
+        with trapper.lock:
+            trapper.requests.append(payload)
+            trapper.values.extend(item for item in data if item not in failed)
+        info = f"processed: {len(data) - len(failed)}; failed: {len(failed)}; total: {len(data)}; " \
+               f"seconds spent: 0.000100"
+        self.request.sendall(pack({'response': 'success', 'info': info}))
+
+
+class FakeTrapper:
+    """
+    Accepts "sender data" requests, stores received values.
+    drop_connections - number of connections closed without an answer
+    unknown_keys - keys reported as failed
+    """
+
+    def __init__(self, drop_connections=0, unknown_keys=()):
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.trapper = self
+        self.port = self.server.server_address[1]
+        self.lock = threading.Lock()
+        self.drop_connections = drop_connections
+        self.unknown_keys = set(unknown_keys)
+        self.connections = 0
+        self.requests = []
+        self.values = []
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,124 @@
+"""
+Local HTTP server for tests of znwcserver checks
+"""
+import os.path
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+BIG_BODY_SIZE = 1024 * 1024
+# /trickle: тело отдается 10 с, но каждый байт приходит раньше read timeout
+TRICKLE_SIZE = 100
+TRICKLE_INTERVAL = 0.1
+# /redirect -> /, /loop-a -> /loop-b -> /loop-a, /chain/<n> -> /chain/<n - 1> -> ... -> /,
+# /big-redirect -> / с телом BIG_BODY_SIZE
+REDIRECTS = {'/redirect': '/', '/loop-a': '/loop-b', '/loop-b': '/loop-a', '/chain/0': '/'}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _redirect(self) -> bool:
+        location = REDIRECTS.get(self.path)
+        if location is None and self.path.startswith('/chain/'):
+            location = f"/chain/{int(self.path[len('/chain/'):]) - 1}"
+        body = b''
+        if location is None and self.path == '/big-redirect':
+            location, body = '/', b'x' * BIG_BODY_SIZE
+        if location is None:
+            return False
+        self.send_response(301)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command == 'GET':
+            try:
+                self.wfile.write(body)
+            except ConnectionError:
+                pass
+        return True
+
+    def do_HEAD(self):
+        self.server.methods.append('HEAD')
+        if self._redirect():
+            return
+        if self.path == '/no-head':
+            self.send_response(405)
+            self.send_header('Allow', 'GET')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(BIG_BODY_SIZE if self.path == '/big' else 2))
+        self.end_headers()
+
+    def do_GET(self):
+        self.server.methods.append('GET')
+        if self.path == '/slow':
+            time.sleep(1)
+        if self._redirect():
+            return
+        self.server.last_host = self.headers['Host']
+        if self.path == '/trickle':
+            self._trickle()
+            return
+        body = b'x' * BIG_BODY_SIZE if self.path == '/big' else b'ok'
+        self.send_response(404 if self.path == '/missing' else 200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except ConnectionError:
+            # клиент прочитал только часть тела
+            pass
+
+    def _trickle(self):
+        """
+        Тело TRICKLE_SIZE байт, по одному байту в TRICKLE_INTERVAL секунд
+        """
+        self.send_response(200)
+        self.send_header('Content-Length', str(TRICKLE_SIZE))
+        self.end_headers()
+        try:
+            for _ in range(TRICKLE_SIZE):
+                self.wfile.write(b'x')
+                self.wfile.flush()
+                time.sleep(TRICKLE_INTERVAL)
+        except ConnectionError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+CERT_FILE = os.path.join(os.path.dirname(__file__), 'localhost.crt')
+KEY_FILE = os.path.join(os.path.dirname(__file__), 'localhost.key')
+
+
+class LocalServer:
+    def __init__(self, tls=False):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.sni = None
+        self.server.last_host = None
+        self.server.methods = []
+        scheme = 'http'
+        if tls:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(CERT_FILE, KEY_FILE)
+            context.sni_callback = self._sni
+            self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+            scheme = 'https'
+        self.base_url = f"{scheme}://127.0.0.1:{self.server.server_port}"
+
+    def _sni(self, sock, server_name, context):
+        self.server.sni = server_name
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,99 @@
+import io
+import json
+import os.path
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+from znwclib.agent import diff_urls, lld_row, urls_hash, write_lld
+from znwclib.nginx_config import get_URLs_from_config, iter_URLs_from_config
+
+cur_test_directory = os.path.dirname(__file__)
+agent = os.path.join(os.path.dirname(cur_test_directory), 'src', 'znwcagent.py')
+
+
+class TestAgent(TestCase):
+    def assertSameOutput(self, urls, indent, chunk_size=1000):
+        out = io.StringIO()
+        write_lld(iter(urls), out, indent=indent, chunk_size=chunk_size)
+        self.assertEqual(json.dumps([{'{#URL}': url} for url in urls], indent=indent) + '\n', out.getvalue())
+
+    def test_write_lld(self):
+        for urls in ([], ['http://a.ru'], ['http://a.ru', 'https://b.ru:8443/path', 'http://xn--d1acufc.xn--p1ai/"']):
+            for indent in (None, 2):
+                for chunk_size in (1, 2, 1000):
+                    self.assertSameOutput(urls, indent, chunk_size)
+
+    def test_write_lld_address(self):
+        items = [('http://a.ru', '1.1.1.1'), ['https://b.ru', None]]
+        for indent in (None, 2):
+            out = io.StringIO()
+            write_lld(iter(items), out, indent=indent, address=True)
+            self.assertEqual([{'{#URL}': 'http://a.ru', '{#ADDRESS}': '1.1.1.1'},
+                              {'{#URL}': 'https://b.ru', '{#ADDRESS}': ''}], json.loads(out.getvalue()))
+        self.assertEqual({'{#URL}': 'http://a.ru'}, lld_row('http://a.ru'))
+
+    def test_iter_urls(self):
+        for conf in ('nginx.conf', 'nginx2.conf'):
+            config_file = os.path.join(cur_test_directory, conf)
+            urls = iter_URLs_from_config(config_file, 'localhost')
+            self.assertNotIsInstance(urls, list)
+            self.assertEqual(get_URLs_from_config(config_file, 'localhost'), list(urls))
+            self.assertSameOutput(get_URLs_from_config(config_file, 'localhost'), 2)
+
+    def test_iter_urls_error(self):
+        urls = iter_URLs_from_config(os.path.join(cur_test_directory, 'missing.conf'), 'localhost')
+        self.assertTrue(urls.startswith('Error: '))
+
+    def test_dump(self):
+        with open(os.path.join(cur_test_directory, 'nginx2.conf')) as f:
+            dump = f"# configuration file /etc/nginx/nginx.conf:\n{f.read()}\n"
+        expected = [{'{#URL}': url} for url in get_URLs_from_config(None, 'localhost', config_dump=dump)]
+        self.assertTrue(expected)
+        res = subprocess.run([sys.executable, agent, '-H', 'localhost', '-T', '-'], input=dump,
+                             capture_output=True, text=True, check=True)
+        self.assertEqual(expected, json.loads(res.stdout))
+        with tempfile.TemporaryDirectory() as tmp:
+            dump_file = os.path.join(tmp, 'nginx-T.txt')
+            with open(dump_file, 'w') as f:
+                f.write(dump)
+            cmd = [sys.executable, agent, '-H', 'localhost', '-C', os.path.join(tmp, 'urls.cache'), '-T', dump_file]
+            for _ in range(2):
+                res = subprocess.run(cmd, capture_output=True, text=True, check=True)
+                self.assertEqual(expected, json.loads(res.stdout))
+
+    def test_agent_wildcard_address(self):
+        config_file = os.path.join(cur_test_directory, 'nginx2.conf')
+        pairs = get_URLs_from_config(config_file, 'localhost', listen_address=True)
+        res = subprocess.run([sys.executable, agent, '-H', 'localhost', '-A', config_file],
+                             capture_output=True, text=True, check=True)
+        self.assertEqual([lld_row(pair) for pair in pairs], json.loads(res.stdout))
+        self.assertIn('', [row['{#ADDRESS}'] for row in json.loads(res.stdout)])
+        res = subprocess.run([sys.executable, agent, '-H', 'localhost', '--wildcard-address', '10.0.0.5',
+                              config_file], capture_output=True, text=True, check=True)
+        self.assertEqual([{'{#URL}': url, '{#ADDRESS}': address or '10.0.0.5'} for url, address in pairs],
+                         json.loads(res.stdout))
+
+    def test_diff_urls(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            state_file = os.path.join(tmp, 'diff.state')
+            diff = diff_urls(['http://a.ru', 'http://b.ru'], state_file)
+            self.assertEqual([{'{#URL}': 'http://a.ru'}, {'{#URL}': 'http://b.ru'}], diff['added'])
+            self.assertEqual([], diff['removed'])
+            diff = diff_urls(['http://c.ru', 'http://b.ru'], state_file)
+            self.assertEqual({'hash': urls_hash(['http://b.ru', 'http://c.ru']),
+                              'added': [{'{#URL}': 'http://c.ru'}],
+                              'removed': [{'{#URL}': 'http://a.ru'}]}, diff)
+            unchanged = diff_urls(['http://b.ru', 'http://c.ru'], state_file)
+            self.assertEqual({'hash': diff['hash'], 'added': [], 'removed': []}, unchanged)
+
+    def test_agent_diff(self):
+        config_file = os.path.join(cur_test_directory, 'nginx2.conf')
+        urls = get_URLs_from_config(config_file, 'localhost')
+        with tempfile.TemporaryDirectory() as tmp:
+            cmd = [sys.executable, agent, '-H', 'localhost', '-D', os.path.join(tmp, 'diff.state'), config_file]
+            first = json.loads(subprocess.run(cmd, capture_output=True, text=True, check=True).stdout)
+            self.assertEqual([{'{#URL}': url} for url in urls], first['added'])
+            second = json.loads(subprocess.run(cmd, capture_output=True, text=True, check=True).stdout)
+            self.assertEqual({'hash': first['hash'], 'added': [], 'removed': []}, second)
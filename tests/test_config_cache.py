@@ -0,0 +1,198 @@
+import json
+import os
+import os.path
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import TestCase, mock
+
+import crossplane
+
+from znwclib import config_cache, nginx_config
+from znwclib.nginx_config import get_URLs_from_config
+
+cur_test_directory = os.path.dirname(__file__)
+src_directory = os.path.join(os.path.dirname(cur_test_directory), 'src')
+
+
+class TestConfigCache(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.conf_d = os.path.join(self.dir, 'conf.d')
+        os.mkdir(self.conf_d)
+        self.main_conf = os.path.join(self.dir, 'nginx.conf')
+        with open(self.main_conf, 'w') as f:
+            f.write('http {\n    include conf.d/*.conf;\n}\n')
+        self.write_vhost('a.conf', 'a.ru')
+        self.cache_file = os.path.join(self.dir, 'urls.cache')
+        self.key = {'config_file': self.main_conf, 'port': 80}
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def write_vhost(self, name, server_name):
+        with open(os.path.join(self.conf_d, name), 'w') as f:
+            f.write('server {\n    listen 80;\n    server_name %s;\n}\n' % server_name)
+
+    def discover(self):
+        depends_on = []
+        urls = get_URLs_from_config(self.main_conf, 'localhost', depends_on=depends_on)
+        return urls, depends_on
+
+    def test_depends_on(self):
+        urls, depends_on = self.discover()
+        self.assertEqual(['http://a.ru'], urls)
+        self.assertEqual([self.main_conf, os.path.join(self.conf_d, 'a.conf'), self.conf_d], depends_on)
+
+    def test_depends_on_nested_glob(self):
+        sites = os.path.join(self.dir, 'sites')
+        for site in ('x', 'y'):
+            os.makedirs(os.path.join(sites, site))
+        os.mkdir(os.path.join(sites, 'x', 'conf.d'))
+        with open(os.path.join(sites, 'x', 'conf.d', 'x.conf'), 'w') as f:
+            f.write('server {\n    listen 80;\n    server_name x.ru;\n}\n')
+        with open(self.main_conf, 'w') as f:
+            f.write('http {\n    include sites/*/conf.d/*.conf;\n}\n')
+        urls, depends_on = self.discover()
+        self.assertEqual(['http://x.ru'], urls)
+        self.assertEqual([sites, os.path.join(sites, 'x'), os.path.join(sites, 'y'),
+                          os.path.join(sites, 'x', 'conf.d')], depends_on[2:])
+        self.assertTrue(config_cache.save(self.cache_file, self.key, depends_on, urls))
+        # новый файл во вложенном каталоге меняет только этот каталог
+        with open(os.path.join(sites, 'x', 'conf.d', 'z.conf'), 'w') as f:
+            f.write('server {\n    listen 80;\n    server_name z.ru;\n}\n')
+        self.assertIsNone(config_cache.load(self.cache_file, self.key))
+
+    def test_roundtrip(self):
+        urls, depends_on = self.discover()
+        self.assertTrue(config_cache.save(self.cache_file, self.key, depends_on, urls))
+        self.assertEqual(urls, config_cache.load(self.cache_file, self.key))
+
+    def test_missing_or_broken(self):
+        self.assertIsNone(config_cache.load(self.cache_file, self.key))
+        with open(self.cache_file, 'w') as f:
+            f.write('{')
+        self.assertIsNone(config_cache.load(self.cache_file, self.key))
+
+    def test_key_changed(self):
+        urls, depends_on = self.discover()
+        config_cache.save(self.cache_file, self.key, depends_on, urls)
+        self.assertIsNone(config_cache.load(self.cache_file, dict(self.key, port=8080)))
+
+    def test_file_changed(self):
+        urls, depends_on = self.discover()
+        config_cache.save(self.cache_file, self.key, depends_on, urls)
+        self.write_vhost('a.conf', 'aa.ru')
+        self.assertIsNone(config_cache.load(self.cache_file, self.key))
+
+    def test_file_added(self):
+        urls, depends_on = self.discover()
+        config_cache.save(self.cache_file, self.key, depends_on, urls)
+        # время изменения каталога обновляется с точностью до тика часов ядра
+        time.sleep(0.05)
+        self.write_vhost('b.conf', 'b.ru')
+        self.assertIsNone(config_cache.load(self.cache_file, self.key))
+        urls, _ = self.discover()
+        self.assertEqual(['http://a.ru', 'http://b.ru'], urls)
+
+    def test_modified_during_parse(self):
+        urls, depends_on = self.discover()
+        config_cache.save(self.cache_file, self.key, depends_on, urls, parsed_at=time.time() - 3600)
+        self.assertIsNone(config_cache.load(self.cache_file, self.key))
+
+    def test_max_age(self):
+        urls, depends_on = self.discover()
+        config_cache.save(self.cache_file, self.key, depends_on, urls)
+        with open(self.cache_file) as f:
+            cache = json.load(f)
+        cache['created'] -= 100
+        with open(self.cache_file, 'w') as f:
+            json.dump(cache, f)
+        self.assertEqual(urls, config_cache.load(self.cache_file, self.key, max_age=200))
+        self.assertIsNone(config_cache.load(self.cache_file, self.key, max_age=50))
+
+    def test_parse_cache_same_urls(self):
+        for conf in ('nginx.conf', 'nginx2.conf'):
+            for skip_locations in (False, True):
+                config_file = os.path.join(cur_test_directory, conf)
+                expected = get_URLs_from_config(config_file, 'localhost', skip_locations=skip_locations)
+                parse_cache = {}
+                self.assertEqual(expected, get_URLs_from_config(config_file, 'localhost',
+                                                                skip_locations=skip_locations,
+                                                                parse_cache=parse_cache))
+                # как после сохранения в файл
+                parse_cache = json.loads(json.dumps(parse_cache))
+                self.assertEqual(expected, get_URLs_from_config(config_file, 'localhost',
+                                                                skip_locations=skip_locations,
+                                                                parse_cache=parse_cache))
+
+    def test_parse_cache_changed_file_only(self):
+        self.write_vhost('b.conf', 'b.ru')
+        parse_cache = {}
+        get_URLs_from_config(self.main_conf, 'localhost', parse_cache=parse_cache)
+        parse_cache = json.loads(json.dumps(parse_cache))
+        self.write_vhost('b.conf', 'bb.ru')
+        with mock.patch.object(crossplane, 'parse', wraps=crossplane.parse) as parse, \
+                mock.patch.object(nginx_config, 'process_server', wraps=nginx_config.process_server) as process:
+            urls = get_URLs_from_config(self.main_conf, 'localhost', parse_cache=parse_cache)
+        self.assertEqual(['http://a.ru', 'http://bb.ru'], urls)
+        self.assertEqual([os.path.join(self.conf_d, 'b.conf')], [c.args[0] for c in parse.call_args_list])
+        self.assertEqual(1, process.call_count)
+        self.assertEqual({self.main_conf, os.path.join(self.conf_d, 'a.conf'), os.path.join(self.conf_d, 'b.conf')},
+                         set(parse_cache['files']))
+
+    def test_parse_cache_moved_server(self):
+        parse_cache = {}
+        get_URLs_from_config(self.main_conf, 'localhost', parse_cache=parse_cache)
+        path = os.path.join(self.conf_d, 'a.conf')
+        with open(path) as f:
+            text = f.read()
+        with open(path, 'w') as f:
+            f.write('# vhost a.ru\n\n' + text)
+        with mock.patch.object(nginx_config, 'process_server', wraps=nginx_config.process_server) as process:
+            urls = get_URLs_from_config(self.main_conf, 'localhost', parse_cache=parse_cache)
+        # блок server сдвинулся на две строки, но не изменился
+        self.assertEqual(['http://a.ru'], urls)
+        self.assertEqual(0, process.call_count)
+        self.assertEqual(1, len(parse_cache['servers']))
+
+    def test_parse_cache_removed_file(self):
+        self.write_vhost('b.conf', 'b.ru')
+        parse_cache = {}
+        get_URLs_from_config(self.main_conf, 'localhost', parse_cache=parse_cache)
+        os.unlink(os.path.join(self.conf_d, 'b.conf'))
+        self.assertEqual(['http://a.ru'], get_URLs_from_config(self.main_conf, 'localhost', parse_cache=parse_cache))
+        self.assertEqual(2, len(parse_cache['files']))
+        self.assertEqual(1, len(parse_cache['servers']))
+
+    def test_parse_cache_errors(self):
+        with open(self.main_conf, 'w') as f:
+            f.write('http {\n    include missing.conf;\n}\n')
+        expected = get_URLs_from_config(self.main_conf, 'localhost')
+        self.assertTrue(expected.startswith('Error: '))
+        self.assertEqual(expected, get_URLs_from_config(self.main_conf, 'localhost', parse_cache={}))
+
+    def run_agent(self):
+        code = (
+            "import runpy, sys\n"
+            "sys.argv = ['znwcagent.py', '-C', %r, '-H', 'localhost', %r]\n"
+            "try:\n"
+            "    runpy.run_path('znwcagent.py', run_name='__main__')\n"
+            "finally:\n"
+            "    print(sorted(m for m in ('crossplane', 'dns', 'validators') if m in sys.modules), file=sys.stderr)\n"
+        ) % (self.cache_file, self.main_conf)
+        res = subprocess.run([sys.executable, '-c', code], cwd=src_directory,
+                             capture_output=True, text=True, check=True)
+        return json.loads(res.stdout), res.stderr.strip()
+
+    def test_agent_cache_hit_skips_heavy_imports(self):
+        expected = [{'{#URL}': 'http://a.ru'}]
+        self.assertEqual((expected, "['crossplane', 'validators']"), self.run_agent())
+        self.assertTrue(os.path.exists(self.cache_file))
+        self.assertEqual(2, len(config_cache.load_state(self.cache_file + '.parsed')['files']))
+        self.assertEqual((expected, '[]'), self.run_agent())
+        time.sleep(0.05)
+        self.write_vhost('b.conf', 'b.ru')
+        self.assertEqual((expected + [{'{#URL}': 'http://b.ru'}], "['crossplane', 'validators']"), self.run_agent())
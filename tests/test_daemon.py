@@ -0,0 +1,133 @@
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import urllib.request
+from unittest import TestCase, mock, skipUnless
+
+from znwclib import daemon as daemon_module
+from znwclib.daemon import ProbeDaemon, serve_results
+
+
+class TestDaemon(TestCase):
+    def setUp(self) -> None:
+        fd, self.urls_file = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump([{'{#URL}': 'http://a.ru'}, {'{#URL}': 'http://b.ru'}], f)
+        self.checked = []
+        self.sent = []
+
+    def tearDown(self) -> None:
+        os.unlink(self.urls_file)
+
+    def check(self, url):
+        self.checked.append(url)
+        return {'err': 0, 'status_code': 200, 'url': url}
+
+    def run_daemon(self, daemon, seconds):
+        async def run():
+            stop = asyncio.Event()
+            asyncio.get_running_loop().call_later(seconds, stop.set)
+            await daemon.run(stop)
+
+        asyncio.run(run())
+
+    def test_run(self):
+        daemon = ProbeDaemon(self.urls_file, interval=0.2, jitter=0.1, check=self.check,
+                             sender=self.sent.append, send_interval=0.1)
+        self.run_daemon(daemon, 0.7)
+        self.assertEqual({'http://a.ru', 'http://b.ru'}, set(daemon.results))
+        self.assertEqual(200, daemon.results['http://a.ru']['status_code'])
+        self.assertIn('clock', daemon.results['http://a.ru'])
+        # every URL is checked about once per interval
+        self.assertGreaterEqual(self.checked.count('http://a.ru'), 2)
+        self.assertLessEqual(self.checked.count('http://a.ru'), 5)
+        sent_urls = set(url for results in self.sent for url in results)
+        self.assertEqual({'http://a.ru', 'http://b.ru'}, sent_urls)
+
+    def test_load_urls(self):
+        daemon = ProbeDaemon(self.urls_file, interval=100, jitter=0, check=self.check)
+        self.assertTrue(daemon.load_urls())
+        self.assertFalse(daemon.load_urls())
+        daemon.results['http://a.ru'] = {'err': 0}
+        with open(self.urls_file, 'w') as f:
+            f.write('http://b.ru\nhttp://c.ru\n')
+        self.assertTrue(daemon.load_urls(force=True))
+        self.assertEqual(['http://b.ru', 'http://c.ru'], daemon.scheduler.urls)
+        self.assertEqual({}, daemon.results)
+
+    def test_use_address(self):
+        with open(self.urls_file, 'w') as f:
+            json.dump([{'{#URL}': 'http://a.ru', '{#ADDRESS}': '1.1.1.1'}], f)
+        checked = []
+
+        def check(url, address=None):
+            checked.append((url, address))
+            return {'err': 0}
+
+        daemon = ProbeDaemon(self.urls_file, interval=0.2, jitter=0, check=check, use_address=True)
+        self.run_daemon(daemon, 0.3)
+        self.assertEqual(('http://a.ru', '1.1.1.1'), checked[0])
+
+    def test_reload_resizes_pool(self):
+        sessions = []
+
+        def pooled_check(pool_connections, *args):
+            session = mock.Mock(pool_connections=pool_connections)
+            sessions.append(session)
+            return self.check, session
+
+        def write_urls():
+            with open(self.urls_file, 'w') as f:
+                f.write('http://a.ru\nhttp://b.ru\nhttps://b.ru\n')
+
+        async def run():
+            stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.15, write_urls)
+            loop.call_later(0.5, stop.set)
+            await daemon.run(stop)
+
+        daemon = ProbeDaemon(self.urls_file, interval=0.1, jitter=0, reload_interval=0.1)
+        with mock.patch.object(daemon_module, 'pooled_check', pooled_check):
+            asyncio.run(run())
+        # пул новой сессии рассчитан на новое количество scheme://host:port, прежняя сессия закрыта
+        self.assertEqual([2, 3], [session.pool_connections for session in sessions])
+        self.assertTrue(all(session.close.called for session in sessions))
+        self.assertIn('https://b.ru', daemon.results)
+
+    def test_serve_results(self):
+        daemon = ProbeDaemon(self.urls_file, interval=100, jitter=0, check=self.check)
+        daemon.results['http://a.ru/?x=1'] = {'err': 0}
+        server = serve_results(daemon, '127.0.0.1', 0)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            with urllib.request.urlopen(base_url + '/results') as res:
+                self.assertEqual({'http://a.ru/?x=1': {'err': 0}}, json.load(res))
+            query = urllib.parse.urlencode({'url': 'http://a.ru/?x=1'})
+            with urllib.request.urlopen(base_url + '/result?' + query) as res:
+                self.assertEqual({'err': 0}, json.load(res))
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(base_url + '/result?url=http://b.ru')
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @skipUnless(socket.has_ipv6, 'no IPv6')
+    def test_serve_results_ipv6(self):
+        daemon = ProbeDaemon(self.urls_file, interval=100, jitter=0, check=self.check)
+        daemon.results['http://a.ru'] = {'err': 0}
+        try:
+            with socket.socket(socket.AF_INET6) as sock:
+                sock.bind(('::1', 0))
+        except OSError:
+            self.skipTest('IPv6 loopback is not available')
+        server = serve_results(daemon, '::1', 0)
+        try:
+            self.assertEqual(socket.AF_INET6, server.socket.family)
+            with urllib.request.urlopen(f"http://[::1]:{server.server_address[1]}/results") as res:
+                self.assertEqual({'http://a.ru': {'err': 0}}, json.load(res))
+        finally:
+            server.shutdown()
+            server.server_close()
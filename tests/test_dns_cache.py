@@ -0,0 +1,252 @@
+import os.path
+import socket
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from local_server import LocalServer
+from znwclib.dns_cache import DNSCache, NameNotFound, Resolver, TTLCache, system_lookup
+from znwclib.nginx_config import get_URLs_from_config
+from znwclib.probe import sweep
+from znwclib.web_check import check_url, new_session
+
+cur_test_directory = os.path.dirname(__file__)
+
+
+class FakeLookup:
+    def __init__(self, existing=(), ttl=60, delay=0.0):
+        self.existing = set(existing)
+        self.ttl = ttl
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, name):
+        with self._lock:
+            self.calls.append(name)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return name in self.existing, time.time() + self.ttl
+
+
+class TestDNSCache(TestCase):
+    def test_check_names_dedup(self):
+        lookup = FakeLookup(existing=['a.ru'])
+        cache = DNSCache(lookup=lookup)
+        self.assertEqual({'a.ru': True, 'b.ru': False}, cache.check_names(['a.ru', 'b.ru', 'a.ru']))
+        self.assertEqual(['a.ru', 'b.ru'], sorted(lookup.calls))
+
+    def test_concurrent(self):
+        lookup = FakeLookup(delay=0.05)
+        cache = DNSCache(workers=4, lookup=lookup)
+        cache.check_names([f"h{i}.ru" for i in range(8)])
+        self.assertEqual(8, len(lookup.calls))
+        self.assertEqual(4, lookup.max_active)
+
+    def test_ttl(self):
+        lookup = FakeLookup(ttl=60)
+        cache = DNSCache(lookup=lookup)
+        cache.check_names(['a.ru'])
+        cache.check_names(['a.ru'])
+        self.assertEqual(1, len(lookup.calls))
+        cache.entries['a.ru'][1] = time.time() - 1
+        cache.check_names(['a.ru'])
+        self.assertEqual(2, len(lookup.calls))
+
+    def test_expires(self):
+        cache = DNSCache(lookup=FakeLookup(ttl=60))
+        cache.entries['a.ru'] = [True, time.time() + 10]
+        cache.check_names(['a.ru', 'b.ru'])
+        self.assertLess(cache.expires, time.time() + 11)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_file = os.path.join(tmp, 'dns.cache')
+            cache = DNSCache(cache_file, lookup=FakeLookup(existing=['a.ru']))
+            cache.check_names(['a.ru', 'b.ru'])
+            cache.entries['c.ru'] = [True, time.time() - 1]
+            self.assertTrue(cache.save())
+            lookup = FakeLookup()
+            cache = DNSCache(cache_file, lookup=lookup)
+            self.assertEqual(['a.ru', 'b.ru'], sorted(cache.entries))
+            # отрицательный ответ тоже хранится
+            self.assertEqual({'a.ru': True, 'b.ru': False}, cache.check_names(['a.ru', 'b.ru']))
+            self.assertEqual([], lookup.calls)
+
+    def test_fetch_required(self):
+        class NoFetch(TTLCache):
+            pass
+
+        with self.assertRaises(TypeError):
+            NoFetch()
+
+    def test_get_urls_dns_check(self):
+        config_file = os.path.join(cur_test_directory, 'nginx2.conf')
+        lookup = FakeLookup(existing=['company.com'])
+        dns_urls = get_URLs_from_config(config_file, 'localhost', skip_locations=True, dns_check=True,
+                                        dns_cache=DNSCache(lookup=lookup))
+        self.assertEqual(['http://company.com', 'https://company.com'], dns_urls)
+        self.assertEqual(len(lookup.calls), len(set(lookup.calls)))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeAddressLookup:
+    def __init__(self, hosts, ttl=None, delay=0.0):
+        """
+        :param hosts: {<имя>: [<адрес>, ...]}, остальные имена не разрешаются
+        """
+        self.hosts = hosts
+        self.ttl = ttl
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, host):
+        with self._lock:
+            self.calls.append(host)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        if host not in self.hosts:
+            raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+        return self.hosts[host], self.ttl
+
+
+class TestResolver(TestCase):
+    def test_resolve_cached(self):
+        lookup = FakeAddressLookup({'a.ru': ['10.0.0.1', '10.0.0.2']})
+        resolver = Resolver(lookup=lookup)
+        self.assertEqual(['10.0.0.1', '10.0.0.2'], resolver.resolve('a.ru'))
+        self.assertEqual(['10.0.0.1', '10.0.0.2'], resolver.resolve('A.ru'))
+        self.assertEqual(['a.ru'], lookup.calls)
+        self.assertGreaterEqual(resolver.lookup_ms('a.ru'), 0.0)
+        self.assertIsNone(resolver.lookup_ms('b.ru'))
+
+    def test_ttl(self):
+        clock = FakeClock()
+        lookup = FakeAddressLookup({'a.ru': ['10.0.0.1']}, ttl=30)
+        resolver = Resolver(ttl=300, lookup=lookup, clock=clock)
+        resolver.resolve('a.ru')
+        clock.now += 29
+        resolver.resolve('a.ru')
+        self.assertEqual(1, len(lookup.calls))
+        # TTL из ответа важнее ttl по умолчанию
+        clock.now += 1
+        resolver.resolve('a.ru')
+        self.assertEqual(2, len(lookup.calls))
+
+    def test_negative_ttl(self):
+        clock = FakeClock()
+        lookup = FakeAddressLookup({})
+        resolver = Resolver(negative_ttl=10, lookup=lookup, clock=clock)
+        for _ in range(2):
+            with self.assertRaises(socket.gaierror):
+                resolver.resolve('missing.ru')
+        self.assertEqual(1, len(lookup.calls))
+        clock.now += 10
+        with self.assertRaises(socket.gaierror):
+            resolver.resolve('missing.ru')
+        self.assertEqual(2, len(lookup.calls))
+
+    def test_error_ttl(self):
+        clock = FakeClock()
+        calls = []
+
+        def lookup(host):
+            calls.append(host)
+            if host == 'soa.ru':
+                raise NameNotFound(socket.EAI_NONAME, 'name not found', ttl=5)
+            if host == 'timeout.ru':
+                raise socket.gaierror(socket.EAI_AGAIN, 'Temporary failure in name resolution')
+            raise UnicodeError('label too long')
+
+        resolver = Resolver(negative_ttl=100, lookup=lookup, clock=clock)
+        for host, error in (('soa.ru', NameNotFound), ('timeout.ru', socket.gaierror), ('bad.ru', UnicodeError)):
+            with self.assertRaises(error) as context:
+                resolver.resolve(host)
+            # из кэша выбрасывается исключение того же типа, но не тот же объект
+            with self.assertRaises(error) as cached:
+                resolver.resolve(host)
+            self.assertIs(type(context.exception), type(cached.exception))
+            self.assertEqual(context.exception.args, cached.exception.args)
+            self.assertIsNot(context.exception, cached.exception)
+        self.assertIsInstance(cached.exception, UnicodeError)
+        # TTL отрицательного ответа из SOA, ошибка сервера не хранится (failure_ttl = 0)
+        self.assertEqual(['soa.ru', 'timeout.ru', 'timeout.ru', 'bad.ru', 'bad.ru'], calls)
+        clock.now += 5
+        with self.assertRaises(NameNotFound):
+            resolver.resolve('soa.ru')
+        self.assertEqual('soa.ru', calls[-1])
+
+    def test_concurrent_same_host(self):
+        lookup = FakeAddressLookup({'a.ru': ['10.0.0.1']}, delay=0.05)
+        resolver = Resolver(lookup=lookup)
+        threads = [threading.Thread(target=resolver.resolve, args=('a.ru',)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(['a.ru'], lookup.calls)
+
+    def test_prefetch(self):
+        lookup = FakeAddressLookup({f"h{i}.ru": [f"10.0.0.{i}"] for i in range(8)}, delay=0.05)
+        resolver = Resolver(workers=4, lookup=lookup)
+        result = resolver.prefetch([f"h{i}.ru" for i in range(8)] + ['h0.ru', 'missing.ru', ''])
+        self.assertEqual(9, len(result))
+        self.assertEqual(['10.0.0.3'], result['h3.ru'])
+        self.assertIsNone(result['missing.ru'])
+        self.assertEqual(9, len(lookup.calls))
+        self.assertEqual(4, lookup.max_active)
+        resolver.prefetch(['h1.ru'])
+        self.assertEqual(9, len(lookup.calls))
+
+    def test_system_lookup(self):
+        self.assertEqual((['127.0.0.1'], None), system_lookup('127.0.0.1'))
+
+    def test_check_url(self):
+        server = LocalServer().start()
+        lookup = FakeAddressLookup({'probe.invalid': ['127.0.0.1']})
+        try:
+            with new_session(resolver=Resolver(lookup=lookup)) as session:
+                url = f"http://probe.invalid:{server.server.server_port}/"
+                res = check_url(url, session)
+                # новое соединение берет адрес из кэша
+                session.get_adapter('http://').poolmanager.clear()
+                again = check_url(url, session)
+                missing = check_url(f"http://missing.invalid:{server.server.server_port}/", session)
+        finally:
+            server.stop()
+        self.assertEqual((0, 0, 0), (res['err'], again['err'], again['reused']))
+        self.assertIn('resolve_ms', res)
+        self.assertEqual(5, missing['err'])
+        self.assertEqual(['probe.invalid', 'missing.invalid'], lookup.calls)
+
+    def test_sweep_prefetch(self):
+        server = LocalServer().start()
+        port = server.server.server_port
+        lookup = FakeAddressLookup({'a.invalid': ['127.0.0.1'], 'b.invalid': ['127.0.0.1']})
+        try:
+            urls = [f"http://{host}.invalid:{port}/{i}" for host in 'ab' for i in range(5)]
+            res = sweep(urls, resolver=Resolver(lookup=lookup), ip_rate=1000)
+        finally:
+            server.stop()
+        self.assertEqual([0] * 10, [r['err'] for r in res.values()])
+        self.assertEqual(['a.invalid', 'b.invalid'], sorted(lookup.calls))
+        self.assertTrue(all(r['resolve_ms'] is not None for r in res.values()))
@@ -0,0 +1,90 @@
+import json
+import os.path
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase, mock
+
+from znwclib import multi_host
+from znwclib.multi_host import discover_host, discover_hosts, read_manifest
+from znwclib.nginx_config import get_URLs_from_config
+
+cur_test_directory = os.path.dirname(__file__)
+agent = os.path.join(os.path.dirname(cur_test_directory), 'src', 'znwcagent.py')
+
+
+def crashing_discover_host(hostname, config_file, **options):
+    if hostname == 'crash':
+        os._exit(1)
+    return discover_host(hostname, config_file, **options)
+
+
+class TestMultiHost(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.nginx2 = os.path.join(cur_test_directory, 'nginx2.conf')
+        with open(self.nginx2) as f:
+            self.dump_file = os.path.join(self.dir, 'web2.txt')
+            with open(self.dump_file, 'w') as dump:
+                dump.write(f"# configuration file /etc/nginx/nginx.conf:\n{f.read()}\n")
+        self.manifest = os.path.join(self.dir, 'hosts.txt')
+        with open(self.manifest, 'w') as f:
+            f.write('# hostname config\n'
+                    '\n'
+                    f"web1 {os.path.join(cur_test_directory, 'nginx.conf')}\n"
+                    'web2 web2.txt\n'
+                    'web3 missing.txt\n')
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_read_manifest(self):
+        self.assertEqual([('web1', os.path.join(cur_test_directory, 'nginx.conf')),
+                          ('web2', self.dump_file),
+                          ('web3', os.path.join(self.dir, 'missing.txt'))], read_manifest(self.manifest))
+        with open(self.manifest, 'a') as f:
+            f.write('web4\n')
+        with self.assertRaises(ValueError):
+            read_manifest(self.manifest)
+
+    def test_discover_host(self):
+        result = discover_host('web2', self.nginx2)
+        self.assertEqual(get_URLs_from_config(self.nginx2, 'web2'), result['urls'])
+        self.assertGreater(result['time'], 0)
+        result = discover_host('web3', os.path.join(self.dir, 'missing.txt'), dump=True)
+        self.assertTrue(result['error'].startswith('Error: FileNotFoundError'))
+        self.assertNotIn('urls', result)
+
+    def test_discover_hosts(self):
+        targets = read_manifest(self.manifest)
+        for workers in (1, 2):
+            results = list(discover_hosts(targets, workers=workers, dump=True))
+            self.assertEqual(['web1', 'web2', 'web3'], [r['hostname'] for r in results])
+            # web1 - не дамп
+            self.assertIn('error', results[0])
+            self.assertEqual(get_URLs_from_config(self.nginx2, 'web2'), results[1]['urls'])
+            self.assertIn('error', results[2])
+
+    def test_discover_hosts_crash(self):
+        targets = [('web2', self.nginx2), ('crash', self.nginx2), ('web2b', self.nginx2), ('web2c', self.nginx2)]
+        # процессы пула создаются fork и видят подмененную функцию
+        with mock.patch.object(multi_host, 'discover_host', crashing_discover_host):
+            results = list(discover_hosts(targets, workers=2))
+        self.assertEqual(['web2', 'crash', 'web2b', 'web2c'], [r['hostname'] for r in results])
+        self.assertTrue(results[1]['error'].startswith('Error: BrokenProcessPool'))
+        for result in results[:1] + results[2:]:
+            self.assertEqual(get_URLs_from_config(self.nginx2, result['hostname']), result['urls'])
+
+    def test_agent_manifest(self):
+        out_dir = os.path.join(self.dir, 'lld')
+        res = subprocess.run([sys.executable, agent, '-T', '-M', self.manifest, '-o', out_dir, '-j', '2'],
+                             capture_output=True, text=True)
+        self.assertEqual(1, res.returncode)
+        lines = [json.loads(line) for line in res.stdout.splitlines()]
+        self.assertEqual(['web1', 'web2', 'web3'], [line['hostname'] for line in lines])
+        self.assertEqual(['web2.json'], os.listdir(out_dir))
+        with open(os.path.join(out_dir, 'web2.json')) as f:
+            lld = json.load(f)
+        self.assertEqual(lines[1]['urls'], len(lld))
+        self.assertEqual([{'{#URL}': url} for url in get_URLs_from_config(self.nginx2, 'web2')], lld)
@@ -1,10 +1,12 @@
 import os.path
+import tempfile
 from collections import ChainMap
 from unittest import TestCase
 
 from znwclib.nginx_config import process_special_comments, get_server_names, get_listen, prepare_location, \
     skip_on_return, \
-    get_locations, process_servers, get_URLs_from_config, get_all_listen_directives
+    get_locations, process_servers, get_URLs_from_config, get_all_listen_directives, prep_name_var, is_domain, \
+    split_block, split_config_dump, get_listen_address
 
 cur_test_directory = os.path.dirname(__file__)
 
@@ -280,6 +282,21 @@ class TestNginxConfig(TestCase):
             prepare_location(['/loc$hbz_var'], [], comments)
         )
 
+    def test_prep_name_var(self):
+        comments = {'var': {'$hostname': 'web01.ru', '$host': 'www.ru', '$a': '$b', '$b': 'b'}}
+        self.assertEqual('web01.ru/www.ru', prep_name_var('$hostname/$host', comments))
+        # подставленные значения повторно не обрабатываются
+        self.assertEqual('$b.b', prep_name_var('$a.$b', comments))
+        self.assertEqual('no.vars', prep_name_var('no.vars', comments))
+        self.assertEqual('$host', prep_name_var('$host', {'var': {}}))
+
+    def test_is_domain_cached(self):
+        is_domain.cache_clear()
+        self.assertTrue(is_domain('www.test.ru'))
+        self.assertFalse(is_domain('www.test.*'))
+        self.assertTrue(is_domain('www.test.ru'))
+        self.assertEqual(1, is_domain.cache_info().hits)
+
     def test_prepare_empty_loc(self):
         self.assertEqual(
             None,
@@ -349,6 +366,42 @@ class TestNginxConfig(TestCase):
             ], 'my.host.name')
         )
 
+    def test_get_locations_nested_return(self):
+        def location(path, block=()):
+            return {'directive': 'location', 'args': [path], 'block': list(block)}
+        ret = {'directive': 'return', 'args': ['404']}
+        block = [
+            location('/a', [location('/a/b'), location('/', [ret]), location('/a/c')]),
+            location('/d', [location('/d/e')]),
+        ]
+        # return во вложенном location / отменяет только location этого уровня
+        self.assertEqual((['/a', '/d', '/d/e'], False), get_locations(block, 'host'))
+        self.assertEqual(([], True), get_locations(block + [location('/', [ret])], 'host'))
+
+    def test_get_locations_deep(self):
+        block = []
+        inner = block
+        for i in range(5000):
+            loc = {'directive': 'location', 'args': [f"/l{i}"], 'block': []}
+            inner.append(loc)
+            inner = loc['block']
+        locations, skip_root = get_locations(block, 'host')
+        self.assertEqual(5000, len(locations))
+        self.assertEqual('/l4999', locations[-1])
+
+    def test_split_block(self):
+        block = [
+            {'directive': '#', 'comment': 'skip_this: True'},
+            {'directive': 'Return', 'args': ['301']},
+            {'directive': 'listen', 'args': ['80']},
+            {'directive': 'root', 'args': ['/']},
+        ]
+        parts = split_block(block)
+        self.assertEqual([block[0]], parts['#'])
+        self.assertEqual([block[1]], parts['return'])
+        self.assertEqual([block[2]], parts['listen'])
+        self.assertEqual([], parts['location'])
+
     def test_process_server(self):
         self.assertEqual(
             servers_answer,
@@ -400,6 +453,104 @@ class TestNginxConfig(TestCase):
         )
 
 
+nginx_dump_files = {
+    '/etc/nginx/nginx.conf': 'user www-data;\n'
+                             'events {\n    worker_connections 768;\n}\n'
+                             'http {\n    include sites-enabled/*;\n}\n'
+                             'http {\n    ssl on;\n    include /etc/nginx/other.conf;\n}\n',
+    '/etc/nginx/sites-enabled/a': 'server {\n    listen 80;\n    server_name a.ru;\n    location /x {\n    }\n}\n',
+    '/etc/nginx/sites-enabled/b': 'server {\n    listen 8080;\n    server_name b.ru;\n}\n',
+    '/etc/nginx/other.conf': 'server {\n    listen 443;\n    server_name c.ru;\n}\n',
+}
+nginx_dump_res = ['http://a.ru', 'http://a.ru/x', 'http://b.ru:8080', 'https://c.ru']
+
+
+def make_dump(files: dict) -> str:
+    return 'nginx: the configuration file /etc/nginx/nginx.conf syntax is ok\n' + ''.join(
+        f"# configuration file {name}:\n{content}\n" for name, content in files.items())
+
+
+class TestListenAddress(TestCase):
+    def test_get_listen_address(self):
+        checks = {
+            '1.1.1.1': ['1.1.1.1:80'],
+            '::1': ['[::1]:8080'],
+            'fe80::1': ['[fe80::1]:443', 'ssl'],
+            'localhost': ['localhost'],
+            None: ['unix:/var/run/nginx.sock'],
+        }
+        for answer, args in checks.items():
+            with self.subTest(args=args):
+                self.assertEqual(answer, get_listen_address(args))
+                self.assertEqual(answer, get_listen_address(args, '10.0.0.5'))
+        # все адреса: проверяющий не может подключиться к своему 127.0.0.1 вместо хоста nginx
+        for args in (['*:80'], ['0.0.0.0:443'], ['[::]:8080'], ['8080'], ['80', 'default_server'], []):
+            with self.subTest(args=args):
+                self.assertIsNone(get_listen_address(args))
+                self.assertEqual('10.0.0.5', get_listen_address(args, '10.0.0.5'))
+
+    def test_get_urls_listen_address(self):
+        config_file = f"{cur_test_directory}/nginx2.conf"
+        pairs = get_URLs_from_config(config_file, 'h.domain.com', listen_address=True)
+        self.assertEqual(get_URLs_from_config(config_file, 'h.domain.com'), [url for url, _ in pairs])
+        self.assertEqual(('http://hbz.ru', '1.1.1.1'), pairs[0])
+        parse_cache = {}
+        get_URLs_from_config(config_file, 'h.domain.com', parse_cache=parse_cache)
+        self.assertEqual(pairs, get_URLs_from_config(config_file, 'h.domain.com', parse_cache=parse_cache,
+                                                     listen_address=True))
+        wildcard = get_URLs_from_config(config_file, 'h.domain.com', parse_cache=parse_cache,
+                                        listen_address='10.0.0.5')
+        self.assertEqual([url for url, _ in pairs], [url for url, _ in wildcard])
+        self.assertIn(None, [address for _, address in pairs])
+        self.assertEqual([address or '10.0.0.5' for _, address in pairs], [address for _, address in wildcard])
+
+
+class TestConfigDump(TestCase):
+    def test_split_config_dump(self):
+        self.assertEqual(nginx_dump_files, split_config_dump(make_dump(nginx_dump_files)))
+        self.assertEqual({}, split_config_dump('nginx: [emerg] unknown directive "serve"\n'))
+
+    def test_get_urls_from_dump(self):
+        self.assertEqual(nginx_dump_res,
+                         get_URLs_from_config(None, 'localhost', config_dump=make_dump(nginx_dump_files)))
+
+    def test_same_as_files(self):
+        # все блоки http обрабатываются и при разборе файлов
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, content in nginx_dump_files.items():
+                path = tmp + name
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w') as f:
+                    f.write(content.replace('/etc/nginx', tmp + '/etc/nginx'))
+            config_file = tmp + '/etc/nginx/nginx.conf'
+            self.assertEqual(nginx_dump_res, get_URLs_from_config(config_file, 'localhost'))
+            self.assertEqual(nginx_dump_res, get_URLs_from_config(config_file, 'localhost', parse_cache={}))
+
+    def test_dump_does_not_read_disk(self):
+        files = dict(nginx_dump_files)
+        del files['/etc/nginx/other.conf']
+        self.assertEqual("Error: [Errno 2] No such file or directory: '/etc/nginx/other.conf'",
+                         get_URLs_from_config(None, 'localhost', config_dump=make_dump(files)))
+
+    def test_dump_errors(self):
+        files = dict(nginx_dump_files)
+        files['/etc/nginx/sites-enabled/b'] = 'server {\n'
+        res = get_URLs_from_config(None, 'localhost', config_dump=make_dump(files))
+        self.assertTrue(res.startswith('Error: '))
+        self.assertIn('/etc/nginx/sites-enabled/b', res)
+        self.assertEqual('Error: no configuration files in nginx -T dump',
+                         get_URLs_from_config(None, 'localhost', config_dump=''))
+
+    def test_dump_parse_cache(self):
+        parse_cache = {}
+        dump = make_dump(nginx_dump_files)
+        self.assertEqual(nginx_dump_res, get_URLs_from_config(None, 'localhost', parse_cache=parse_cache,
+                                                              config_dump=dump))
+        self.assertEqual(3, len(parse_cache['servers']))
+        self.assertEqual(nginx_dump_res, get_URLs_from_config(None, 'localhost', parse_cache=parse_cache,
+                                                              config_dump=dump))
+
+
 config_res = ['http://hbz.ru',
               'http://hbz.ru/hbz',
               'http://hbz.ru/equal',
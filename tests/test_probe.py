@@ -0,0 +1,199 @@
+import threading
+import time
+from collections import Counter
+from unittest import TestCase
+from urllib.parse import urlsplit
+
+from local_server import LocalServer
+from znwclib.probe import RateLimiter, TokenBucket, pinned_check, sweep, url_host, url_origin
+
+
+class _ConcurrencyCounter:
+    """fake check function, counts simultaneous calls"""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = Counter()
+        self.max_total = 0
+        self.max_per_host = Counter()
+
+    def __call__(self, url):
+        host = url_host(url)
+        with self.lock:
+            self.active[host] += 1
+            self.max_total = max(self.max_total, sum(self.active.values()))
+            self.max_per_host[host] = max(self.max_per_host[host], self.active[host])
+        time.sleep(self.delay)
+        with self.lock:
+            self.active[host] -= 1
+        return {'err': 0, 'url': url}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimit(TestCase):
+    def test_token_bucket(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=3, clock=clock)
+        self.assertEqual([0, 0, 0, 0.5, 1.0], [bucket.reserve() for _ in range(5)])
+        clock.now += 10
+        # после простоя снова доступен burst
+        self.assertEqual([0, 0, 0, 0.5], [bucket.reserve() for _ in range(4)])
+
+    def test_token_bucket_at(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, clock=clock)
+        self.assertEqual(5, bucket.reserve(at=105))
+        # следующий запрос не раньше зарезервированного
+        self.assertEqual(6, bucket.reserve())
+
+    def test_rate_limiter(self):
+        clock = FakeClock()
+        limiter = RateLimiter(rate=1, ip_rate=2, clock=clock)
+        a, b = ('http', 'a.ru', 80), ('http', 'b.ru', 80)
+        self.assertEqual(0, limiter.reserve(a, '1.1.1.1'))
+        self.assertEqual(0.5, limiter.reserve(b, '1.1.1.1'))
+        # ожидание origin a дольше, чем IP
+        self.assertEqual(1, limiter.reserve(a, '1.1.1.1'))
+        self.assertEqual(0, limiter.reserve(('http', 'c.ru', 80), '2.2.2.2'))
+        self.assertEqual(0, RateLimiter(ip_rate=1, clock=clock).reserve(a))
+
+    def test_sweep_rate(self):
+        counter = _ConcurrencyCounter(delay=0)
+        urls = [f"http://a.ru/{i}" for i in range(4)] + ['http://b.ru/']
+        started = time.perf_counter()
+        results = sweep(urls, check=counter, rate=20, burst=2)
+        elapsed = time.perf_counter() - started
+        self.assertEqual([0, 0, 50, 100, 0], [round(results[url]['rate_delay_ms'], -1) for url in urls])
+        self.assertGreaterEqual(elapsed, 0.1)
+        self.assertNotIn('rate_delay_ms', sweep(urls, check=counter)[urls[0]])
+
+    def test_sweep_rate_send_times(self):
+        sent = {}
+        durations = {'/0': 0.5, '/1': 0.15}
+
+        def check(url):
+            sent[url] = time.perf_counter()
+            time.sleep(durations.get(urlsplit(url).path, 0.15))
+            return {'err': 0, 'url': url}
+
+        urls = [f"http://a.ru/{i}" for i in range(6)]
+        for per_host in (1, 2):
+            with self.subTest(per_host=per_host):
+                sent.clear()
+                results = sweep(urls, check=check, per_host=per_host, rate=10, burst=1)
+                # фактические моменты отправки, а не зарезервированные, не чаще rate
+                times = sorted(sent.values())
+                self.assertGreaterEqual(min(b - a for a, b in zip(times, times[1:])), 0.09)
+                # в ожидание входит и ожидание слота --per-host
+                self.assertAlmostEqual(sent[urls[-1]] - min(times), results[urls[-1]]['rate_delay_ms'] / 1000,
+                                       delta=0.05)
+
+
+class TestProbe(TestCase):
+    def test_pinned_check(self):
+        calls = []
+
+        def check(url, address=None):
+            calls.append((url, address))
+            return {'err': 0}
+
+        results = sweep(['http://a.ru', 'http://b.ru'], check=check, addresses={'http://a.ru': '1.1.1.1'})
+        self.assertEqual(['http://a.ru', 'http://b.ru'], list(results))
+        self.assertEqual([('http://a.ru', '1.1.1.1'), ('http://b.ru', None)], sorted(calls))
+        pinned_check(check, {})('http://c.ru')
+        self.assertEqual(('http://c.ru', None), calls[-1])
+
+    def test_url_host(self):
+        self.assertEqual('example.org', url_host('https://Example.org:8443/loc'))
+        self.assertEqual('', url_host('no.schema.example'))
+        self.assertEqual('', url_host('http://[::1'))
+
+    def test_url_origin(self):
+        self.assertEqual(('https', 'example.org', 443), url_origin('https://Example.org/loc'))
+        self.assertEqual(('http', 'example.org', 8080), url_origin('http://example.org:8080'))
+        self.assertEqual(('', '', None), url_origin('http://[::1'))
+
+    def test_sweep_order(self):
+        urls = [f"http://h{i % 3}.example.org/{i}" for i in range(20)]
+        res = sweep(urls, check=_ConcurrencyCounter(0))
+        self.assertEqual(urls, list(res))
+        self.assertEqual(urls, [r['url'] for r in res.values()])
+
+    def test_sweep_limits(self):
+        counter = _ConcurrencyCounter()
+        urls = [f"http://h{i % 4}.example.org/{i}" for i in range(40)]
+        sweep(urls, check=counter, concurrency=6, per_host=2)
+        self.assertLessEqual(counter.max_total, 6)
+        self.assertGreater(counter.max_total, 1)
+        self.assertEqual(4, len(counter.max_per_host))
+        for host_max in counter.max_per_host.values():
+            self.assertLessEqual(host_max, 2)
+
+    def test_sweep_bad_limits(self):
+        for kwargs in ({'concurrency': 0}, {'per_host': 0}):
+            with self.subTest(**kwargs), self.assertRaises(ValueError):
+                sweep(['http://a.ru'], check=_ConcurrencyCounter(0), **kwargs)
+
+    def test_sweep_real_check(self):
+        self.assertEqual(
+            {'no.schema.example': {'err': 7, 'err_str': 'Missing Schema'},
+             'ftp://127.0.0.1/': {'err': 8, 'err_str': 'Invalid Schema'}},
+            sweep(['no.schema.example', 'ftp://127.0.0.1/'])
+        )
+
+    def test_sweep_deadline(self):
+        counter = _ConcurrencyCounter(0.3)
+        urls = [f"http://h{i}.example.org/" for i in range(4)]
+        started = time.perf_counter()
+        res = sweep(urls, check=counter, concurrency=1, deadline=0.5)
+        self.assertLess(time.perf_counter() - started, 0.9)
+        self.assertEqual({'err': 0, 'url': urls[0]}, res[urls[0]])
+        for url in urls[2:]:
+            self.assertEqual({'err': 11, 'err_str': 'Not Checked (Deadline)'}, res[url])
+
+    def test_sweep_deadline_slow_body(self):
+        server = LocalServer().start()
+        threads = set(threading.enumerate())
+        try:
+            started = time.perf_counter()
+            res = sweep([server.base_url + '/trickle', server.base_url + '/'], deadline=0.5, timeout=(1, 1))
+            elapsed = time.perf_counter() - started
+            # потоки проверок не daemon: пока они работают, интерпретатор не завершается
+            running = [thread for thread in threading.enumerate()
+                       if thread not in threads and not thread.daemon and thread.is_alive()]
+        finally:
+            server.stop()
+        # каждый байт приходит раньше read timeout, но проверка прерывается к deadline
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual([], running)
+        self.assertEqual({'err': 11, 'err_str': 'Not Checked (Deadline)'}, res[server.base_url + '/trickle'])
+        self.assertEqual(0, res[server.base_url + '/']['err'])
+
+    def test_sweep_pooled_connections(self):
+        server = LocalServer().start()
+        try:
+            urls = [f"{server.base_url}/{i}" for i in range(10)]
+            res = sweep(urls, per_host=1)
+        finally:
+            server.stop()
+        self.assertEqual([0] * 10, [r['err'] for r in res.values()])
+        self.assertEqual([0] + [1] * 9, [r['reused'] for r in res.values()])
+
+    def test_sweep_max_body(self):
+        server = LocalServer().start()
+        try:
+            res = sweep([server.base_url + '/big', server.base_url + '/no-head'], head=True, max_body=100)
+        finally:
+            server.stop()
+        self.assertEqual(('HEAD', 0, 0), tuple(res[server.base_url + '/big'][k]
+                                               for k in ('method', 'bytes_read', 'body_capped')))
+        self.assertEqual(('GET', 2, 0), tuple(res[server.base_url + '/no-head'][k]
+                                              for k in ('method', 'bytes_read', 'body_capped')))
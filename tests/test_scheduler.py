@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+from znwclib.scheduler import Scheduler
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestScheduler(TestCase):
+    def setUp(self) -> None:
+        self.clock = _Clock()
+
+    def test_initial_spread(self):
+        scheduler = Scheduler(interval=100, jitter=0, clock=self.clock, rand=lambda: 0.0)
+        urls = [f"http://h{i}.ru" for i in range(10)]
+        self.assertEqual((urls, []), scheduler.set_urls(urls))
+        due = []
+        for step in range(100):
+            self.clock.now = 1000.0 + step
+            due.append(len(scheduler.pop_due()))
+        # one URL every 10 seconds, not all at once
+        self.assertEqual(10, sum(due))
+        self.assertEqual(1, max(due))
+
+    def test_interval_and_jitter(self):
+        scheduler = Scheduler(interval=100, jitter=0.1, clock=self.clock, rand=lambda: 0.0)
+        scheduler.set_urls(['http://a.ru'])
+        scheduler.rand = lambda: 1.0
+        self.assertEqual(['http://a.ru'], scheduler.pop_due())
+        self.assertEqual(1110.0, scheduler.next_due())
+        scheduler.rand = lambda: 0.0
+        self.assertEqual(['http://a.ru'], scheduler.pop_due(1110.0))
+        self.assertEqual(1200.0, scheduler.next_due())
+
+    def test_late_pop_does_not_burst(self):
+        scheduler = Scheduler(interval=100, jitter=0, clock=self.clock, rand=lambda: 0.0)
+        scheduler.set_urls(['http://a.ru'])
+        self.assertEqual(['http://a.ru'], scheduler.pop_due(1350.0))
+        self.assertEqual(1450.0, scheduler.next_due())
+
+    def test_set_urls_reload(self):
+        scheduler = Scheduler(interval=100, jitter=0, clock=self.clock, rand=lambda: 0.0)
+        scheduler.set_urls(['http://a.ru', 'http://b.ru'])
+        self.assertEqual((['http://c.ru'], ['http://a.ru']), scheduler.set_urls(['http://b.ru', 'http://c.ru']))
+        self.assertEqual(2, len(scheduler))
+        self.assertNotIn('http://a.ru', scheduler)
+        self.assertEqual(['http://c.ru'], scheduler.pop_due(1000.0))
+        self.assertEqual(['http://b.ru'], scheduler.pop_due(1050.0))
+        self.assertEqual(1100.0, scheduler.next_due())
+        # removed and added again URL has only one schedule entry
+        scheduler.set_urls(['http://b.ru'])
+        scheduler.set_urls(['http://b.ru', 'http://c.ru'])
+        self.assertEqual(['http://c.ru', 'http://b.ru'], scheduler.pop_due(1200.0))
+
+    def test_empty(self):
+        scheduler = Scheduler(clock=self.clock)
+        self.assertIsNone(scheduler.next_due())
+        self.assertEqual([], scheduler.pop_due())
@@ -0,0 +1,73 @@
+import os.path
+from unittest import TestCase
+
+import crossplane
+
+from znwclib.nginx_config import combine_configs, get_URLs_from_config, iter_URLs_from_config, \
+    process_servers
+from znwclib.server_store import ServerStore, URLList
+
+cur_test_directory = os.path.dirname(__file__)
+
+SERVERS = [
+    {'server_names': ['a.ru', 'www.a.ru'], 'locations': ['/', '/api', 'static', ''],
+     'listens': [(80, 'http'), (8443, 'https')], 'addresses': ['10.0.0.1', None]},
+    # после json listen - списки
+    {'server_names': ['b.ru'], 'locations': ['/api', 'static', '', '/'], 'listens': [[443, 'https']]},
+]
+
+
+class TestServerStore(TestCase):
+    def test_urls(self):
+        store = ServerStore(SERVERS)
+        self.assertEqual([
+            'http://a.ru', 'http://a.ru/api', 'http://a.ru/static', 'http://a.ru',
+            'http://www.a.ru', 'http://www.a.ru/api', 'http://www.a.ru/static', 'http://www.a.ru',
+            'https://a.ru:8443', 'https://a.ru:8443/api', 'https://a.ru:8443/static', 'https://a.ru:8443',
+            'https://www.a.ru:8443', 'https://www.a.ru:8443/api', 'https://www.a.ru:8443/static',
+            'https://www.a.ru:8443',
+            'https://b.ru', 'https://b.ru/api', 'https://b.ru/static', 'https://b.ru',
+        ], list(store.iter_urls()))
+        self.assertEqual(['http://a.ru', 'http://www.a.ru', 'https://a.ru:8443', 'https://www.a.ru:8443',
+                          'https://b.ru'], list(store.iter_urls(skip_locations=True)))
+        self.assertEqual([('https://a.ru:8443', None), ('https://b.ru', None)],
+                         [pair for pair in store.iter_urls(skip_locations=True, listen_address=True)
+                          if pair[0].startswith('https://') and 'www' not in pair[0]])
+        self.assertEqual(['https://b.ru'],
+                         list(store.iter_urls(skip_locations=True, name_exists={'a.ru': False, 'www.a.ru': False,
+                                                                                 'b.ru': True})))
+
+    def test_shared_tuples(self):
+        store = ServerStore(SERVERS)
+        a, b = store.servers
+        self.assertEqual(('/api', '/static', ''), a.locations)
+        self.assertIs(a.locations, b.locations)
+        self.assertEqual(((443, 'https'),), b.listens)
+        self.assertEqual(('10.0.0.1', None), a.addresses)
+        self.assertIsNone(b.addresses)
+        self.assertEqual(['a.ru', 'www.a.ru', 'b.ru'], list(store.server_names()))
+
+    def test_url_list(self):
+        store = ServerStore(SERVERS)
+        for kwargs in ({}, {'skip_locations': True}, {'name_exists': {'a.ru': True, 'www.a.ru': False,
+                                                                       'b.ru': True}}):
+            urls = store.urls(**kwargs)
+            self.assertIsInstance(urls, URLList)
+            self.assertEqual(list(store.iter_urls(**kwargs)), list(urls))
+            # повторный проход
+            self.assertEqual(len(list(urls)), len(urls))
+
+    def test_iter_urls_from_config(self):
+        config_file = os.path.join(cur_test_directory, 'nginx.conf')
+        urls = iter_URLs_from_config(config_file, 'h.domain.com')
+        self.assertIsInstance(urls, URLList)
+        self.assertEqual(get_URLs_from_config(config_file, 'h.domain.com'), list(urls))
+        self.assertEqual(len(list(urls)), len(urls))
+        # в режиме debug каждый URL ссылается на свой блок server, блоки не копируются
+        config = combine_configs(crossplane.parse(config_file, comments=True, ignore=('types', 'events',)))
+        http = next(d['block'] for d in config if d['directive'] == 'http')
+        servers = process_servers(http, 'h.domain.com', debug=True)
+        pairs = list(ServerStore(servers).iter_urls(debug=True))
+        self.assertEqual(list(urls), [url for url, _ in pairs])
+        blocks = {id(server['debug']) for server in servers}
+        self.assertTrue(all(id(block) in blocks for _, block in pairs))
@@ -0,0 +1,226 @@
+from unittest import TestCase, mock
+
+import requests
+
+from local_server import BIG_BODY_SIZE, CERT_FILE, LocalServer
+from znwclib import web_check
+from znwclib.web_check import check_url, check_urls, error_result, new_session, parse_url_addresses, \
+    parse_url_list
+
+
+class TestWebCheck(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.server = LocalServer().start()
+        cls.base_url = cls.server.base_url
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.stop()
+
+    def test_error_result(self):
+        self.assertEqual({'err': 2, 'err_str': 'SSL Error'}, error_result(requests.exceptions.SSLError()))
+        self.assertEqual({'err': 3, 'err_str': 'Connect Timeout'}, error_result(requests.exceptions.ConnectTimeout()))
+        self.assertEqual({'err': 5, 'err_str': 'Connection Error'}, error_result(requests.exceptions.ConnectionError()))
+        self.assertEqual({'err': 7, 'err_str': 'Missing Schema'}, error_result(requests.exceptions.MissingSchema()))
+        self.assertEqual({'err': 1000, 'err_str': 'Unknown Error'}, error_result(ValueError()))
+
+    def test_check_url(self):
+        res = check_url(self.base_url + '/redirect')
+        self.assertEqual(0, res['err'])
+        self.assertEqual(200, res['status_code'])
+        self.assertEqual(self.base_url + '/', res['url'])
+        self.assertIsInstance(res['elapsed'], float)
+        self.assertEqual(0, res['reused'])
+
+    def test_check_url_reuse_connection(self):
+        with new_session() as session:
+            self.assertEqual(0, check_url(self.base_url + '/', session)['reused'])
+            self.assertEqual(1, check_url(self.base_url + '/missing', session)['reused'])
+            # the redirect and the final request go over the same connection
+            self.assertEqual(1, check_url(self.base_url + '/redirect', session)['reused'])
+
+    def test_check_url_timings(self):
+        res = check_url(self.base_url + '/redirect')
+        for name in ('dns_ms', 'connect_ms', 'ttfb_ms', 'download_ms', 'total_ms'):
+            self.assertGreaterEqual(res[name], 0.0, name)
+        self.assertGreater(res['connect_ms'], 0.0)
+        self.assertEqual(0.0, res['tls_ms'])
+        self.assertGreaterEqual(res['total_ms'], res['dns_ms'] + res['connect_ms'] + res['download_ms'])
+
+    def test_check_url_tls_timings(self):
+        server = LocalServer(tls=True).start()
+        try:
+            with new_session() as session:
+                self.assertEqual(2, check_url(server.base_url + '/', session)['err'])
+                session.trust_env = False  # REQUESTS_CA_BUNDLE would override verify
+                session.verify = CERT_FILE
+                res = check_url(server.base_url + '/', session)
+                reused = check_url(server.base_url + '/', session)
+        finally:
+            server.stop()
+        self.assertEqual(0, res['err'])
+        self.assertGreater(res['tls_ms'], 0.0)
+        self.assertEqual(1, reused['reused'])
+        self.assertEqual(0.0, reused['tls_ms'])
+        self.assertEqual(0.0, reused['connect_ms'])
+
+    def test_check_url_address(self):
+        port = self.server.server.server_port
+        url = f"http://pinned.invalid:{port}/"
+        self.assertEqual(5, check_url(url)['err'])
+        res = check_url(url, address='127.0.0.1')
+        self.assertEqual(0, res['err'])
+        self.assertEqual(0.0, res['dns_ms'])
+        self.assertEqual('127.0.0.1', res['address'])
+        self.assertEqual(f"pinned.invalid:{port}", self.server.server.last_host)
+
+    def test_check_url_address_tls(self):
+        server = LocalServer(tls=True).start()
+        try:
+            with new_session() as session:
+                session.trust_env = False
+                session.verify = CERT_FILE
+                url = f"https://localhost:{server.server.server_port}/"
+                res = check_url(url, session, address='127.0.0.1')
+                self.assertEqual(0, res['err'])
+                self.assertEqual(0.0, res['dns_ms'])
+        finally:
+            server.stop()
+        self.assertEqual('localhost', server.server.sni)
+        self.assertEqual(f"localhost:{server.server.server_port}", server.server.last_host)
+
+    def test_check_url_tls_info(self):
+        server = LocalServer(tls=True).start()
+        base_url = server.base_url.replace('127.0.0.1', 'localhost')
+        try:
+            with new_session() as session:
+                res = check_url(base_url + '/', session)
+                self.assertEqual((2, 0, 'self-signed certificate'),
+                                 (res['err'], res['tls_chain_valid'], res['tls_verify_error']))
+                session.trust_env = False
+                session.verify = False
+                unverified = check_url(base_url + '/', session)
+                session.verify = CERT_FILE
+                res = check_url(base_url + '/', session)
+                reused = check_url(base_url + '/missing', session)
+                self.assertEqual(1, len(session.tls_cache))
+        finally:
+            server.stop()
+        self.assertEqual(1, res['tls_chain_valid'])
+        self.assertEqual('CN=localhost, O=znwc test', res['tls_issuer'])
+        self.assertEqual('CN=localhost, O=znwc test', res['tls_subject'])
+        self.assertTrue(res['tls_protocol'].startswith('TLS'))
+        self.assertTrue(res['tls_cipher'])
+        self.assertGreater(res['tls_days_left'], 365)
+        # переиспользованное соединение - те же сведения без TLS handshake
+        self.assertEqual(1, reused['reused'])
+        self.assertEqual(res['tls_expires'], reused['tls_expires'])
+        self.assertNotIn('tls_protocol', check_url(self.base_url + '/'))
+        # без проверки цепочки - только сведения о соединении
+        self.assertEqual((0, 0), (unverified['err'], unverified['tls_chain_valid']))
+        self.assertTrue(unverified['tls_protocol'].startswith('TLS'))
+        self.assertNotIn('tls_expires', unverified)
+        self.assertNotIn('tls_issuer', unverified)
+
+    def test_check_url_body(self):
+        res = check_url(self.base_url + '/big')
+        self.assertEqual(('GET', BIG_BODY_SIZE, 0), (res['method'], res['bytes_read'], res['body_capped']))
+        res = check_url(self.base_url + '/big', max_body=1000)
+        self.assertEqual(('GET', 1000, 1), (res['method'], res['bytes_read'], res['body_capped']))
+        # тело не больше max_body
+        res = check_url(self.base_url + '/', max_body=2)
+        self.assertEqual((2, 0), (res['bytes_read'], res['body_capped']))
+
+    def test_check_url_body_capped_reuse(self):
+        with new_session() as session:
+            self.assertEqual(0, check_url(self.base_url + '/', session)['reused'])
+            self.assertEqual(1, check_url(self.base_url + '/', session, max_body=10)['reused'])
+            # соединение с непрочитанным телом не переиспользуется
+            self.assertEqual(1, check_url(self.base_url + '/big', session, max_body=10)['body_capped'])
+            self.assertEqual(0, check_url(self.base_url + '/', session)['reused'])
+
+    def test_check_url_head(self):
+        methods = self.server.server.methods
+        start = len(methods)
+        res = check_url(self.base_url + '/big', head=True, max_body=1000)
+        self.assertEqual((200, 'HEAD', 0, 0),
+                         (res['status_code'], res['method'], res['bytes_read'], res['body_capped']))
+        self.assertEqual(['HEAD'], methods[start:])
+        start = len(methods)
+        res = check_url(self.base_url + '/no-head', head=True, max_body=1)
+        self.assertEqual((200, 'GET', 1, 1),
+                         (res['status_code'], res['method'], res['bytes_read'], res['body_capped']))
+        self.assertEqual(['HEAD', 'GET'], methods[start:])
+
+    def test_check_url_redirects(self):
+        self.assertEqual([], check_url(self.base_url + '/')['redirects'])
+        res = check_url(self.base_url + '/chain/2', head=True)
+        self.assertEqual((0, 200, self.base_url + '/'), (res['err'], res['status_code'], res['url']))
+        self.assertEqual([(self.base_url + '/chain/2', 301, '/chain/1'),
+                          (self.base_url + '/chain/1', 301, '/chain/0'),
+                          (self.base_url + '/chain/0', 301, '/')],
+                         [(hop['url'], hop['status_code'], hop['location']) for hop in res['redirects']])
+        self.assertTrue(all(hop['time_ms'] > 0 for hop in res['redirects']))
+
+    def test_check_url_max_redirects(self):
+        methods = self.server.server.methods
+        start = len(methods)
+        res = check_url(self.base_url + '/chain/5', max_redirects=2)
+        self.assertEqual((6, 'Too Many Redirects'), (res['err'], res['err_str']))
+        self.assertEqual(3, len(res['redirects']))
+        # редирект сверх max_redirects не запрашивается
+        self.assertEqual(3, len(methods) - start)
+        self.assertEqual(0, check_url(self.base_url + '/chain/5', max_redirects=6)['err'])
+
+    def test_check_url_redirect_body(self):
+        results, original = [], web_check.read_body
+
+        def read_body(*args):
+            results.append(original(*args))
+            return results[-1]
+
+        with mock.patch.object(web_check, 'read_body', read_body):
+            res = check_url(self.base_url + '/big-redirect', max_body=1024)
+        self.assertEqual((0, 200, 1), (res['err'], res['status_code'], len(res['redirects'])))
+        # тело ответа-редиректа читается с тем же ограничением, что и тело ответа
+        self.assertEqual([(1024, True), (2, False)], results)
+        res = check_url(self.base_url + '/big-redirect')
+        self.assertEqual((0, 2), (res['err'], res['bytes_read']))
+
+    def test_check_url_redirect_loop(self):
+        methods = self.server.server.methods
+        start = len(methods)
+        res = check_url(self.base_url + '/loop-a')
+        self.assertEqual((6, 'Redirect Loop'), (res['err'], res['err_str']))
+        self.assertEqual(['/loop-b', '/loop-a'], [hop['location'] for hop in res['redirects']])
+        self.assertEqual(2, len(methods) - start)
+
+    def test_check_url_read_timeout(self):
+        self.assertEqual({'err': 4, 'err_str': 'Read Timeout'}, check_url(self.base_url + '/slow', timeout=(1, 0.2)))
+
+    def test_check_url_errors(self):
+        self.assertEqual(7, check_url('no.schema.example')['err'])
+        self.assertEqual(8, check_url('ftp://127.0.0.1/')['err'])
+
+    def test_check_urls(self):
+        urls = [self.base_url + '/', self.base_url + '/missing']
+        res = check_urls(urls)
+        self.assertEqual(urls, list(res))
+        self.assertEqual([200, 404], [r['status_code'] for r in res.values()])
+
+    def test_parse_url_list(self):
+        expected = ['http://a.ru', 'https://b.ru/loc']
+        self.assertEqual(expected, parse_url_list('[{"{#URL}": "http://a.ru"}, {"{#URL}": "https://b.ru/loc"}]'))
+        self.assertEqual(
+            expected, parse_url_list('{"data": [{"{#URL}": "http://a.ru"}, {"{#URL}": "https://b.ru/loc"}]}')
+        )
+        self.assertEqual(expected, parse_url_list('["http://a.ru", "https://b.ru/loc", "http://a.ru"]'))
+        self.assertEqual(expected, parse_url_list('\n# comment\nhttp://a.ru\n\n  https://b.ru/loc  \nhttp://a.ru\n'))
+
+    def test_parse_url_addresses(self):
+        self.assertEqual({'http://a.ru': '1.1.1.1', 'https://b.ru': None},
+                         parse_url_addresses('[{"{#URL}": "http://a.ru", "{#ADDRESS}": "1.1.1.1"}, '
+                                             '{"{#URL}": "https://b.ru", "{#ADDRESS}": ""}, '
+                                             '{"{#URL}": "http://a.ru", "{#ADDRESS}": "2.2.2.2"}]'))
+        self.assertEqual({'http://a.ru': None}, parse_url_addresses('http://a.ru\n'))
@@ -0,0 +1,64 @@
+import json
+from unittest import TestCase
+
+from fake_trapper import FakeTrapper
+from znwclib.zabbix_sender import item_key, pack, parse_info, result_items, send_values
+
+
+class TestZabbixSender(TestCase):
+    def test_pack(self):
+        self.assertEqual(b'ZBXD\x01\x02\x00\x00\x00\x00\x00\x00\x00{}', pack({}))
+
+    def test_parse_info(self):
+        self.assertEqual(
+            {'processed': 2, 'failed': 1, 'total': 3},
+            parse_info('processed: 2; failed: 1; total: 3; seconds spent: 0.000055')
+        )
+
+    def test_result_items(self):
+        self.assertEqual(
+            [{'host': 'web01', 'key': 'znwcserver.py[http://a.ru]', 'value': '{"err": 0}', 'clock': 100}],
+            result_items('web01', {'http://a.ru': {'err': 0}}, clock=100)
+        )
+
+    def test_item_key_quoting(self):
+        self.assertEqual('znwcserver.py[http://a.ru/loc?a=1]', item_key('http://a.ru/loc?a=1'))
+        # как zabbix подставляет {#URL} в ключ прототипа znwcserver.py[{#URL}]
+        self.assertEqual('znwcserver.py["http://a.ru/a,b"]', item_key('http://a.ru/a,b'))
+        self.assertEqual('znwcserver.py["http://a.ru/[a]"]', item_key('http://a.ru/[a]'))
+        self.assertEqual('znwcserver.py["http://a.ru/\\"a\\",b"]', item_key('http://a.ru/"a",b'))
+        self.assertEqual('znwcserver.py[http://a.ru/"a"]', item_key('http://a.ru/"a"'))
+
+    def test_send_values_batches(self):
+        items = result_items('web01', {f"http://h{i}.ru": {'err': 0} for i in range(7)}, clock=100)
+        with FakeTrapper() as trapper:
+            summary = send_values(items, '127.0.0.1', trapper.port, batch_size=3)
+        self.assertEqual({'processed': 7, 'failed': 0, 'total': 7, 'not_sent': 0, 'errors': []}, summary)
+        self.assertEqual([3, 3, 1], [len(r['data']) for r in trapper.requests])
+        self.assertEqual(['sender data'] * 3, [r['request'] for r in trapper.requests])
+        self.assertEqual(items, trapper.values)
+        self.assertEqual({'err': 0}, json.loads(trapper.values[0]['value']))
+
+    def test_send_values_retry(self):
+        items = result_items('web01', {f"http://h{i}.ru": {'err': 0} for i in range(4)}, clock=100)
+        with FakeTrapper(drop_connections=2) as trapper:
+            summary = send_values(items, '127.0.0.1', trapper.port, batch_size=2, retry_delay=0)
+        self.assertEqual(4, summary['processed'])
+        self.assertEqual(4, trapper.connections)
+        self.assertEqual(items, trapper.values)
+
+    def test_send_values_not_sent(self):
+        items = result_items('web01', {f"http://h{i}.ru": {'err': 0} for i in range(4)}, clock=100)
+        with FakeTrapper(drop_connections=3) as trapper:
+            summary = send_values(items, '127.0.0.1', trapper.port, batch_size=2, retries=2, retry_delay=0)
+        self.assertEqual(2, summary['processed'])
+        self.assertEqual(2, summary['not_sent'])
+        self.assertEqual(1, len(summary['errors']))
+        self.assertEqual(items[2:], trapper.values)
+
+    def test_send_values_failed_items(self):
+        items = result_items('web01', {'http://a.ru': {'err': 0}, 'http://b.ru': {'err': 0}}, clock=100)
+        with FakeTrapper(unknown_keys=[item_key('http://b.ru')]) as trapper:
+            summary = send_values(items, '127.0.0.1', trapper.port, retry_delay=0)
+        self.assertEqual({'processed': 1, 'failed': 1, 'total': 2, 'not_sent': 0, 'errors': []}, summary)
+        self.assertEqual(1, trapper.connections)